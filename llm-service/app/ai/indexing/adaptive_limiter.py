@@ -0,0 +1,448 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2025
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+"""
+Adaptive limits for embedding requests.
+
+Each embedding provider and model gets its own limiter, which decides how many requests can be in flight and how many
+texts go in each request. Both start conservatively and grow while requests succeed quickly (additive increase), and
+are cut back (multiplicative decrease) when the provider throttles, fails or slows down. Throttled and transient
+failures are retried with jittered exponential backoff, waiting for at least as long as the provider's `Retry-After`.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+import botocore.exceptions
+import httpx
+import openai
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from pydantic import BaseModel
+
+from .embedding_cache import model_namespace
+from ...config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+INITIAL_CONCURRENCY = 2
+MIN_BATCH_SIZE = 1
+BATCH_SIZE_STEP = 10
+# A request is considered slow if it takes this much longer than the fastest requests of a similar size seen so far.
+# Every request pays a fixed overhead, so small batches are only ever compared with other small batches: requests are
+# grouped by batch size in powers of two.
+LATENCY_TOLERANCE = 2.0
+# Requests faster than this are never considered slow; at this scale the variation is just noise
+LATENCY_FLOOR_SECONDS = 0.05
+# Weight of the latest request in the moving average of latency
+LATENCY_SMOOTHING = 0.2
+THROTTLED_DECREASE = 0.5
+SLOW_DECREASE = 0.8
+MAX_ATTEMPTS = 6
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30.0
+# How often a coroutine checks for a free request slot; threads are woken up as soon as one is released instead
+ASYNC_POLL_SECONDS = 0.01
+
+THROTTLING_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "Throttling",
+    "RateLimitExceeded",
+}
+TRANSIENT_STATUS_CODES = {408, 500, 502, 503, 504}
+TRANSIENT_ERRORS = (
+    TimeoutError,
+    ConnectionError,
+    httpx.TransportError,
+    openai.APIConnectionError,
+    botocore.exceptions.ConnectionError,
+    botocore.exceptions.HTTPClientError,
+)
+
+
+class EmbeddingLimits(BaseModel):
+    model: str
+    concurrency: int
+    batch_size: int
+    max_batch_tokens: Optional[int]
+    in_flight: int
+    requests: int
+    throttled: int
+    retries: int
+    latency_ms: Optional[float]
+    blocked_for_seconds: float
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_batch_size: int,
+        max_batch_tokens: Optional[int] = None,
+    ):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_batch_size = max(MIN_BATCH_SIZE, max_batch_size)
+        self.max_batch_tokens = max_batch_tokens
+        self._concurrency = float(min(INITIAL_CONCURRENCY, self.max_concurrency))
+        self._batch_size = float(self.max_batch_size)
+        # Like TCP slow start, grow quickly until the provider first pushes back
+        self._slow_start = True
+        self._in_flight = 0
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._latency: Optional[float] = None
+        # The fastest request seen for each batch size bucket
+        self._best_latency: Dict[int, float] = {}
+        self._requests = 0
+        self._throttled = 0
+        self._retries = 0
+        self._condition = threading.Condition()
+
+    @property
+    def batch_size(self) -> int:
+        with self._condition:
+            return int(self._batch_size)
+
+    def set_batch_limits(
+        self, max_batch_size: int, max_batch_tokens: Optional[int]
+    ) -> None:
+        """Change the most texts and tokens per request, keeping what has been learned about the provider."""
+        with self._condition:
+            # Batches that were never shrunk go straight to the new size
+            at_max = self._batch_size >= self.max_batch_size
+            self.max_batch_size = max(MIN_BATCH_SIZE, max_batch_size)
+            self.max_batch_tokens = max_batch_tokens
+            if at_max or self._batch_size > self.max_batch_size:
+                self._batch_size = float(self.max_batch_size)
+
+    def call(
+        self,
+        fn: Callable[[List[str]], List[T]],
+        texts: List[str],
+        token_counts: Optional[List[int]] = None,
+    ) -> List[T]:
+        """
+        Call `fn` on `texts` in batches, retrying throttled and transient failures.
+
+        Batches hold at most the current batch size of texts and, if `token_counts` are given, at most
+        `max_batch_tokens` tokens. A text that is over the token budget on its own is sent by itself.
+        """
+        results: List[T] = []
+        start = 0
+        while start < len(texts):
+            end = self._batch_end(start, len(texts), token_counts)
+            results.extend(self._call_with_retries(fn, texts[start:end]))
+            start = end
+        return results
+
+    def _batch_end(
+        self, start: int, total: int, token_counts: Optional[List[int]]
+    ) -> int:
+        end = min(total, start + self.batch_size)
+        if token_counts is None or self.max_batch_tokens is None:
+            return end
+        tokens = 0
+        for i in range(start, end):
+            tokens += token_counts[i]
+            if tokens > self.max_batch_tokens and i > start:
+                return i
+        return end
+
+    def limits(self) -> EmbeddingLimits:
+        with self._condition:
+            return EmbeddingLimits(
+                model=self.name,
+                concurrency=int(self._concurrency),
+                batch_size=int(self._batch_size),
+                max_batch_tokens=self.max_batch_tokens,
+                in_flight=self._in_flight,
+                requests=self._requests,
+                throttled=self._throttled,
+                retries=self._retries,
+                latency_ms=(
+                    self._latency * 1000 if self._latency is not None else None
+                ),
+                blocked_for_seconds=max(0.0, self._blocked_until - time.monotonic()),
+            )
+
+    async def acall(
+        self,
+        fn: Callable[[List[str]], Awaitable[List[T]]],
+        texts: List[str],
+        token_counts: Optional[List[int]] = None,
+    ) -> List[T]:
+        """Like `call`, for an async `fn`. Waiting for capacity or a retry doesn't block the event loop."""
+        results: List[T] = []
+        start = 0
+        while start < len(texts):
+            end = self._batch_end(start, len(texts), token_counts)
+            results.extend(await self._acall_with_retries(fn, texts[start:end]))
+            start = end
+        return results
+
+    def _call_with_retries(
+        self, fn: Callable[[List[str]], List[T]], batch: List[str]
+    ) -> List[T]:
+        attempt = 0
+        while True:
+            self._acquire()
+            start = time.monotonic()
+            try:
+                result = fn(batch)
+            except Exception as e:
+                attempt += 1
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            except BaseException:
+                # Cancelled or interrupted, which says nothing about the provider; just give the slot back
+                self._release_failed(None, None)
+                raise
+            self._release_succeeded(time.monotonic() - start, len(batch))
+            return result
+
+    async def _acall_with_retries(
+        self, fn: Callable[[List[str]], Awaitable[List[T]]], batch: List[str]
+    ) -> List[T]:
+        attempt = 0
+        while True:
+            while (wait := self._try_acquire()) is not None:
+                await asyncio.sleep(wait)
+            start = time.monotonic()
+            try:
+                result = await fn(batch)
+            except Exception as e:
+                attempt += 1
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # Cancelled (`asyncio.CancelledError` isn't an `Exception`); just give the slot back
+                self._release_failed(None, None)
+                raise
+            self._release_succeeded(time.monotonic() - start, len(batch))
+            return result
+
+    def _retry_delay(self, e: Exception, attempt: int) -> Optional[float]:
+        """Record a failed request, and return how long to wait before retrying it, or None to give up."""
+        kind, retry_after = classify_error(e)
+        self._release_failed(kind, retry_after)
+        if kind is None or attempt >= MAX_ATTEMPTS:
+            return None
+        delay = backoff_delay(attempt, retry_after)
+        logger.warning(
+            f"Embedding request to {self.name} failed ({kind}), retrying in {delay:.1f}s: {e}"
+        )
+        return delay
+
+    def _acquire(self) -> None:
+        with self._condition:
+            while (wait := self._try_acquire()) is not None:
+                self._condition.wait(wait)
+
+    def _try_acquire(self) -> Optional[float]:
+        """Take a request slot if one is free, otherwise return how long to wait before trying again."""
+        with self._condition:
+            blocked_for = self._blocked_until - time.monotonic()
+            if blocked_for > 0:
+                return blocked_for
+            if self._in_flight >= int(self._concurrency):
+                return ASYNC_POLL_SECONDS
+            self._in_flight += 1
+            self._requests += 1
+            return None
+
+    def _release_succeeded(self, latency: float, texts: int) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            self._latency = (
+                latency
+                if self._latency is None
+                else (1 - LATENCY_SMOOTHING) * self._latency
+                + LATENCY_SMOOTHING * latency
+            )
+            bucket = max(texts, 1).bit_length()
+            best = min(latency, self._best_latency.get(bucket, latency))
+            self._best_latency[bucket] = best
+
+            if latency > LATENCY_FLOOR_SECONDS and latency > LATENCY_TOLERANCE * best:
+                self._decrease(SLOW_DECREASE, shrink_batches=False)
+            elif self._slow_start:
+                self._concurrency = min(self.max_concurrency, self._concurrency + 1)
+            else:
+                # Grows by about one request per round of requests at the current concurrency
+                self._concurrency = min(
+                    self.max_concurrency, self._concurrency + 1 / self._concurrency
+                )
+                self._batch_size = min(
+                    self.max_batch_size, self._batch_size + BATCH_SIZE_STEP
+                )
+            self._condition.notify_all()
+
+    def _release_failed(
+        self, kind: Optional[str], retry_after: Optional[float]
+    ) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            if kind == "throttled":
+                self._throttled += 1
+                if retry_after:
+                    self._blocked_until = max(
+                        self._blocked_until, time.monotonic() + retry_after
+                    )
+                self._decrease(THROTTLED_DECREASE, shrink_batches=False)
+            elif kind == "transient":
+                # Timeouts and server errors are often caused by requests that are too big
+                self._decrease(THROTTLED_DECREASE, shrink_batches=True)
+            if kind is not None:
+                self._retries += 1
+            self._condition.notify_all()
+
+    def _decrease(self, factor: float, shrink_batches: bool) -> None:
+        # All the requests in flight when the provider pushed back will report it; only react once per round trip
+        now = time.monotonic()
+        if now - self._last_decrease < (self._latency or 0):
+            return
+        self._last_decrease = now
+        self._slow_start = False
+        self._concurrency = max(1.0, self._concurrency * factor)
+        if shrink_batches:
+            self._batch_size = max(MIN_BATCH_SIZE, self._batch_size * factor)
+        logger.info(
+            f"Reduced embedding limits for {self.name} to {int(self._concurrency)} requests "
+            f"of {int(self._batch_size)} texts"
+        )
+
+
+def classify_error(e: Exception) -> Tuple[Optional[str], Optional[float]]:
+    """
+    Work out whether a failed request is worth retrying.
+
+    Returns "throttled", "transient" or None (don't retry), and the number of seconds the provider asked us to wait.
+    Handles the errors raised by httpx and the OpenAI client (which carry an httpx response), and by botocore.
+    """
+    status: Optional[int] = getattr(e, "status_code", None)
+    code: Optional[str] = None
+    headers: Mapping[str, Any] = {}
+    response = getattr(e, "response", None)
+    if isinstance(response, dict):
+        # botocore ClientError
+        code = response.get("Error", {}).get("Code")
+        metadata = response.get("ResponseMetadata", {})
+        status = metadata.get("HTTPStatusCode", status)
+        headers = metadata.get("HTTPHeaders", {})
+    elif response is not None:
+        status = getattr(response, "status_code", status)
+        headers = getattr(response, "headers", {}) or {}
+
+    retry_after = _retry_after(headers)
+    if status == 429 or code in THROTTLING_ERROR_CODES:
+        return "throttled", retry_after
+    if status in TRANSIENT_STATUS_CODES or isinstance(e, TRANSIENT_ERRORS):
+        return "transient", retry_after
+    return None, None
+
+
+def _retry_after(headers: Mapping[str, Any]) -> Optional[float]:
+    for name in ("retry-after", "Retry-After"):
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return max(0.0, float(value))
+            except (TypeError, ValueError):
+                # HTTP dates are allowed too, but no embedding provider we support sends them
+                return None
+    return None
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float]) -> float:
+    """Exponential backoff with full jitter, but never shorter than what the provider asked for."""
+    delay = random.uniform(
+        0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2**attempt)
+    )
+    return max(delay, retry_after or 0.0)
+
+
+_lock = threading.Lock()
+_limiters: Dict[str, AdaptiveLimiter] = {}
+
+
+def limiter_for(
+    model: BaseEmbedding, max_batch_size: int, max_batch_tokens: Optional[int] = None
+) -> AdaptiveLimiter:
+    name = model_namespace(model)
+    with _lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = _limiters[name] = AdaptiveLimiter(
+                name, settings.embedding_pool_size, max_batch_size, max_batch_tokens
+            )
+        elif (limiter.max_batch_size, limiter.max_batch_tokens) != (
+            max(MIN_BATCH_SIZE, max_batch_size),
+            max_batch_tokens,
+        ):
+            # The limits may have been changed in the environment since the limiter was created
+            limiter.set_batch_limits(max_batch_size, max_batch_tokens)
+        return limiter
+
+
+def all_limits() -> List[EmbeddingLimits]:
+    with _lock:
+        limiters = list(_limiters.values())
+    return [limiter.limits() for limiter in limiters]
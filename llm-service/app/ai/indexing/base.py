@@ -5,16 +5,20 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, Type, Optional
 
-from .readers.base_reader import BaseReader, ReaderConfig
+from llama_index.core.node_parser import SentenceSplitter
+
+from .parse_cache import ParseKey, file_hash, get_parse_cache
+from .readers.base_reader import BaseReader, ChunksResult, ReaderConfig
 from .readers.csv import CSVReader
 from .readers.docling_reader import DoclingReader
 from .readers.docx import DocxReader
 from .readers.images import ImagesReader
-from .readers.json import JSONReader
+from .readers.json import JSONLinesReader, JSONReader
 from .readers.markdown import MdReader
 from .readers.pdf import PDFReader
 from .readers.pptx import PptxReader
 from .readers.simple_file import SimpleFileReader
+from .worker_pools import ParseTask, parse
 from ...config import settings
 
 logger = logging.getLogger(__name__)
@@ -29,6 +33,8 @@ READERS: Dict[str, Type[BaseReader]] = {
     ".ppt": PptxReader,
     ".csv": CSVReader,
     ".json": JSONReader,
+    ".jsonl": JSONLinesReader,
+    ".ndjson": JSONLinesReader,
     ".jpg": ImagesReader,
     ".jpeg": ImagesReader,
     ".png": ImagesReader,
@@ -76,3 +82,51 @@ class BaseTextIndexer:
             raise NotSupportedFileExtensionError(file_extension)
 
         return reader_cls
+
+    def _parses_in_pool(self, reader_cls: Type[BaseReader]) -> bool:
+        """Whether a file read by this reader should be parsed in the parsing processes rather than in this one."""
+        if reader_cls.streams:
+            return False
+        config = self.reader_config or ReaderConfig()
+        return reader_cls.cpu_bound or config.block_secrets or config.anonymize_pii
+
+    def _parse_in_pool(
+        self,
+        reader_cls: Type[BaseReader],
+        file_path: Path,
+        document_id: str,
+        splitter: SentenceSplitter,
+    ) -> ChunksResult:
+        """
+        Parse a file on the parsing processes, or take the result of parsing the same file before from the parse cache.
+        """
+        cache = get_parse_cache()
+        key: Optional[ParseKey] = None
+        if cache is not None:
+            key = ParseKey(
+                content_hash=file_hash(file_path),
+                reader_cls=reader_cls,
+                chunk_size=splitter.chunk_size,
+                chunk_overlap=splitter.chunk_overlap,
+                reader_config=self.reader_config,
+                document_id=document_id,
+                data_source_id=self.data_source_id,
+            )
+            cached = cache.get(key)
+            if cached is not None:
+                logger.info(f"Using cached parse of {file_path}")
+                return cached
+
+        task = ParseTask(
+            reader_cls=reader_cls,
+            file_path=file_path,
+            document_id=document_id,
+            data_source_id=self.data_source_id,
+            chunk_size=splitter.chunk_size,
+            chunk_overlap=splitter.chunk_overlap,
+            reader_config=self.reader_config,
+        )
+        result = parse(task)
+        if cache is not None and key is not None:
+            cache.put(key, result)
+        return result
@@ -0,0 +1,215 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2025
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+
+"""
+Persistent, content-addressed cache of chunk embeddings.
+
+Embeddings are keyed by the embedding model and a hash of the chunk text, so re-indexing a document that only changed
+slightly only pays for the chunks that actually changed. The cache lives in a SQLite database under
+`RAG_DATABASES_DIR`, is bounded in size, and evicts the least recently used entries first.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional, Sequence
+
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from pydantic import BaseModel
+
+from ...config import settings
+
+logger = logging.getLogger(__name__)
+
+# When the cache grows past its limit, evict down to this fraction of it, so we aren't evicting on every insert.
+_EVICTION_LOW_WATERMARK = 0.9
+
+
+class EmbeddingCacheStats(BaseModel):
+    hits: int
+    misses: int
+    hit_rate: float
+    entries: int
+    size_bytes: int
+    max_size_bytes: int
+
+
+def model_namespace(embedding_model: BaseEmbedding) -> str:
+    """Identify the embedding model that produced an embedding, so vectors from different models never mix."""
+    return f"{type(embedding_model).__name__}/{embedding_model.model_name}"
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, path: str, max_size_bytes: int):
+        self.path = path
+        self.max_size_bytes = max_size_bytes
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                )
+                """
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+            )
+        self._size_bytes = self._stored_size()
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[Embedding]]:
+        """Look up embeddings for `texts`, returning None for every text that is not cached."""
+        hashes = [_text_hash(text) for text in texts]
+        found: Dict[str, Embedding] = {}
+        now = time.time()
+        with self._lock, self._connection:
+            unique_hashes = list(set(hashes))
+            # stay well under SQLite's limit on the number of bound parameters
+            for start in range(0, len(unique_hashes), 500):
+                batch = unique_hashes[start : start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._connection.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch],
+                ).fetchall()
+                for text_hash, vector in rows:
+                    found[text_hash] = array("d", vector).tolist()
+            self._connection.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(now, model, text_hash) for text_hash in found],
+            )
+            results = [found.get(text_hash) for text_hash in hashes]
+            hits = sum(1 for result in results if result is not None)
+            self._hits += hits
+            self._misses += len(results) - hits
+        return results
+
+    def put_many(
+        self, model: str, texts: Sequence[str], embeddings: Sequence[Embedding]
+    ) -> None:
+        now = time.time()
+        rows = [
+            (model, _text_hash(text), array("d", embedding).tobytes(), now)
+            for text, embedding in zip(texts, embeddings)
+        ]
+        with self._lock:
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+            self._size_bytes += sum(len(row[2]) for row in rows)
+            if self._size_bytes > self.max_size_bytes:
+                self._evict()
+
+    def _stored_size(self) -> int:
+        row = self._connection.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()
+        return int(row[0])
+
+    def _evict(self) -> None:
+        # Our running total is approximate (replaced rows and other processes sharing the file), so re-measure first.
+        self._size_bytes = self._stored_size()
+        target = int(self.max_size_bytes * _EVICTION_LOW_WATERMARK)
+        with self._connection:
+            while self._size_bytes > target:
+                rows = self._connection.execute(
+                    "SELECT rowid, LENGTH(vector) FROM embeddings ORDER BY last_used LIMIT 1000"
+                ).fetchall()
+                if not rows:
+                    break
+                evicted = []
+                for rowid, size in rows:
+                    if self._size_bytes <= target:
+                        break
+                    evicted.append((rowid,))
+                    self._size_bytes -= size
+                self._connection.executemany(
+                    "DELETE FROM embeddings WHERE rowid = ?", evicted
+                )
+        logger.debug(f"Evicted embeddings from cache, now {self._size_bytes} bytes")
+
+    def stats(self) -> EmbeddingCacheStats:
+        with self._lock:
+            entries = self._connection.execute(
+                "SELECT COUNT(*) FROM embeddings"
+            ).fetchone()[0]
+            lookups = self._hits + self._misses
+            return EmbeddingCacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                hit_rate=self._hits / lookups if lookups else 0.0,
+                entries=entries,
+                size_bytes=self._size_bytes,
+                max_size_bytes=self.max_size_bytes,
+            )
+
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Return the process-wide embedding cache, or None if caching is disabled."""
+    if not settings.embedding_cache_enabled:
+        return None
+    path = os.path.join(settings.rag_databases_dir, "embedding_cache.sqlite")
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = EmbeddingCache(path, settings.embedding_cache_max_bytes)
+            _caches[path] = cache
+        return cache
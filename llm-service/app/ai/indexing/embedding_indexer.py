@@ -36,10 +36,18 @@
 #  DATA.
 #
 
+import asyncio
+import hashlib
+import json
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import queue
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, wait
 from pathlib import Path
-from typing import Generator, List
+from typing import Any, Callable, Dict, Generator, Iterable, Iterator, List, Set
 
 from llama_index.core.base.embeddings.base import BaseEmbedding
 from llama_index.core.llms import LLM
@@ -48,12 +56,45 @@ from llama_index.core.schema import BaseNode, TextNode
 from typing_extensions import Optional
 
 from .base import BaseTextIndexer
-from .readers.base_reader import ReaderConfig, ChunksResult
+from .adaptive_limiter import AdaptiveLimiter, limiter_for
+from .embedding_cache import get_embedding_cache, model_namespace
+from .pipeline import (
+    BoundedQueue,
+    PipelineAborted,
+    PipelineStats,
+    StageRunner,
+    StageStats,
+    timed,
+)
+from .readers.base_reader import ChunksResult, ReaderConfig
+from .worker_pools import embedding_pool
 from ...ai.vector_stores.vector_store import VectorStore
-from ...services.utils import batch_sequence, flatten_sequence
+from ...config import settings
+from ...services import models
+from ...services.utils import batch_sequence
 
 logger = logging.getLogger(__name__)
 
+# How many batches of a single file can be waiting on the shared embedding pool at once
+EMBEDDING_BATCHES_IN_FLIGHT = 20
+UPSERT_BATCH_SIZE = 1000
+
+CHUNK_HASH_KEY = "chunk_hash"
+CHUNK_NUMBER_KEY = "chunk_number"
+# Positional metadata that shifts whenever content is inserted earlier in the document.
+# It is left out of the chunk hash so that such an insertion doesn't invalidate every later chunk.
+_UNHASHED_METADATA_KEYS = {CHUNK_NUMBER_KEY, CHUNK_HASH_KEY}
+
+
+def chunk_hash(chunk: TextNode) -> str:
+    metadata = {
+        key: value
+        for key, value in chunk.metadata.items()
+        if key not in _UNHASHED_METADATA_KEYS
+    }
+    content = json.dumps([chunk.text, metadata], sort_keys=True, default=str)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
 
 class EmbeddingIndexer(BaseTextIndexer):
     def __init__(
@@ -64,19 +105,222 @@ class EmbeddingIndexer(BaseTextIndexer):
         chunks_vector_store: VectorStore,
         llm: Optional[LLM],
         reader_config: Optional[ReaderConfig] = None,
+        use_parse_pool: Optional[bool] = None,
+        max_batch_size: Optional[int] = None,
+        max_batch_tokens: Optional[int] = None,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        before_write: Optional[Callable[[], None]] = None,
     ):
         super().__init__(data_source_id, reader_config)
+        self.use_parse_pool = use_parse_pool
+        # Most texts and tokens to send in one embedding request; texts default to the model's own batch size
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        # Called with the number of chunks read and written so far, each time chunks are written
+        self.on_progress = on_progress
+        # Called before each write to the vector store; raising from it stops indexing and rolls back what was written
+        self.before_write = before_write
         self.splitter = splitter
         self.embedding_model = embedding_model
         self.chunks_vector_store = chunks_vector_store
         self.llm = llm
+        # The batch endpoint indexes several files with one indexer at once, so each thread gets its own stats
+        self._local = threading.local()
+
+    @property
+    def pipeline_stats(self) -> Optional[PipelineStats]:
+        """Stats of the last file the calling thread indexed."""
+        return getattr(self._local, "pipeline_stats", None)
 
     def index_file(self, file_path: Path, document_id: str) -> None:
+        """
+        Read, embed and upsert a file as a streaming pipeline.
+
+        The reader, the embedding workers and the vector store writer each run concurrently, connected by bounded
+        queues. Upserts start as soon as the first batch of embeddings is available, and the number of chunks held in
+        memory is capped by the queue depth rather than by the size of the document.
+        """
+        try:
+            self._run_pipeline(file_path, document_id, existing_chunks={})
+        except BaseException:
+            # Don't leave a partially indexed document behind.
+            self.chunks_vector_store.delete_document(document_id)
+            raise
+
+    def reindex_file(self, file_path: Path, document_id: str) -> None:
+        """
+        Re-index a document by diffing its chunks against the ones already in the vector store.
+
+        Chunks whose hash is already stored are left alone, apart from their position in the document if it moved; new
+        or changed chunks are embedded and upserted, and stale chunks are only deleted once everything else has been
+        written, so the document stays searchable throughout.
+        """
+        existing_chunks = self.chunks_vector_store.get_chunk_metadata(
+            document_id, [CHUNK_HASH_KEY, CHUNK_NUMBER_KEY]
+        )
+        written: Set[str] = set()
+        try:
+            current = self._run_pipeline(
+                file_path, document_id, existing_chunks, written
+            )
+        except BaseException:
+            # Roll back to the previous version of the document.
+            if written:
+                self.chunks_vector_store.delete_chunks(list(written))
+            raise
+
+        # Content inserted or removed earlier in the document shifts the chunk numbers of the unchanged chunks after it
+        moved = {
+            chunk_id: {CHUNK_NUMBER_KEY: chunk_number}
+            for chunk_id, chunk_number in current.items()
+            if chunk_id in existing_chunks
+            and chunk_id not in written
+            and existing_chunks[chunk_id].get(CHUNK_NUMBER_KEY) != chunk_number
+        }
+        if moved:
+            self.chunks_vector_store.update_chunk_metadata(moved)
+        stale = [chunk_id for chunk_id in existing_chunks if chunk_id not in current]
+        if stale:
+            self.chunks_vector_store.delete_chunks(stale)
+        logger.info(
+            f"Re-indexed {file_path}: {len(written)} chunks written, "
+            f"{len(current) - len(written)} unchanged ({len(moved)} moved), {len(stale)} removed"
+        )
+
+    def _run_pipeline(
+        self,
+        file_path: Path,
+        document_id: str,
+        existing_chunks: Dict[str, Dict[str, Any]],
+        written: Optional[Set[str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Index every chunk of a file whose hash isn't in `existing_chunks`' metadata already.
+
+        Returns the IDs of all the chunks in the file with their chunk numbers, and records the IDs that were written
+        to the store in `written`.
+        """
         logger.debug(
             f"Indexing file: {file_path} with embedding model: {self.embedding_model.model_name}"
         )
 
+        parsed = ChunksResult()
+        chunk_source = self._chunk_source(file_path, document_id, parsed)
+
+        logger.debug(f"Parsing file: {file_path}")
+
+        stats = PipelineStats(
+            [StageStats("read"), StageStats("embed"), StageStats("upsert")]
+        )
+        self._local.pipeline_stats = stats
+        runner = StageRunner()
+        depth = settings.indexing_queue_depth
+        chunk_queue: BoundedQueue[Optional[List[TextNode]]] = runner.new_queue(depth)
+        embedded_queue: BoundedQueue[Optional[List[TextNode]]] = runner.new_queue(depth)
+        current: Dict[str, Any] = {}
+
+        def changed_chunks() -> Generator[TextNode, None, None]:
+            occurrences: Counter[str] = Counter()
+            for chunk in timed(stats.stage("read"), chunk_source):
+                content_hash = self._assign_stable_id(chunk, document_id, occurrences)
+                current[chunk.node_id] = chunk.metadata.get(CHUNK_NUMBER_KEY)
+                stored = existing_chunks.get(chunk.node_id, {})
+                if stored.get(CHUNK_HASH_KEY) == content_hash:
+                    continue
+                yield chunk
+
+        def read() -> None:
+            for batch in self._embedding_batches(changed_chunks()):
+                chunk_queue.put(batch)
+            chunk_queue.put(None)
+
+        def timed_embeddings(batch: List[TextNode]) -> List[TextNode]:
+            start = time.perf_counter()
+            embedded = self._compute_embeddings(batch)
+            stats.stage("embed").record(len(embedded), time.perf_counter() - start)
+            return embedded
+
+        async def atimed_embeddings(batch: List[TextNode]) -> List[TextNode]:
+            start = time.perf_counter()
+            embedded = await self._acompute_embeddings(batch)
+            stats.stage("embed").record(len(embedded), time.perf_counter() - start)
+            return embedded
+
+        use_async = models.Embedding.has_native_async(self.embedding_model)
+
+        def embed() -> None:
+            # Batches are embedded on the shared embedding pool; this stage only limits how many of this file's
+            # batches are in flight and hands finished ones to the writer.
+            pool = embedding_pool()
+            in_flight: Set[Future[List[TextNode]]] = set()
+
+            def drain(limit: int) -> None:
+                while len(in_flight) > limit:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        in_flight.remove(future)
+                        embedded_queue.put(future.result())
+
+            while (batch := chunk_queue.get()) is not None:
+                drain(EMBEDDING_BATCHES_IN_FLIGHT - 1)
+                if use_async:
+                    in_flight.add(pool.submit_async(atimed_embeddings, batch))
+                else:
+                    in_flight.add(pool.submit(timed_embeddings, batch))
+            drain(0)
+            embedded_queue.put(None)
+
+        started = time.perf_counter()
+        runner.start("indexing-reader", read)
+        runner.start("indexing-embedder", embed)
+
+        if written is None:
+            written = set()
+        try:
+            self._upsert_embedded(embedded_queue, stats, written)
+        except PipelineAborted:
+            pass
+        except BaseException as e:
+            runner.fail(e)
+
+        try:
+            runner.join()
+        finally:
+            stats.wall_seconds = time.perf_counter() - started
+
+        if parsed.secret_types is not None:
+            # Streaming readers only find secrets part way through; drop what was written before, as if the file had
+            # no chunks, like any other document with secrets
+            logger.warning(
+                f"Not indexing {file_path}, it contains secrets: {sorted(parsed.secret_types)}"
+            )
+            if written:
+                self.chunks_vector_store.delete_chunks(list(written))
+                written.clear()
+            return {}
+
+        if not current:
+            logger.warning(f"No chunks found in file: {file_path}")
+            return current
+
+        logger.info(f"Indexing file: {file_path} completed. {stats.describe()}")
+        return current
+
+    def _chunk_source(
+        self, file_path: Path, document_id: str, ret: ChunksResult
+    ) -> Iterator[TextNode]:
+        """Return the chunks of a file, recording in `ret` whether secrets were found and PII anonymized."""
         reader_cls = self._get_reader_class(file_path)
+        use_parse_pool = self.use_parse_pool
+        if use_parse_pool is None or reader_cls.streams:
+            use_parse_pool = self._parses_in_pool(reader_cls)
+        if use_parse_pool:
+            result = self._parse_in_pool(
+                reader_cls, file_path, document_id, self.splitter
+            )
+            ret.secret_types = result.secret_types
+            ret.pii_found = result.pii_found
+            return iter(result.chunks)
 
         reader = reader_cls(
             splitter=self.splitter,
@@ -84,52 +328,163 @@ class EmbeddingIndexer(BaseTextIndexer):
             data_source_id=self.data_source_id,
             config=self.reader_config,
         )
+        return reader.iter_chunks(file_path, ret)
 
-        logger.debug(f"Parsing file: {file_path}")
+    @staticmethod
+    def _assign_stable_id(
+        chunk: TextNode, document_id: str, occurrences: "Counter[str]"
+    ) -> str:
+        """
+        Give the chunk an ID derived from its content, so an unchanged chunk keeps its ID across re-indexing.
 
-        chunks: ChunksResult = reader.load_chunks(file_path)
+        Identical chunks within a document are told apart by how many times the same content has been seen before.
+        """
+        content_hash = chunk_hash(chunk)
+        ordinal = occurrences[content_hash]
+        occurrences[content_hash] += 1
+        chunk.id_ = str(
+            uuid.uuid5(uuid.NAMESPACE_OID, f"{document_id}/{content_hash}/{ordinal}")
+        )
+        chunk.metadata[CHUNK_HASH_KEY] = content_hash
+        for excluded_keys in (
+            chunk.excluded_embed_metadata_keys,
+            chunk.excluded_llm_metadata_keys,
+        ):
+            if CHUNK_HASH_KEY not in excluded_keys:
+                excluded_keys.append(CHUNK_HASH_KEY)
+        return content_hash
 
-        nodes: list[TextNode] = chunks.chunks
-        if not nodes:
-            logger.warning(f"No chunks found in file: {file_path}")
+    def _upsert_embedded(
+        self,
+        embedded_queue: BoundedQueue[Optional[List[TextNode]]],
+        pipeline_stats: PipelineStats,
+        written: Set[str],
+    ) -> None:
+        stats = pipeline_stats.stage("upsert")
+        chunks_vector_store = self.chunks_vector_store.llama_vector_store()
+        done = False
+        while not done:
+            batch = embedded_queue.get()
+            if batch is None:
+                return
+            # Write whatever else is already embedded in the same round-trip, without waiting for more.
+            pending = list(batch)
+            try:
+                while len(pending) < UPSERT_BATCH_SIZE:
+                    more = embedded_queue.get_nowait()
+                    if more is None:
+                        done = True
+                        break
+                    pending.extend(more)
+            except queue.Empty:
+                pass
+
+            start = time.perf_counter()
+            # We have to explicitly convert here even though the types are compatible (TextNode inherits from BaseNode)
+            # because the "add" annotation uses List instead of Sequence. We need to use TextNode explicitly because
+            # we're capturing "text".
+            converted_chunks: List[BaseNode] = [chunk for chunk in pending]
+            if self.before_write is not None:
+                self.before_write()
+            written.update(chunk.node_id for chunk in pending)
+            chunks_vector_store.add(converted_chunks)
+            stats.record(len(pending), time.perf_counter() - start)
+            logger.debug(f"Added {stats.items} chunks to vector store")
+            if self.on_progress is not None:
+                self.on_progress(pipeline_stats.stage("read").items, stats.items)
+
+    def _embedding_batches(
+        self, chunks: Iterable[TextNode]
+    ) -> Generator[List[TextNode], None, None]:
+        """
+        Group chunks into batches that can each be embedded with one request: as many chunks as fit the token budget,
+        and no more than the provider takes in one request.
+        """
+        max_batch_size = self.max_batch_size or self.embedding_model.embed_batch_size
+        if self.max_batch_tokens is None:
+            yield from batch_sequence(chunks, max_batch_size)
             return
+        batch: List[TextNode] = []
+        tokens = 0
+        for chunk in chunks:
+            (chunk_tokens,) = self._token_counts([chunk.text])
+            if batch and (
+                len(batch) == max_batch_size
+                or tokens + chunk_tokens > self.max_batch_tokens
+            ):
+                yield batch
+                batch = []
+                tokens = 0
+            batch.append(chunk)
+            tokens += chunk_tokens
+        if batch:
+            yield batch
 
-        logger.debug(f"Embedding {len(nodes)} chunks")
+    def _token_counts(self, texts: List[str]) -> List[int]:
+        # Count with the tokenizer the chunks were sized with, so a full chunk counts as `chunk_size` tokens
+        tokenizer = self.splitter._tokenizer
+        return [len(tokenizer(text)) for text in texts]
 
-        chunks_with_embeddings = flatten_sequence(self._compute_embeddings(nodes))
+    def _compute_embeddings(self, chunks: List[TextNode]) -> List[TextNode]:
+        texts = [chunk.text for chunk in chunks]
+        cache = get_embedding_cache()
+        model = model_namespace(self.embedding_model)
+        embeddings = cache.get_many(model, texts) if cache else [None] * len(texts)
 
-        acc = 0
-        for chunk_batch in batch_sequence(chunks_with_embeddings, 1000):
-            acc += len(chunk_batch)
-            logger.debug(f"Adding {acc}/{len(nodes)} chunks to vector store")
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            computed = self._limiter().call(
+                lambda batch: self._model_for(batch).get_text_embedding_batch(batch),
+                missing_texts,
+                self._token_counts(missing_texts) if self.max_batch_tokens else None,
+            )
+            for i, embedding in zip(missing, computed):
+                embeddings[i] = embedding
+            if cache:
+                cache.put_many(model, missing_texts, computed)
 
-            # We have to explicitly convert here even though the types are compatible (TextNode inherits from BaseNode)
-            # because the "add" annotation uses List instead of Sequence. We need to use TextNode explicitly because
-            # we're capturing "text".
-            converted_chunks: List[BaseNode] = [chunk for chunk in chunk_batch]
+        for chunk, embedding in zip(chunks, embeddings):
+            chunk.embedding = embedding
+        return chunks
 
-            chunks_vector_store = self.chunks_vector_store.llama_vector_store()
-            chunks_vector_store.add(converted_chunks)
+    async def _acompute_embeddings(self, chunks: List[TextNode]) -> List[TextNode]:
+        texts = [chunk.text for chunk in chunks]
+        cache = get_embedding_cache()
+        model = model_namespace(self.embedding_model)
+        embeddings = (
+            await asyncio.to_thread(cache.get_many, model, texts)
+            if cache
+            else [None] * len(texts)
+        )
 
-        logger.debug(f"Indexing file: {file_path} completed")
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            computed = await self._limiter().acall(
+                lambda batch: self._model_for(batch).aget_text_embedding_batch(batch),
+                missing_texts,
+                self._token_counts(missing_texts) if self.max_batch_tokens else None,
+            )
+            for i, embedding in zip(missing, computed):
+                embeddings[i] = embedding
+            if cache:
+                await asyncio.to_thread(cache.put_many, model, missing_texts, computed)
 
-    def _compute_embeddings(
-        self, chunks: List[TextNode]
-    ) -> Generator[List[TextNode], None, None]:
-        batched_chunks = list(batch_sequence(chunks, 100))
-        batched_texts = [[chunk.text for chunk in batch] for batch in batched_chunks]
-
-        with ThreadPoolExecutor(max_workers=20) as executor:
-            futures = [
-                executor.submit(
-                    lambda b: (i, self.embedding_model.get_text_embedding_batch(b)),
-                    batch,
-                )
-                for i, batch in enumerate(batched_texts)
-            ]
-            logger.debug(f"Waiting for {len(futures)} futures")
-            for future in as_completed(futures):
-                i, batch_embeddings = future.result()
-                for chunk, embedding in zip(batched_chunks[i], batch_embeddings):
-                    chunk.embedding = embedding
-                yield batched_chunks[i]
+        for chunk, embedding in zip(chunks, embeddings):
+            chunk.embedding = embedding
+        return chunks
+
+    def _limiter(self) -> AdaptiveLimiter:
+        return limiter_for(
+            self.embedding_model,
+            self.max_batch_size or self.embedding_model.embed_batch_size,
+            self.max_batch_tokens,
+        )
+
+    def _model_for(self, texts: List[str]) -> BaseEmbedding:
+        # The model splits its input into batches of `embed_batch_size`; the limiter has already sized this batch
+        # for one request, which may be bigger when the texts are short
+        if len(texts) <= self.embedding_model.embed_batch_size:
+            return self.embedding_model
+        return self.embedding_model.model_copy(update={"embed_batch_size": len(texts)})
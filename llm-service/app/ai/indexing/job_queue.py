@@ -0,0 +1,454 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2025
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+"""
+Persistent queue of background indexing jobs.
+
+Indexing a document inside the request that asks for it ties up a request handler for as long as parsing and embedding
+take, which can be long enough for proxies to time out, and a restart loses whatever was in progress. Jobs are instead
+recorded in a SQLite database under `RAG_DATABASES_DIR` and run by worker threads that are separate from the request
+path. Jobs run in priority order, with a limit on how many jobs of the same data source run at once, and failed jobs
+are retried with exponential backoff. A running job is leased to the queue that claimed it, which renews the lease
+while the job runs; any queue sharing the database queues the job again once its lease runs out, so the jobs of a
+process that stopped are picked up again without taking over those of processes that are still running them.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Literal, Optional, Set
+
+from pydantic import BaseModel
+
+from ...config import settings
+
+logger = logging.getLogger(__name__)
+
+JobStatus = Literal["queued", "running", "succeeded", "failed"]
+
+# How often idle workers look for jobs whose retry delay has passed
+POLL_SECONDS = 1.0
+
+# A running job is queued again if its queue hasn't renewed its lease for this long
+LEASE_SECONDS = 60.0
+
+# Finished jobs are forgotten after this long
+RETENTION_SECONDS = 7 * 24 * 60 * 60
+
+# Error of jobs whose last attempt was interrupted
+_INTERRUPTED = "The indexing process stopped while running the job"
+
+
+class IndexingJob(BaseModel):
+    id: int
+    data_source_id: int
+    document_id: str
+    priority: int
+    status: JobStatus
+    attempts: int
+    max_attempts: int
+    chunks_read: int
+    chunks_written: int
+    error: Optional[str]
+    created_at: float
+    updated_at: float
+    payload: Dict[str, Any]
+
+
+class IndexingJobsReport(BaseModel):
+    queued: int
+    running: int
+    succeeded: int
+    failed: int
+    jobs: List[IndexingJob]
+
+
+class JobFailed(Exception):
+    """Raised by job handlers for failures that retrying won't fix."""
+
+
+class JobCancelled(Exception):
+    """Raised by `JobQueue.check_active` once a running job has been deleted, or taken over by another queue."""
+
+
+ProgressCallback = Callable[[int, int], None]
+JobHandler = Callable[[IndexingJob, ProgressCallback], None]
+
+_COLUMNS = (
+    "id, data_source_id, document_id, priority, status, attempts, max_attempts, chunks_read, chunks_written, error, "
+    "created_at, updated_at, payload"
+)
+
+
+def _job(row: sqlite3.Row) -> IndexingJob:
+    values = dict(row)
+    values["payload"] = json.loads(values["payload"])
+    return IndexingJob.model_validate(values)
+
+
+class JobQueue:
+    def __init__(
+        self,
+        path: str,
+        workers: int,
+        jobs_per_data_source: int,
+        max_attempts: int,
+        retry_seconds: float,
+    ):
+        self.path = path
+        self.workers = workers
+        self.jobs_per_data_source = jobs_per_data_source
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        # Identifies the jobs this queue holds the lease of
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex}"
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        # IDs of the jobs this queue's workers are running
+        self._running: Set[int] = set()
+        self._running_lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Transactions are managed explicitly, so that claiming a job is one atomic step
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, timeout=30, isolation_level=None
+        )
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        with self._transaction() as connection:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    data_source_id INTEGER NOT NULL,
+                    document_id TEXT NOT NULL,
+                    priority INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    chunks_read INTEGER NOT NULL DEFAULT 0,
+                    chunks_written INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    run_after REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    payload TEXT NOT NULL,
+                    owner TEXT,
+                    lease_until REAL
+                )
+                """
+            )
+            columns = {
+                row["name"] for row in connection.execute("PRAGMA table_info(jobs)")
+            }
+            for column in ("owner TEXT", "lease_until REAL"):
+                if column.split()[0] not in columns:
+                    connection.execute(f"ALTER TABLE jobs ADD COLUMN {column}")
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, priority, id)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_data_source ON jobs (data_source_id, status)"
+            )
+
+    def enqueue(
+        self,
+        data_source_id: int,
+        document_id: str,
+        payload: Dict[str, Any],
+        priority: int = 0,
+    ) -> IndexingJob:
+        """Add a job; jobs with a higher priority run first, and jobs with the same priority in order."""
+        now = time.time()
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "INSERT INTO jobs (data_source_id, document_id, priority, status, max_attempts, run_after, created_at, "
+                "updated_at, payload) VALUES (?, ?, ?, 'queued', ?, ?, ?, ?, ?)",
+                (
+                    data_source_id,
+                    document_id,
+                    priority,
+                    self.max_attempts,
+                    now,
+                    now,
+                    now,
+                    json.dumps(payload),
+                ),
+            )
+            job_id = cursor.lastrowid
+        with self._wakeup:
+            self._wakeup.notify()
+        job = self.get(job_id or 0)
+        assert job is not None
+        return job
+
+    def get(self, job_id: int) -> Optional[IndexingJob]:
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return _job(row) if row is not None else None
+
+    def report(self, data_source_id: int, limit: int = 100) -> IndexingJobsReport:
+        """Count the data source's jobs by status, and list the most recent ones."""
+        with self._lock:
+            counts = dict(
+                self._connection.execute(
+                    "SELECT status, COUNT(*) FROM jobs WHERE data_source_id = ? GROUP BY status",
+                    (data_source_id,),
+                ).fetchall()
+            )
+            rows = self._connection.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE data_source_id = ? ORDER BY id DESC LIMIT ?",
+                (data_source_id, limit),
+            ).fetchall()
+        return IndexingJobsReport(
+            queued=counts.get("queued", 0),
+            running=counts.get("running", 0),
+            succeeded=counts.get("succeeded", 0),
+            failed=counts.get("failed", 0),
+            jobs=[_job(row) for row in rows],
+        )
+
+    def delete_data_source(self, data_source_id: int) -> None:
+        """Forget a data source's jobs. Jobs that are already running stop the next time they check `check_active`."""
+        with self._transaction() as connection:
+            connection.execute(
+                "DELETE FROM jobs WHERE data_source_id = ?", (data_source_id,)
+            )
+
+    def delete_documents(self, data_source_id: int, document_ids: List[str]) -> None:
+        """Forget the jobs of some of a data source's documents, the same way as `delete_data_source`."""
+        with self._transaction() as connection:
+            connection.executemany(
+                "DELETE FROM jobs WHERE data_source_id = ? AND document_id = ?",
+                [(data_source_id, document_id) for document_id in document_ids],
+            )
+
+    def check_active(self, job: IndexingJob) -> None:
+        """
+        Raise `JobCancelled` if the job is no longer this queue's to run.
+
+        Handlers call this before each write, so that a job whose document or data source was deleted while it ran
+        doesn't write its chunks back afterwards.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM jobs WHERE id = ? AND status = 'running' AND owner = ?",
+                (job.id, self.owner),
+            ).fetchone()
+        if row is None:
+            raise JobCancelled(f"Indexing job {job.id} was cancelled")
+
+    def start(self, handler: JobHandler) -> None:
+        """Start the workers, and the thread that renews the leases of the jobs they run."""
+        with self._transaction() as connection:
+            connection.execute(
+                "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND updated_at < ?",
+                (time.time() - RETENTION_SECONDS,),
+            )
+
+        self._stopping.clear()
+        thread = threading.Thread(
+            target=self._renew_leases, name="indexing-job-leases", daemon=True
+        )
+        thread.start()
+        self._threads.append(thread)
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._work,
+                args=(handler,),
+                name=f"indexing-job-{i}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        """Stop taking new jobs. Jobs in progress are left running, and keep their leases until they finish."""
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        self._threads = []
+
+    def _work(self, handler: JobHandler) -> None:
+        while not self._stopping.is_set():
+            job = self._claim()
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(timeout=POLL_SECONDS)
+                continue
+            self._run(job, handler)
+            # Finishing a job may let another job of the same data source run
+            with self._wakeup:
+                self._wakeup.notify()
+
+    def _renew_leases(self) -> None:
+        # Jobs still running after `stop` keep their leases, so no other queue runs them at the same time
+        while not self._stopping.is_set() or self._running:
+            with self._running_lock:
+                running = list(self._running)
+            if running:
+                with self._transaction() as connection:
+                    connection.executemany(
+                        "UPDATE jobs SET lease_until = ? WHERE id = ? AND owner = ?",
+                        [
+                            (time.time() + LEASE_SECONDS, job_id, self.owner)
+                            for job_id in running
+                        ],
+                    )
+            time.sleep(LEASE_SECONDS / 4)
+
+    def _claim(self) -> Optional[IndexingJob]:
+        now = time.time()
+        with self._transaction() as connection:
+            # The queue running these stopped without finishing them; jobs from before leases were recorded have none.
+            # The interrupted run counts as an attempt, so a document that crashes the process isn't retried forever.
+            recovered = connection.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END, "
+                "error = CASE WHEN attempts < max_attempts THEN error ELSE ? END, owner = NULL, updated_at = ? "
+                "WHERE status = 'running' AND COALESCE(lease_until, 0) < ?",
+                (_INTERRUPTED, now, now),
+            ).rowcount
+            if recovered:
+                logger.info(f"Recovered {recovered} interrupted indexing jobs")
+            row = connection.execute(
+                f"""
+                SELECT {_COLUMNS} FROM jobs AS job
+                WHERE status = 'queued' AND run_after <= ? AND (
+                    SELECT COUNT(*) FROM jobs AS running
+                    WHERE running.data_source_id = job.data_source_id AND running.status = 'running'
+                ) < ?
+                ORDER BY priority DESC, id
+                LIMIT 1
+                """,
+                (now, self.jobs_per_data_source),
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, chunks_read = 0, chunks_written = 0, "
+                "owner = ?, lease_until = ?, updated_at = ? WHERE id = ?",
+                (self.owner, now + LEASE_SECONDS, now, row["id"]),
+            )
+            with self._running_lock:
+                self._running.add(row["id"])
+        job = _job(row)
+        return job.model_copy(
+            update={"status": "running", "attempts": job.attempts + 1}
+        )
+
+    def _run(self, job: IndexingJob, handler: JobHandler) -> None:
+        def progress(chunks_read: int, chunks_written: int) -> None:
+            with self._transaction() as connection:
+                connection.execute(
+                    "UPDATE jobs SET chunks_read = ?, chunks_written = ?, updated_at = ? WHERE id = ? AND owner = ?",
+                    (chunks_read, chunks_written, time.time(), job.id, self.owner),
+                )
+
+        logger.info(
+            f"Running indexing job {job.id} for document {job.document_id} of data source {job.data_source_id}, "
+            f"attempt {job.attempts} of {job.max_attempts}"
+        )
+        try:
+            handler(job, progress)
+        except JobCancelled:
+            logger.info(f"Indexing job {job.id} was cancelled")
+        except Exception as e:
+            retry = not isinstance(e, JobFailed) and job.attempts < job.max_attempts
+            logger.exception(
+                f"Indexing job {job.id} failed{', will retry' if retry else ''}"
+            )
+            self._finish(job, error=str(e) or type(e).__name__, retry=retry)
+        else:
+            self._finish(job, error=None, retry=False)
+        finally:
+            with self._running_lock:
+                self._running.discard(job.id)
+
+    def _finish(self, job: IndexingJob, error: Optional[str], retry: bool) -> None:
+        now = time.time()
+        if retry:
+            status = "queued"
+            run_after = now + self.retry_seconds * 2 ** (job.attempts - 1)
+        else:
+            status = "failed" if error is not None else "succeeded"
+            run_after = now
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, error = ?, run_after = ?, owner = NULL, updated_at = ? "
+                "WHERE id = ? AND status = 'running' AND owner = ?",
+                (status, error, run_after, now, job.id, self.owner),
+            )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._connection
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+
+_queues: Dict[str, JobQueue] = {}
+_queues_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Return the process-wide indexing job queue."""
+    path = os.path.join(settings.rag_databases_dir, "indexing_jobs.sqlite")
+    with _queues_lock:
+        queue = _queues.get(path)
+        if queue is None:
+            queue = JobQueue(
+                path,
+                workers=settings.indexing_job_workers,
+                jobs_per_data_source=settings.indexing_jobs_per_data_source,
+                max_attempts=settings.indexing_job_max_attempts,
+                retry_seconds=settings.indexing_job_retry_seconds,
+            )
+            _queues[path] = queue
+        return queue
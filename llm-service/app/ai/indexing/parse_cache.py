@@ -0,0 +1,247 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2025
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+"""
+On-disk cache of parsed documents.
+
+Parsing is the most expensive part of ingesting a document that isn't plain text: Docling, PDF extraction, PII
+anonymization and secret scanning can take minutes for a large file. The same document is parsed again when it is
+re-indexed, when a failed request is retried, and when it is summarized after it has been indexed. Results are keyed by
+a hash of the file's contents and everything else that determines the chunks, so an unchanged file is only parsed once.
+The cache lives under `RAG_DATABASES_DIR`, is bounded in size, and forgets entries after a while.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+from .readers.base_reader import BaseReader, ChunksResult, ReaderConfig
+from ...config import settings
+
+logger = logging.getLogger(__name__)
+
+_SUFFIX = ".chunks"
+
+# When the cache grows past its limit, evict down to this fraction of it, so we aren't evicting on every insert.
+_EVICTION_LOW_WATERMARK = 0.9
+
+_READ_SIZE = 1024 * 1024
+
+
+class ParseCacheStats(BaseModel):
+    hits: int
+    misses: int
+    hit_rate: float
+    entries: int
+    size_bytes: int
+    max_size_bytes: int
+    ttl_seconds: int
+
+
+@dataclass(frozen=True)
+class ParseKey:
+    """Everything that determines the chunks a file is parsed into."""
+
+    content_hash: str
+    reader_cls: Type[BaseReader]
+    chunk_size: int
+    chunk_overlap: int
+    reader_config: Optional[ReaderConfig]
+    document_id: str
+    data_source_id: int
+
+    def digest(self) -> str:
+        reader = f"{self.reader_cls.__module__}.{self.reader_cls.__qualname__}"
+        config = self.reader_config or ReaderConfig()
+        parts = [
+            self.content_hash,
+            reader,
+            str(self.chunk_size),
+            str(self.chunk_overlap),
+            str(config.block_secrets),
+            str(config.anonymize_pii),
+            self.document_id,
+            str(self.data_source_id),
+        ]
+        return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def file_hash(file_path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while block := f.read(_READ_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    def __init__(self, directory: str, max_size_bytes: int, ttl_seconds: int):
+        self.directory = directory
+        self.max_size_bytes = max_size_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self._size_bytes = sum(size for _, _, size in self._entries())
+
+    def get(self, key: ParseKey) -> Optional[ChunksResult]:
+        path = self._path(key)
+        try:
+            written = os.stat(path).st_mtime
+            if time.time() - written > self.ttl_seconds:
+                self._remove(path)
+                result = None
+            else:
+                with open(path, "rb") as f:
+                    result = pickle.load(f)
+        except FileNotFoundError:
+            result = None
+        except Exception:
+            # A truncated or stale entry is just a miss
+            logger.exception(f"Failed to read parse cache entry {path}")
+            self._remove(path)
+            result = None
+
+        with self._lock:
+            if result is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        return result
+
+    def put(self, key: ParseKey, result: ChunksResult) -> None:
+        path = self._path(key)
+        data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        # Write to a temporary file and rename it into place, so readers never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+        with self._lock:
+            self._size_bytes += len(data)
+            if self._size_bytes > self.max_size_bytes:
+                self._evict()
+
+    def stats(self) -> ParseCacheStats:
+        entries = self._entries()
+        with self._lock:
+            lookups = self._hits + self._misses
+            return ParseCacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                hit_rate=self._hits / lookups if lookups else 0.0,
+                entries=len(entries),
+                size_bytes=sum(size for _, _, size in entries),
+                max_size_bytes=self.max_size_bytes,
+                ttl_seconds=self.ttl_seconds,
+            )
+
+    def _path(self, key: ParseKey) -> str:
+        return os.path.join(self.directory, key.digest() + _SUFFIX)
+
+    def _entries(self) -> List[Tuple[float, str, int]]:
+        """Return the (written time, path, size) of every entry."""
+        entries: List[Tuple[float, str, int]] = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(_SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, entry.path, stat.st_size))
+        return entries
+
+    def _evict(self) -> None:
+        # Our running total is approximate (replaced entries and other processes sharing the directory), so
+        # re-measure first. Expired entries go first, then the oldest ones.
+        entries = sorted(self._entries())
+        self._size_bytes = sum(size for _, _, size in entries)
+        target = int(self.max_size_bytes * _EVICTION_LOW_WATERMARK)
+        expired_before = time.time() - self.ttl_seconds
+        for written, path, size in entries:
+            if self._size_bytes <= target and written >= expired_before:
+                break
+            self._remove(path)
+            self._size_bytes -= size
+        logger.debug(
+            f"Evicted parsed documents from cache, now {self._size_bytes} bytes"
+        )
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+_caches: Dict[str, ParseCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_parse_cache() -> Optional[ParseCache]:
+    """Return the process-wide parse cache, or None if caching is disabled."""
+    if not settings.parse_cache_enabled:
+        return None
+    directory = os.path.join(settings.rag_databases_dir, "parse_cache")
+    with _caches_lock:
+        cache = _caches.get(directory)
+        if cache is None:
+            cache = ParseCache(
+                directory,
+                settings.parse_cache_max_bytes,
+                settings.parse_cache_ttl_seconds,
+            )
+            _caches[directory] = cache
+        return cache
@@ -0,0 +1,190 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2025
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+
+"""Bounded-queue plumbing for running indexing stages concurrently."""
+
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Generic, Iterator, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_POLL_INTERVAL_SECONDS = 0.1
+
+
+class PipelineAborted(Exception):
+    """Raised inside a stage when another stage has already failed."""
+
+
+@dataclass
+class StageStats:
+    name: str
+    items: int = 0
+    busy_seconds: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, items: int, seconds: float) -> None:
+        with self._lock:
+            self.items += items
+            self.busy_seconds += seconds
+
+    @property
+    def throughput(self) -> float:
+        """Items per second of time spent doing work in this stage."""
+        if self.busy_seconds == 0:
+            return 0.0
+        return self.items / self.busy_seconds
+
+
+@dataclass
+class PipelineStats:
+    stages: List[StageStats]
+    wall_seconds: float = 0.0
+
+    def stage(self, name: str) -> StageStats:
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        raise KeyError(name)
+
+    def describe(self) -> str:
+        parts = [
+            f"{stage.name}: {stage.items} items in {stage.busy_seconds:.2f}s ({stage.throughput:.1f}/s)"
+            for stage in self.stages
+        ]
+        return f"{'; '.join(parts)}; wall time {self.wall_seconds:.2f}s"
+
+
+class BoundedQueue(Generic[T]):
+    """
+    A bounded hand-off between two pipeline stages.
+
+    Producers block while the queue is full, which is what caps memory usage: a fast reader can never get more than
+    `maxsize` items ahead of the embedder. Blocking calls wake up periodically so that a failure in any stage can abort
+    the whole pipeline instead of deadlocking it.
+    """
+
+    def __init__(self, maxsize: int, abort: threading.Event):
+        self._queue: "queue.Queue[T]" = queue.Queue(maxsize=maxsize)
+        self._abort = abort
+
+    def put(self, item: T) -> None:
+        while True:
+            if self._abort.is_set():
+                raise PipelineAborted()
+            try:
+                self._queue.put(item, timeout=_POLL_INTERVAL_SECONDS)
+                return
+            except queue.Full:
+                continue
+
+    def get(self) -> T:
+        while True:
+            if self._abort.is_set():
+                raise PipelineAborted()
+            try:
+                return self._queue.get(timeout=_POLL_INTERVAL_SECONDS)
+            except queue.Empty:
+                continue
+
+    def get_nowait(self) -> T:
+        """Return an item if one is ready, otherwise raise `queue.Empty`."""
+        return self._queue.get_nowait()
+
+
+class StageRunner:
+    """
+    Runs pipeline stages on background threads, and propagates the first failure.
+
+    Any exception raised in a stage sets the shared abort flag, which unblocks every other stage waiting on a
+    `BoundedQueue`. `join` re-raises the original exception in the calling thread.
+    """
+
+    def __init__(self) -> None:
+        self.abort = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._error: Optional[BaseException] = None
+        self._error_lock = threading.Lock()
+
+    def new_queue(self, maxsize: int) -> BoundedQueue[T]:
+        return BoundedQueue(maxsize, self.abort)
+
+    def start(self, name: str, target: Callable[[], None]) -> None:
+        thread = threading.Thread(
+            target=self._run, args=(target,), name=name, daemon=True
+        )
+        self._threads.append(thread)
+        thread.start()
+
+    def fail(self, error: BaseException) -> None:
+        with self._error_lock:
+            if self._error is None:
+                self._error = error
+        self.abort.set()
+
+    def _run(self, target: Callable[[], None]) -> None:
+        try:
+            target()
+        except PipelineAborted:
+            pass
+        except BaseException as e:
+            logger.exception("Indexing pipeline stage failed")
+            self.fail(e)
+
+    def join(self) -> None:
+        for thread in self._threads:
+            thread.join()
+        if self._error is not None:
+            raise self._error
+
+
+def timed(stats: StageStats, items: Iterator[T]) -> Iterator[T]:
+    """Wrap a producer so the time spent generating each item is attributed to `stats`."""
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(items)
+        except StopIteration:
+            return
+        stats.record(1, time.perf_counter() - start)
+        yield item
@@ -1,16 +1,12 @@
-import os
-import tempfile
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Optional, Set
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Union
 
-from detect_secrets.core.secrets_collection import SecretsCollection
-from detect_secrets.settings import default_settings
 from llama_index.core.node_parser import SentenceSplitter
-from llama_index.core.schema import Document, TextNode, BaseNode
-from presidio_analyzer import AnalyzerEngine
-from presidio_anonymizer import AnonymizerEngine
+from llama_index.core.schema import Document, TextNode, BaseNode, RelatedNodeInfo
+from .pii import anonymize
+from .secret_scanner import scan_texts
 
 
 @dataclass
@@ -27,8 +23,125 @@ class ChunksResult:
     # If true, the chunks contained PII and the chunks contain anonymized text
     pii_found: bool = False
 
+    # Results are pickled to come back from the parsing processes. Pickling the nodes as-is sends every default
+    # template and a copy of the document metadata for each relationship of each chunk, so they are packed first.
+    def __getstate__(self) -> Dict[str, Any]:
+        return {
+            "chunks": _pack_chunks(self.chunks),
+            "secret_types": self.secret_types,
+            "pii_found": self.pii_found,
+        }
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.chunks = _unpack_chunks(*state["chunks"])
+        self.secret_types = state["secret_types"]
+        self.pii_found = state["pii_found"]
+
+
+# Fields of a TextNode that are always packed; any other field is only sent if it differs from its default
+_PACKED_FIELDS = {
+    "id_",
+    "text",
+    "metadata",
+    "start_char_idx",
+    "end_char_idx",
+    "relationships",
+}
+
+_PackedRelated = Tuple[str, Any, int, Optional[str]]
+
+
+def _pack_chunks(
+    chunks: List[TextNode],
+) -> Tuple[List[Dict[str, Any]], List[Tuple[Any, ...]]]:
+    # Metadata dicts are stored once and referenced by position
+    metadatas: List[Dict[str, Any]] = []
+    positions: Dict[str, int] = {}
+
+    def metadata_ref(metadata: Dict[str, Any]) -> int:
+        key = repr(metadata)
+        if key not in positions:
+            positions[key] = len(metadatas)
+            metadatas.append(metadata)
+        return positions[key]
+
+    def pack_related(info: RelatedNodeInfo) -> _PackedRelated:
+        return info.node_id, info.node_type, metadata_ref(info.metadata), info.hash
+
+    packed: List[Tuple[Any, ...]] = []
+    for chunk in chunks:
+        relationships: Dict[Any, Union[_PackedRelated, List[_PackedRelated]]] = {
+            relationship: (
+                [pack_related(info) for info in related]
+                if isinstance(related, list)
+                else pack_related(related)
+            )
+            for relationship, related in chunk.relationships.items()
+        }
+        extra = {
+            name: getattr(chunk, name)
+            for name, model_field in TextNode.model_fields.items()
+            if name not in _PACKED_FIELDS
+            and getattr(chunk, name)
+            != model_field.get_default(call_default_factory=True)
+        }
+        packed.append(
+            (
+                chunk.id_,
+                chunk.text,
+                metadata_ref(chunk.metadata),
+                chunk.start_char_idx,
+                chunk.end_char_idx,
+                relationships,
+                extra,
+            )
+        )
+    return metadatas, packed
+
+
+def _unpack_chunks(
+    metadatas: List[Dict[str, Any]], packed: List[Tuple[Any, ...]]
+) -> List[TextNode]:
+    def unpack_related(info: _PackedRelated) -> RelatedNodeInfo:
+        node_id, node_type, metadata, hash_ = info
+        return RelatedNodeInfo(
+            node_id=node_id,
+            node_type=node_type,
+            metadata=dict(metadatas[metadata]),
+            hash=hash_,
+        )
+
+    chunks: List[TextNode] = []
+    for id_, text, metadata, start, end, relationships, extra in packed:
+        chunks.append(
+            TextNode(
+                id_=id_,
+                text=text,
+                metadata=dict(metadatas[metadata]),
+                start_char_idx=start,
+                end_char_idx=end,
+                relationships={
+                    relationship: (
+                        [unpack_related(info) for info in related]
+                        if isinstance(related, list)
+                        else unpack_related(related)
+                    )
+                    for relationship, related in relationships.items()
+                },
+                **extra,
+            )
+        )
+    return chunks
+
 
 class BaseReader(ABC):
+    # Readers that spend most of their time in Python parsing code; indexing runs them in the parsing processes so
+    # that they don't hold the GIL of the process serving requests
+    cpu_bound: bool = False
+    # Readers whose `iter_chunks` reads the file as it goes, scanning each chunk for secrets and PII itself; indexing
+    # runs them in this process, since parsing them elsewhere would mean holding every chunk of the file at once
+    streams: bool = False
+
     def __init__(
         self,
         splitter: SentenceSplitter,
@@ -45,6 +158,37 @@ class BaseReader(ABC):
     def load_chunks(self, file_path: Path) -> ChunksResult:
         pass
 
+    @classmethod
+    def page_count(cls, file_path: Path) -> Optional[int]:
+        """
+        Return the number of pages in a file, if this reader can read a range of its pages with `load_pages`.
+
+        Indexing uses this to spread the pages of a large document over several parsing processes.
+        """
+        return None
+
+    def load_pages(
+        self, file_path: Path, first_page: int, last_page: int
+    ) -> ChunksResult:
+        """Read the pages from `first_page` to `last_page` of a file, counting from 1 and including both."""
+        raise NotImplementedError(f"{type(self).__name__} can't read a range of pages")
+
+    def iter_chunks(
+        self, file_path: Path, ret: Optional[ChunksResult] = None
+    ) -> Iterator[TextNode]:
+        """
+        Yield the chunks of a file as they are produced.
+
+        Readers that can parse a file incrementally should override this, so that indexing can start embedding before
+        the whole file has been read. If secrets are found, no more chunks are yielded and their types are recorded in
+        `ret`, along with whether any PII was anonymized; chunks yielded before that are the caller's to discard.
+        """
+        result = self.load_chunks(file_path)
+        if ret is not None:
+            ret.secret_types = result.secret_types
+            ret.pii_found = result.pii_found
+        yield from result.chunks
+
     def _add_document_metadata(self, node: BaseNode, file_path: Path) -> None:
         node.metadata["file_name"] = file_path.name
         node.metadata["document_id"] = self.document_id
@@ -67,45 +211,16 @@ class BaseReader(ABC):
         return converted_chunks
 
     def _block_secrets(self, chunks: List[str]) -> Optional[Set[str]]:
+        """Return the types of secrets found in the chunks, or None if there are none (or blocking is disabled)."""
         if not self.config.block_secrets:
             return None
 
-        with tempfile.TemporaryDirectory() as tmpdir:
-            for i, chunk in enumerate(chunks):
-                with open(os.path.join(tmpdir, f"chunk_{i}.txt"), "w") as f:
-                    f.write(chunk)
-
-            secrets_collection = SecretsCollection()
-            with default_settings():
-                secrets_collection.scan_files(
-                    *[
-                        os.path.join(tmpdir, f"chunk_{i}.txt")
-                        for i in range(len(chunks))
-                    ]
-                )
-
-        secrets_json = secrets_collection.json()
-
-        ret = set()
-        for secrets in secrets_json.values():
-            for secret in secrets:
-                ret.add(secret.type)
-
-        return ret
+        result = scan_texts(chunks)
+        # Readers block the document whenever this isn't None, so no secrets has to be None rather than an empty set
+        return result.secret_types or None
 
     def _anonymize_pii(self, text: str) -> Optional[str]:
         if not self.config.anonymize_pii:
             return None
 
-        analyzer = AnalyzerEngine()
-
-        # TODO: support other languages
-        results = analyzer.analyze(text=text, entities=None, language="en")
-
-        anonymizer = AnonymizerEngine()  # type: ignore[no-untyped-call]
-
-        anonymized_text = anonymizer.anonymize(text=text, analyzer_results=results)  # type: ignore[arg-type]
-        if anonymized_text.text == text:
-            return None
-
-        return anonymized_text.text
+        return anonymize(text)
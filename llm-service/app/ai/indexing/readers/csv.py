@@ -35,78 +35,129 @@
 #  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
 #  DATA.
 #
-
-import logging
+import csv
 import io
-import json
+import logging
 from pathlib import Path
-from typing import List
+from typing import Iterator, List, Optional
 
-import pandas as pd
-from llama_index.core.node_parser.interface import MetadataAwareTextSplitter
-from llama_index.core.schema import Document, TextNode
+from llama_index.core.schema import Document, NodeRelationship, TextNode
 
 from .base_reader import BaseReader, ChunksResult
+from ....exceptions import DocumentParseError
 
 logger = logging.getLogger(__name__)
 
 
-class _CsvSplitter(MetadataAwareTextSplitter):
-    def split_text_metadata_aware(self, text: str, metadata_str: str) -> List[str]:
-        return self.split_text(text)
-
-    def split_text(self, text: str) -> List[str]:
-        buffer = io.StringIO(text)
-        # Read the CSV file into a pandas DataFrame
-        df = pd.read_csv(buffer)
-        # Convert the dataframe into a list of dictionaries, one per row
-        rows = df.to_dict(orient="records")
-        # Convert each dictionary into a chunk
-        return [json.dumps(row, sort_keys=True) for row in rows]
+def _csv_line(row: List[str]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerow(row)
+    return buffer.getvalue()
 
 
 class CSVReader(BaseReader):
-    def load_chunks(self, file_path: Path) -> ChunksResult:
+    """
+    Reads a CSV file one row at a time.
 
-        # Create the base document
-        with open(file_path, "r") as f:
-            content = f.read()
+    Rows are packed into chunks of up to the splitter's chunk size, and every chunk starts with the header row so that
+    it can be understood on its own. A row that is larger than a chunk on its own gets a chunk to itself.
+    """
 
-        secrets = self._block_secrets([content])
-        if secrets is not None:
-            return ChunksResult(secret_types=secrets)
+    streams = True
 
+    def load_chunks(self, file_path: Path) -> ChunksResult:
         ret = ChunksResult()
-
-        anonymized_text = self._anonymize_pii(content)
-        if anonymized_text is not None:
-            ret.pii_found = True
-            content = anonymized_text
-
-        document = Document(text=content)
-        document.id_ = self.document_id
-        self._add_document_metadata(document, file_path)
-
-        local_splitter = _CsvSplitter()
-
         try:
-            rows = local_splitter.get_nodes_from_documents([document])
-        except Exception as e:
+            chunks = list(self._row_groups(file_path, ret))
+        except csv.Error as e:
             logger.error(f"Error processing CSV file {file_path}: {e}")
             return ret
 
-        for i, row in enumerate(rows):
-            row.metadata["file_name"] = document.metadata["file_name"]
-            row.metadata["document_id"] = document.metadata["document_id"]
-            row.metadata["data_source_id"] = document.metadata["data_source_id"]
-            row.metadata["chunk_number"] = i
-            row.metadata["row_number"] = i + 1
-            row.metadata["chunk_format"] = "json"
-
-        converted_rows: List[TextNode] = []
-        for row in rows:
-            assert isinstance(row, TextNode)
-            converted_rows.append(row)
-
-        ret.chunks = converted_rows
+        if ret.secret_types is None:
+            ret.chunks = chunks
         return ret
+
+    def iter_chunks(
+        self, file_path: Path, ret: Optional[ChunksResult] = None
+    ) -> Iterator[TextNode]:
+        try:
+            yield from self._row_groups(
+                file_path, ret if ret is not None else ChunksResult()
+            )
+        except csv.Error as e:
+            # Earlier chunks may already have been indexed; failing lets the indexer remove them
+            raise DocumentParseError(
+                f"Error processing CSV file {file_path}: {e}"
+            ) from e
+
+    def _row_groups(self, file_path: Path, ret: ChunksResult) -> Iterator[TextNode]:
+        """
+        Yield the chunks of the file as its rows are read.
+
+        Each chunk is scanned for secrets before it is yielded; if one is found, `ret.secret_types` is set and no more
+        chunks are yielded. Records in `ret` whether any PII was anonymized.
+        """
+        document = Document()
+        document.id_ = self.document_id
+        self._add_document_metadata(document, file_path)
+        parent = document.as_related_node_info()
+        tokenizer = self.splitter._tokenizer
+        chunk_size = self.splitter.chunk_size
+
+        with open(file_path, "r", newline="") as f:
+            reader = csv.reader(f)
+            header_row = next(reader, None)
+            if header_row is None:
+                return
+            header = _csv_line(header_row)
+            budget = chunk_size - len(tokenizer(header))
+
+            lines: List[str] = []
+            tokens = 0
+            first_row = 1
+            chunk_number = 0
+
+            def make_chunk() -> Optional[TextNode]:
+                rows = "".join(lines)
+                secrets = self._block_secrets([header + rows])
+                if secrets is not None:
+                    ret.secret_types = secrets
+                    return None
+
+                anonymized_rows = self._anonymize_pii(rows)
+                if anonymized_rows is not None:
+                    ret.pii_found = True
+                    rows = anonymized_rows
+
+                chunk = TextNode(text=header + rows)
+                self._add_document_metadata(chunk, file_path)
+                chunk.metadata["chunk_number"] = chunk_number
+                chunk.metadata["row_number"] = first_row
+                chunk.metadata["row_count"] = len(lines)
+                chunk.metadata["chunk_format"] = "csv"
+                chunk.relationships.update({NodeRelationship.SOURCE: parent})
+                return chunk
+
+            for row_number, row in enumerate(reader, start=1):
+                if not row:
+                    continue
+                line = _csv_line(row)
+                line_tokens = len(tokenizer(line))
+                if lines and tokens + line_tokens > budget:
+                    chunk = make_chunk()
+                    if chunk is None:
+                        return
+                    yield chunk
+                    chunk_number += 1
+                    lines = []
+                    tokens = 0
+                if not lines:
+                    first_row = row_number
+                lines.append(line)
+                tokens += line_tokens
+
+            if lines:
+                chunk = make_chunk()
+                if chunk is None:
+                    return
+                yield chunk
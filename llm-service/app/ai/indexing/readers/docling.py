@@ -38,44 +38,32 @@
 
 
 import logging
-import subprocess
 from pathlib import Path
-from subprocess import CompletedProcess
 
+from docling_core.types.doc.base import ImageRefMode
 from llama_index.core.schema import TextNode
 
 from ....exceptions import DocumentParseError
+from .docling_converters import converter_pool
 from .markdown import MdReader
 
 logger = logging.getLogger(__name__)
 
 
 def load_chunks(markdown_reader: MdReader, file_path: Path) -> list[TextNode] | None:
-    directory = file_path.parent
-    logger.debug(f"{directory=}")
-    with open("docling-output.txt", "a") as f:
-        process: CompletedProcess[bytes] = subprocess.run(
-            [
-                "docling",
-                "-v",
-                "--image-export-mode=placeholder",
-                "--abort-on-error",
-                f"--output={directory}",
-                str(file_path),
-            ],
-            stdout=f,
-            stderr=f,
-        )
-    logger.info(f"docling return code = {process.returncode}")
+    try:
+        with converter_pool().borrow() as converter:
+            result = converter.convert(file_path)
+    except Exception as e:
+        raise DocumentParseError(f"docling failed to process {file_path}: {e}") from e
     # todo: figure out page numbers & look into the docling llama-index integration
     markdown_file_path = file_path.with_suffix(".md")
     logger.info(f"{markdown_file_path=}")
-    if process.returncode == 0 and markdown_file_path.exists():
-        # update chunk metadata to point at the original file
-        chunks = markdown_reader.load_chunks(markdown_file_path).chunks
-        for chunk in chunks:
-            chunk.metadata["file_name"] = file_path.name
-        return chunks
-    raise DocumentParseError(
-        f"docling failed to process {file_path} with return code {process.returncode}"
+    result.document.save_as_markdown(
+        markdown_file_path, image_mode=ImageRefMode.PLACEHOLDER
     )
+    # update chunk metadata to point at the original file
+    chunks = markdown_reader.load_chunks(markdown_file_path).chunks
+    for chunk in chunks:
+        chunk.metadata["file_name"] = file_path.name
+    return chunks
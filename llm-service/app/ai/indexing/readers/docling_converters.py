@@ -0,0 +1,117 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2025
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+"""
+Warm Docling converters shared by the readers in a process.
+
+A `DocumentConverter` loads its layout, table and OCR models the first time it converts a document of each format,
+which takes far longer than converting a typical document. Converters are therefore created once per process and
+borrowed by readers, one document at a time. They are only created when a reader first needs one, so processes that
+never parse a PDF don't load the models.
+"""
+
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from docling.datamodel.base_models import InputFormat
+from docling.document_converter import DocumentConverter
+
+from ....config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ConverterPool:
+    def __init__(self, size: int):
+        self.size = max(1, size)
+        self._idle: "queue.Queue[DocumentConverter]" = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def borrow(self) -> Iterator[DocumentConverter]:
+        converter = self._take()
+        try:
+            yield converter
+        finally:
+            self._idle.put(converter)
+
+    def _take(self) -> DocumentConverter:
+        converter = self._try_take()
+        if converter is None:
+            converter = self._idle.get()
+        return converter
+
+    def _try_take(self) -> Optional[DocumentConverter]:
+        """Take an idle converter, or create one if the pool isn't full yet."""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created >= self.size:
+                return None
+            self._created += 1
+        try:
+            return _new_converter()
+        except BaseException:
+            with self._lock:
+                self._created -= 1
+            raise
+
+
+def _new_converter() -> DocumentConverter:
+    logger.info("Loading Docling models")
+    converter = DocumentConverter()
+    # PDFs and images share a pipeline, so this loads the models for both
+    converter.initialize_pipeline(InputFormat.PDF)
+    return converter
+
+
+_lock = threading.Lock()
+_pool: Optional[ConverterPool] = None
+
+
+def converter_pool() -> ConverterPool:
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ConverterPool(settings.docling_converters)
+        return _pool
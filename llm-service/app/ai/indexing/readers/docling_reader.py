@@ -38,27 +38,43 @@
 
 import logging
 from pathlib import Path
-from typing import List, Any
+from typing import List, Any, Optional, Tuple
 
 from docling.datamodel.document import ConversionResult
-from docling.document_converter import DocumentConverter
 from docling_core.transforms.chunker.hierarchical_chunker import HierarchicalChunker
 from docling_core.transforms.chunker.base import BaseChunk
 from docling_core.transforms.serializer.base import SerializationResult
 from docling_core.transforms.serializer.markdown import MarkdownDocSerializer
 from llama_index.core.schema import Document, TextNode, NodeRelationship
+import pypdf
 
 from .base_reader import BaseReader
 from .base_reader import ChunksResult
+from .docling_converters import converter_pool
 from .pdf import MarkdownSerializerProvider
 
 logger = logging.getLogger(__name__)
 
 class DoclingReader(BaseReader):
+    cpu_bound = True
+
     def __init__(self, *args: Any, **kwargs: Any) -> None:
         super().__init__(*args, **kwargs)
 
+    @classmethod
+    def page_count(cls, file_path: Path) -> Optional[int]:
+        if file_path.suffix.lower() != ".pdf":
+            return None
+        return len(pypdf.PdfReader(file_path).pages)
+
     def load_chunks(self, file_path: Path) -> ChunksResult:
+        return self._convert(file_path)
+
+    def load_pages(self, file_path: Path, first_page: int, last_page: int) -> ChunksResult:
+        # Docling numbers the pages of the range as they are numbered in the whole document
+        return self._convert(file_path, page_range=(first_page, last_page))
+
+    def _convert(self, file_path: Path, page_range: Optional[Tuple[int, int]] = None) -> ChunksResult:
         document = Document()
         document.id_ = self.document_id
         self._add_document_metadata(document, file_path)
@@ -66,7 +82,11 @@ class DoclingReader(BaseReader):
 
         converted_chunks: List[TextNode] = []
         logger.debug(f"{file_path=}")
-        docling_doc: ConversionResult = DocumentConverter().convert(file_path)
+        with converter_pool().borrow() as converter:
+            if page_range is None:
+                docling_doc: ConversionResult = converter.convert(file_path)
+            else:
+                docling_doc = converter.convert(file_path, page_range=page_range)
         chunky_chunks = HierarchicalChunker(serializer_provider=MarkdownSerializerProvider()).chunk(docling_doc.document)
         chunky_chunk: BaseChunk
         serializer = MarkdownDocSerializer(doc=docling_doc.document)
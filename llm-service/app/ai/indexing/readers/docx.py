@@ -45,6 +45,8 @@ from .base_reader import BaseReader, ChunksResult
 
 
 class DocxReader(BaseReader):
+    cpu_bound = True
+
     def __init__(self, *args: Any, **kwargs: Any) -> None:
         super().__init__(*args, **kwargs)
         self.inner = LlamaIndexDocxReader()
@@ -47,6 +47,8 @@ from .markdown import MdReader
 
 
 class ImagesReader(BaseReader):
+    cpu_bound = True
+
     def __init__(self, *args: Any, **kwargs: Any) -> None:
         super().__init__(*args, **kwargs)
         self.markdown_reader = MdReader(*args, **kwargs)
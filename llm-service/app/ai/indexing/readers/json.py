@@ -35,40 +35,263 @@
 #  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
 #  DATA.
 #
-
-import logging
 import json
+import logging
+from abc import abstractmethod
 from pathlib import Path
+from typing import Any, Iterator, List, NamedTuple, Optional, TextIO
 
-from llama_index.core.schema import Document
+from llama_index.core.schema import Document, NodeRelationship, TextNode
 
 from .base_reader import BaseReader, ChunksResult
+from ....exceptions import DocumentParseError
 
 logger = logging.getLogger(__name__)
 
+READ_SIZE = 64 * 1024
 
-class JSONReader(BaseReader):
-    def load_chunks(self, file_path: Path) -> ChunksResult:
-        with open(file_path, "r") as f:
-            content = json.load(f)
+# Characters that can continue a number, so a number at the end of the buffer may not have been read completely
+_NUMBER_CHARS = frozenset("0123456789.eE+-")
 
-        secrets = self._block_secrets([content])
-        if secrets is not None:
-            return ChunksResult(secret_types=secrets)
+_decoder = json.JSONDecoder()
 
-        ret = ChunksResult()
-        anonymized_text = self._anonymize_pii(content)
-        if anonymized_text is not None:
-            ret.pii_found = True
-            content = anonymized_text
 
+class _Record(NamedTuple):
+    path: str
+    value: Any
+    line_number: Optional[int] = None
+
+
+class _JsonStream:
+    """
+    Reads the tokens and values of a JSON document a piece at a time.
+
+    Only the value being decoded is held in memory, along with whatever is left of the last read from the file.
+    """
+
+    def __init__(self, f: TextIO):
+        self.f = f
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it, or "" at the end of the file."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill(READ_SIZE):
+                return ""
+
+    def expect(self, chars: str) -> str:
+        """Consume the next non-whitespace character, which has to be one of `chars`."""
+        char = self.peek()
+        if not char or char not in chars:
+            raise json.JSONDecodeError(
+                f"Expecting one of {chars!r}", self.buffer, self.pos
+            )
+        self.pos += 1
+        return char
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+                if self.eof or (
+                    end < len(self.buffer) and self.buffer[end] not in _NUMBER_CHARS
+                ):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # The value runs past the end of the buffer; read at least as much again so that large values aren't
+            # decoded over and over
+            self._fill(max(READ_SIZE, len(self.buffer) - self.pos))
+
+    def _fill(self, size: int) -> bool:
+        if self.eof:
+            return False
+        data = self.f.read(size)
+        if not data:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos :] + data
+        self.pos = 0
+        return True
+
+
+def _member_path(key: str) -> str:
+    return f"$.{key}" if key.isidentifier() else f"$[{json.dumps(key)}]"
+
+
+class _JsonRecordsReader(BaseReader):
+    """
+    Base class for readers of files that hold a sequence of JSON records.
+
+    Records are packed into chunks of up to the splitter's chunk size, one record per line, so that no chunk starts or
+    ends in the middle of a record unless the record is larger than a chunk on its own. Each chunk records the path of
+    its first record.
+    """
+
+    streams = True
+
+    @abstractmethod
+    def _records(self, f: TextIO) -> Iterator[_Record]:
+        pass
+
+    def load_chunks(self, file_path: Path) -> ChunksResult:
+        ret = ChunksResult()
         try:
-            document = Document(text=json.dumps(content, sort_keys=True))
-        except Exception as e:
+            chunks = list(self._record_groups(file_path, ret))
+        except json.JSONDecodeError as e:
             logger.error(f"Error parsing JSON file {file_path}: {e}")
             return ret
 
+        if ret.secret_types is None:
+            ret.chunks = chunks
+        return ret
+
+    def iter_chunks(
+        self, file_path: Path, ret: Optional[ChunksResult] = None
+    ) -> Iterator[TextNode]:
+        try:
+            yield from self._record_groups(
+                file_path, ret if ret is not None else ChunksResult()
+            )
+        except json.JSONDecodeError as e:
+            # Earlier chunks may already have been indexed; failing lets the indexer remove them
+            raise DocumentParseError(f"Error parsing JSON file {file_path}: {e}") from e
+
+    def _record_groups(self, file_path: Path, ret: ChunksResult) -> Iterator[TextNode]:
+        """
+        Yield the chunks of the file as its records are read.
+
+        Each chunk is scanned for secrets before it is yielded; if one is found, `ret.secret_types` is set and no more
+        chunks are yielded. Records in `ret` whether any PII was anonymized.
+        """
+        document = Document()
         document.id_ = self.document_id
         self._add_document_metadata(document, file_path)
-        ret.chunks = self._chunks_in_document(document)
-        return ret
+        parent = document.as_related_node_info()
+        tokenizer = self.splitter._tokenizer
+        chunk_size = self.splitter.chunk_size
+
+        group: List[_Record] = []
+        lines: List[str] = []
+        tokens = 0
+        chunk_number = 0
+
+        def make_chunks() -> Optional[List[TextNode]]:
+            text = "\n".join(lines)
+            whole_record = len(lines) == 1
+            if whole_record and tokens > chunk_size:
+                texts = self.splitter.split_text(text)
+                whole_record = False
+            else:
+                texts = [text]
+
+            secrets = self._block_secrets(texts)
+            if secrets is not None:
+                ret.secret_types = secrets
+                return None
+
+            chunks: List[TextNode] = []
+            for text in texts:
+                anonymized_text = self._anonymize_pii(text)
+                if anonymized_text is not None:
+                    ret.pii_found = True
+                    text = anonymized_text
+
+                chunk = TextNode(text=text)
+                self._add_document_metadata(chunk, file_path)
+                chunk.metadata["chunk_number"] = chunk_number + len(chunks)
+                chunk.metadata["record_path"] = group[0].path
+                chunk.metadata["record_count"] = len(group)
+                if group[0].line_number is not None:
+                    chunk.metadata["line_number"] = group[0].line_number
+                if whole_record:
+                    chunk.metadata["chunk_format"] = "json"
+                elif len(group) > 1:
+                    chunk.metadata["chunk_format"] = "jsonl"
+                chunk.relationships.update({NodeRelationship.SOURCE: parent})
+                chunks.append(chunk)
+            return chunks
+
+        with open(file_path, "r") as f:
+            for record in self._records(f):
+                line = json.dumps(record.value, sort_keys=True)
+                line_tokens = len(tokenizer(line))
+                if lines and tokens + line_tokens > chunk_size:
+                    chunks = make_chunks()
+                    if chunks is None:
+                        return
+                    yield from chunks
+                    chunk_number += len(chunks)
+                    group, lines, tokens = [], [], 0
+                group.append(record)
+                lines.append(line)
+                tokens += line_tokens
+
+            if lines:
+                chunks = make_chunks()
+                if chunks is None:
+                    return
+                yield from chunks
+
+
+class JSONReader(_JsonRecordsReader):
+    """
+    Reads a JSON document without loading it all into memory.
+
+    The records are the elements of a top-level array, or the members of a top-level object; any other document is a
+    single record.
+    """
+
+    def _records(self, f: TextIO) -> Iterator[_Record]:
+        stream = _JsonStream(f)
+        start = stream.peek()
+        if start == "[":
+            stream.expect("[")
+            if stream.peek() == "]":
+                stream.expect("]")
+            else:
+                index = 0
+                while True:
+                    yield _Record(f"$[{index}]", stream.value())
+                    index += 1
+                    if stream.expect(",]") == "]":
+                        break
+        elif start == "{":
+            stream.expect("{")
+            if stream.peek() == "}":
+                stream.expect("}")
+            else:
+                while True:
+                    if stream.peek() != '"':
+                        stream.expect('"')
+                    key = stream.value()
+                    stream.expect(":")
+                    yield _Record(_member_path(key), {key: stream.value()})
+                    if stream.expect(",}") == "}":
+                        break
+        elif start:
+            yield _Record("$", stream.value())
+
+        if stream.peek():
+            raise json.JSONDecodeError("Extra data", stream.buffer, stream.pos)
+
+
+class JSONLinesReader(_JsonRecordsReader):
+    """Reads a JSON Lines file, where every non-blank line is a record."""
+
+    def _records(self, f: TextIO) -> Iterator[_Record]:
+        index = 0
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            yield _Record(f"$[{index}]", json.loads(line), line_number)
+            index += 1
@@ -37,13 +37,14 @@
 #
 import logging
 from pathlib import Path
-from typing import Any, List
+from typing import Any, List, Optional
 
 from docling_core.transforms.serializer.base import BaseSerializerProvider, BaseDocSerializer
 from docling_core.transforms.serializer.markdown import MarkdownDocSerializer
 from docling_core.types.doc.document import DoclingDocument
 from llama_index.core.schema import Document, TextNode
 from llama_index.readers.file import PDFReader as LlamaIndexPDFReader
+import pypdf
 from typing_extensions import override
 
 from .base_reader import BaseReader, ChunksResult
@@ -99,15 +100,41 @@ class MarkdownSerializerProvider(BaseSerializerProvider):
 
 
 class PDFReader(BaseReader):
+    cpu_bound = True
+
     def __init__(self, *args: Any, **kwargs: Any) -> None:
         super().__init__(*args, **kwargs)
         self.inner = LlamaIndexPDFReader(return_full_document=False)
         self.markdown_reader = MdReader(*args, **kwargs)
 
+    @classmethod
+    def page_count(cls, file_path: Path) -> Optional[int]:
+        return len(pypdf.PdfReader(file_path).pages)
+
     def load_chunks(self, file_path: Path) -> ChunksResult:
+        pages: list[Document] = self.inner.load_data(file_path)
+        return self._chunks_in_pages(file_path, pages)
+
+    def load_pages(
+        self, file_path: Path, first_page: int, last_page: int
+    ) -> ChunksResult:
+        # Same as LlamaIndexPDFReader.load_data, for only some of the pages
+        pdf = pypdf.PdfReader(file_path)
+        pages = [
+            Document(
+                text=pdf.pages[i].extract_text(),
+                metadata={
+                    "page_label": pdf.page_labels[i],
+                    "file_name": file_path.name,
+                },
+            )
+            for i in range(first_page - 1, min(last_page, len(pdf.pages)))
+        ]
+        return self._chunks_in_pages(file_path, pages)
+
+    def _chunks_in_pages(self, file_path: Path, pages: List[Document]) -> ChunksResult:
         ret = ChunksResult()
 
-        pages: list[Document] = self.inner.load_data(file_path)
         page_counter = PageTracker(pages)
 
         content = page_counter.document_text
@@ -0,0 +1,140 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2025
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+"""
+PII anonymization with presidio engines that are loaded once per process.
+
+Loading the analyzer loads a spaCy pipeline, which takes much longer than analyzing a typical document. Documents are
+cut into overlapping segments that are streamed through the pipeline in batches (and optionally across processes),
+which also keeps large documents under spaCy's maximum text length. Each position of the document belongs to exactly
+one segment, and an entity is kept only from the segment that owns its start, so an entity that straddles a cut is
+found whole and anonymized once.
+"""
+
+import threading
+from typing import List, Optional, Tuple
+
+from presidio_analyzer import AnalyzerEngine, BatchAnalyzerEngine, RecognizerResult
+from presidio_anonymizer import AnonymizerEngine
+
+from ....config import settings
+
+SEGMENT_CHARS = 20_000
+# Entities up to half of this long are found whole even if they straddle a cut between segments
+SEGMENT_OVERLAP_CHARS = 400
+ANALYSIS_BATCH_SIZE = 16
+# TODO: support other languages
+LANGUAGE = "en"
+
+_lock = threading.Lock()
+_engines: Optional[Tuple[BatchAnalyzerEngine, AnonymizerEngine]] = None
+
+
+def engines() -> Tuple[BatchAnalyzerEngine, AnonymizerEngine]:
+    global _engines
+    with _lock:
+        if _engines is None:
+            _engines = (
+                BatchAnalyzerEngine(AnalyzerEngine()),
+                AnonymizerEngine(),  # type: ignore[no-untyped-call]
+            )
+        return _engines
+
+
+def anonymize(text: str) -> Optional[str]:
+    """Return `text` with its PII replaced, or None if it has none."""
+    batch_analyzer, anonymizer = engines()
+    results = analyze(text, batch_analyzer)
+    if not results:
+        return None
+    anonymized = anonymizer.anonymize(text=text, analyzer_results=results)  # type: ignore[arg-type]
+    if anonymized.text == text:
+        return None
+    return anonymized.text
+
+
+def analyze(text: str, batch_analyzer: BatchAnalyzerEngine) -> List[RecognizerResult]:
+    segments = split_segments(text)
+    segment_results = batch_analyzer.analyze_iterator(
+        [text[start:end] for start, end, _, _ in segments],
+        language=LANGUAGE,
+        batch_size=ANALYSIS_BATCH_SIZE,
+        n_process=settings.pii_analysis_processes,
+    )
+
+    results: List[RecognizerResult] = []
+    for (start, _, owned_start, owned_end), found in zip(segments, segment_results):
+        for result in found:
+            result.start += start
+            result.end += start
+            if owned_start <= result.start < owned_end:
+                results.append(result)
+    return results
+
+
+def split_segments(text: str) -> List[Tuple[int, int, int, int]]:
+    """
+    Cut `text` into segments, preferably at line breaks.
+
+    Returns (start, end, owned_start, owned_end) for each segment. The owned ranges cover the text without
+    overlapping; each segment extends half the overlap past its owned range on both sides.
+    """
+    margin = SEGMENT_OVERLAP_CHARS // 2
+    cuts = [0]
+    while len(text) - cuts[-1] > SEGMENT_CHARS:
+        cuts.append(_cut_point(text, cuts[-1] + SEGMENT_CHARS, cuts[-1]))
+    cuts.append(len(text))
+
+    return [
+        (
+            max(0, owned_start - margin),
+            min(len(text), owned_end + margin),
+            owned_start,
+            owned_end,
+        )
+        for owned_start, owned_end in zip(cuts, cuts[1:])
+    ]
+
+
+def _cut_point(text: str, limit: int, previous: int) -> int:
+    # Look back from the limit for a line break, then for any whitespace, within the last quarter of the segment
+    earliest = previous + SEGMENT_CHARS * 3 // 4
+    for separator in ("\n", " "):
+        position = text.rfind(separator, earliest, limit)
+        if position != -1:
+            return position + 1
+    return limit
@@ -46,6 +46,8 @@ from .base_reader import BaseReader, ChunksResult
 
 
 class PptxReader(BaseReader):
+    cpu_bound = True
+
     def __init__(self, *args: Any, **kwargs: Any) -> None:
         super().__init__(*args, **kwargs)
         self.inner = LlamaIndexPptxReader()
@@ -0,0 +1,124 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2025
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+"""
+In-memory secret scanning with the detect-secrets plugins.
+
+detect-secrets only scans files, so scanning a document used to mean writing it out to temporary files first. This
+runs the same line-based plugins and filters that `scan_file` does, but directly over strings. That relies on a private
+function of detect-secrets, which is why its version is pinned.
+
+A scan isn't split up any further: readers usually run in the parsing processes already, where large documents are
+scanned one page range per process, and the plugins are pure Python, so scanning on more threads wouldn't be faster.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Iterator, List, Set, Tuple
+
+from detect_secrets.core.plugins.util import get_mapping_from_secret_type_to_class
+from detect_secrets.core.potential_secret import PotentialSecret
+from detect_secrets.core.scan import _process_line_based_plugins
+from detect_secrets.settings import cache_bust, configure_settings_from_baseline
+
+logger = logging.getLogger(__name__)
+
+_configure_lock = threading.Lock()
+_configured = False
+
+
+@dataclass
+class SecretScanResult:
+    secret_types: Set[str] = field(default_factory=set)
+    lines_scanned: int = 0
+    seconds: float = 0.0
+
+
+def scan_texts(texts: List[str], stop_at_first: bool = True) -> SecretScanResult:
+    """
+    Scan `texts` for secrets.
+
+    With `stop_at_first`, scanning stops at the first secret found, which is enough to know that a document has to be
+    blocked; otherwise every type of secret in the texts is reported.
+    """
+    _configure()
+    result = SecretScanResult()
+    start = time.perf_counter()
+    for secret in _scan(texts, result):
+        result.secret_types.add(secret.type)
+        if stop_at_first:
+            break
+    result.seconds = time.perf_counter() - start
+    logger.info(
+        f"Scanned {result.lines_scanned} lines for secrets in {result.seconds * 1000:.0f}ms, "
+        f"found {len(result.secret_types)} types"
+    )
+    return result
+
+
+def _configure() -> None:
+    """
+    Enable every plugin with the default filters, as `default_settings` does.
+
+    detect-secrets keeps its settings in module globals. Setting them once for the process, rather than around each
+    scan, lets scans run concurrently, since they only read them.
+    """
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        # Plugins and filters are cached from the settings, so drop any cached before they were configured
+        cache_bust()
+        configure_settings_from_baseline(
+            {
+                "plugins_used": [
+                    {"name": plugin_type.__name__}
+                    for plugin_type in get_mapping_from_secret_type_to_class().values()
+                ],
+            }
+        )
+        _configured = True
+
+
+def _scan(texts: List[str], result: SecretScanResult) -> Iterator[PotentialSecret]:
+    for i, text in enumerate(texts):
+        lines: List[Tuple[int, str]] = list(enumerate(text.splitlines(), start=1))
+        result.lines_scanned += len(lines)
+        # The filename is only used by the filters, which look at its extension
+        yield from _process_line_based_plugins(lines, filename=f"chunk_{i}.txt")
@@ -41,7 +41,7 @@ import random
 import shutil
 from pathlib import Path
 from threading import Lock
-from typing import Any, Dict, Optional, cast, List
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple, cast, List
 
 from llama_index.core import (
     DocumentSummaryIndex,
@@ -53,12 +53,14 @@ from llama_index.core import (
 )
 from llama_index.core.base.base_query_engine import BaseQueryEngine
 from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.base.response.schema import Response
 from llama_index.core.llms import LLM
 from llama_index.core.node_parser import SentenceSplitter
-from llama_index.core.response_synthesizers import ResponseMode
+from llama_index.core.response_synthesizers import BaseSynthesizer, ResponseMode
 from llama_index.core.schema import (
     Document,
     NodeRelationship,
+    NodeWithScore,
     TextNode,
     RelatedNodeInfo,
 )
@@ -72,6 +74,13 @@ from qdrant_client.http.exceptions import UnexpectedResponse
 from app.services import models
 from .base import BaseTextIndexer
 from .readers.base_reader import ReaderConfig, ChunksResult
+from .summary_storage import (
+    Debouncer,
+    ReadWriteLock,
+    StorageContextCache,
+    SummarySnapshot,
+    WriteBehind,
+)
 from ..vector_stores.vector_store_factory import VectorStoreFactory
 from ...config import settings
 from ...services.metadata_apis import data_sources_metadata_api
@@ -81,11 +90,54 @@ logger = logging.getLogger(__name__)
 
 SUMMARY_PROMPT = "Summarize the contents into less than 100 words."
 
+# A data source's summary is summarized from summaries of groups of this many of its documents.
+DOCUMENTS_PER_SUMMARY_GROUP = 16
+GROUP_DOCUMENTS_KEY = "summarized_documents"
+
 # Since we don't use anything fancy to store the summaries, it's possible that two threads
 # try to do a write operation at the same time and we end up with a race condition.
 # Basically filesystems aren't ACID, so don't pretend that they are.
-# We could have a lock per data source, but this is simpler.
-_write_lock = Lock()
+# Each data source's summary store has its own lock, and the global store has another, so that
+# data sources are summarized in parallel. When both are needed, the data source's is taken first.
+_data_source_locks: Dict[int, ReadWriteLock] = {}
+_data_source_locks_lock = Lock()
+_global_lock = ReadWriteLock()
+
+_write_behind = WriteBehind(settings.summary_persist_delay_seconds)
+_store_cache = StorageContextCache(settings.summary_cache_max_bytes)
+# A data source that keeps changing still has its summary refreshed at least this often.
+_global_refresh = Debouncer(
+    settings.summary_refresh_delay_seconds,
+    max_delay_seconds=6 * settings.summary_refresh_delay_seconds,
+)
+
+
+def _summarize(response_synthesizer: BaseSynthesizer, texts: List[str]) -> str:
+    response = response_synthesizer.synthesize(
+        query=SUMMARY_PROMPT,
+        nodes=[NodeWithScore(node=TextNode(text=text)) for text in texts],
+    )
+    return str(cast(Response, response).response or "")
+
+
+_snapshots: Dict[str, SummarySnapshot] = {}
+
+
+def _summary_snapshot() -> SummarySnapshot:
+    path = os.path.join(settings.rag_databases_dir, "data_source_summaries.json")
+    with _data_source_locks_lock:
+        snapshot = _snapshots.get(path)
+        if snapshot is None:
+            snapshot = _snapshots[path] = SummarySnapshot(path)
+        return snapshot
+
+
+def _data_source_lock(data_source_id: int) -> ReadWriteLock:
+    with _data_source_locks_lock:
+        lock = _data_source_locks.get(data_source_id)
+        if lock is None:
+            lock = _data_source_locks[data_source_id] = ReadWriteLock()
+        return lock
 
 
 class SummaryIndexer(BaseTextIndexer):
@@ -109,9 +161,13 @@ class SummaryIndexer(BaseTextIndexer):
         )
 
     def __persist_dir(self) -> str:
+        return SummaryIndexer.__data_source_persist_dir(self.data_source_id)
+
+    @staticmethod
+    def __data_source_persist_dir(data_source_id: int) -> str:
         if settings.is_s3_summary_storage_configured():
-            return f"summaries/{self.data_source_id}"
-        return SummaryIndexer.__database_dir(self.data_source_id)
+            return f"summaries/{data_source_id}"
+        return SummaryIndexer.__database_dir(data_source_id)
 
     @staticmethod
     def __persist_root_dir() -> str:
@@ -151,6 +207,31 @@ class SummaryIndexer(BaseTextIndexer):
             "data_source_id": data_source_id,
         }
 
+    def __lock(self, persist_dir: str) -> ReadWriteLock:
+        if persist_dir == self.__persist_root_dir():
+            return _global_lock
+        return _data_source_lock(self.data_source_id)
+
+    def __persist(
+        self,
+        summary_store: DocumentSummaryIndex,
+        persist_dir: str,
+        on_persisted: Optional[Callable[[], None]] = None,
+    ) -> None:
+        _store_cache.changed(persist_dir, summary_store.storage_context)
+        _write_behind.changed(
+            persist_dir,
+            summary_store.storage_context,
+            self.__lock(persist_dir),
+            on_persisted,
+        )
+
+    @staticmethod
+    def flush() -> None:
+        """Refresh the data source summaries that are due, and write out all the changes still held in memory."""
+        _global_refresh.flush()
+        _write_behind.flush()
+
     def __init_summary_store(self, persist_dir: str) -> DocumentSummaryIndex:
         storage_context: Optional[StorageContext] = None
         if settings.is_s3_summary_storage_configured():
@@ -162,7 +243,7 @@ class SummaryIndexer(BaseTextIndexer):
             storage_context=storage_context,
             **self.__index_kwargs(),
         )
-        doc_summary_index.storage_context.persist(persist_dir=persist_dir)
+        self.__persist(doc_summary_index, persist_dir)
         return doc_summary_index
 
     def __summary_indexer(
@@ -182,9 +263,11 @@ class SummaryIndexer(BaseTextIndexer):
         persist_dir: str, index_configuration: Dict[str, Any]
     ) -> DocumentSummaryIndex:
         data_source_id: int = index_configuration.get("data_source_id")
-        storage_context = SummaryIndexer.create_storage_context(
+        storage_context = SummaryIndexer.__load_storage_context(
             persist_dir,
-            VectorStoreFactory.for_summaries(data_source_id).llama_vector_store(),
+            lambda: VectorStoreFactory.for_summaries(
+                data_source_id
+            ).llama_vector_store(),
         )
         doc_summary_index: DocumentSummaryIndex = cast(
             DocumentSummaryIndex,
@@ -195,6 +278,22 @@ class SummaryIndexer(BaseTextIndexer):
         )
         return doc_summary_index
 
+    @staticmethod
+    def __load_storage_context(
+        persist_dir: str, vector_store: Callable[[], BasePydanticVectorStore]
+    ) -> StorageContext:
+        # Changes that haven't been written out yet are only in memory
+        storage_context = _write_behind.pending(persist_dir) or _store_cache.get(
+            persist_dir
+        )
+        if storage_context is None:
+            version = _store_cache.version(persist_dir)
+            storage_context = SummaryIndexer.create_storage_context(
+                persist_dir, vector_store()
+            )
+            _store_cache.put(persist_dir, storage_context, version)
+        return storage_context
+
     @staticmethod
     def create_storage_context(
         persist_dir: str, vector_store: BasePydanticVectorStore
@@ -219,35 +318,59 @@ class SummaryIndexer(BaseTextIndexer):
 
     @classmethod
     def get_all_data_source_summaries(cls) -> dict[str, str]:
-        root_dir = cls.__persist_root_dir()
-        try:
-            storage_context = SummaryIndexer.create_storage_context(
-                persist_dir=root_dir,
-                vector_store=SimpleVectorStore(),
+        summaries, _ = cls.data_source_summaries()
+        return dict(summaries)
+
+    @classmethod
+    def data_source_summaries(cls) -> Tuple[Mapping[str, str], str]:
+        """
+        Return the summary of every data source, by data source ID, and an ETag for them.
+
+        The summaries are served from memory as they are; data sources whose refresh is still pending keep their previous
+        summary until it runs.
+        """
+        return _summary_snapshot().get(cls.__load_data_source_summaries)
+
+    @classmethod
+    def get_data_source_summaries(cls, data_source_ids: List[int]) -> Dict[int, str]:
+        """Return the summaries of the given data sources that have one."""
+        summaries, _ = cls.data_source_summaries()
+        return {
+            data_source_id: summaries[str(data_source_id)]
+            for data_source_id in data_source_ids
+            if str(data_source_id) in summaries
+        }
+
+    @classmethod
+    def __load_data_source_summaries(cls) -> dict[str, str]:
+        with _global_lock.read():
+            try:
+                storage_context = SummaryIndexer.__load_storage_context(
+                    cls.__persist_root_dir(), SimpleVectorStore
+                )
+            except FileNotFoundError:
+                # If the directory doesn't exist, we don't have any summaries.
+                return {}
+            indices = load_indices_from_storage(
+                storage_context=storage_context,
+                index_ids=None,
+                **{
+                    "llm": models.LLM.get_noop(),
+                    "response_synthesizer": models.LLM.get_noop(),
+                    "show_progress": True,
+                    "embed_model": models.Embedding.get_noop(),
+                    "embed_summaries": True,
+                    "summary_query": "None",
+                    "data_source_id": 0,
+                },
             )
-        except FileNotFoundError:
-            # If the directory doesn't exist, we don't have any summaries.
-            return {}
-        indices = load_indices_from_storage(
-            storage_context=storage_context,
-            index_ids=None,
-            **{
-                "llm": models.LLM.get_noop(),
-                "response_synthesizer": models.LLM.get_noop(),
-                "show_progress": True,
-                "embed_model": models.Embedding.get_noop(),
-                "embed_summaries": True,
-                "summary_query": "None",
-                "data_source_id": 0,
-            },
-        )
-        if len(indices) == 0:
-            return {}
+            if len(indices) == 0:
+                return {}
 
-        global_summary_store: DocumentSummaryIndex = cast(
-            DocumentSummaryIndex, indices[0]
-        )
+            return SummaryIndexer.__summaries_of(cast(DocumentSummaryIndex, indices[0]))
 
+    @staticmethod
+    def __summaries_of(global_summary_store: DocumentSummaryIndex) -> dict[str, str]:
         summary_ids = global_summary_store.index_struct.doc_id_to_summary_id.values()
         nodes = global_summary_store.docstore.get_nodes(list(summary_ids))
 
@@ -266,16 +389,21 @@ class SummaryIndexer(BaseTextIndexer):
 
         reader_cls = self._get_reader_class(file_path)
 
-        reader = reader_cls(
-            splitter=self.splitter,
-            document_id=document_id,
-            data_source_id=self.data_source_id,
-            config=self.reader_config,
-        )
-
         logger.debug(f"Parsing file: {file_path}")
 
-        chunks: ChunksResult = reader.load_chunks(file_path)
+        chunks: ChunksResult
+        if self._parses_in_pool(reader_cls):
+            chunks = self._parse_in_pool(
+                reader_cls, file_path, document_id, self.splitter
+            )
+        else:
+            reader = reader_cls(
+                splitter=self.splitter,
+                document_id=document_id,
+                data_source_id=self.data_source_id,
+                config=self.reader_config,
+            )
+            chunks = reader.load_chunks(file_path)
         nodes: List[TextNode] = chunks.chunks
 
         nodes = self.sample_nodes(nodes, 1000, 20)
@@ -285,72 +413,147 @@ class SummaryIndexer(BaseTextIndexer):
             logger.warning(f"No chunks found for file {file_path}")
             return
 
-        with _write_lock:
+        with _data_source_lock(self.data_source_id).write():
             persist_dir = self.__persist_dir()
             summary_store: DocumentSummaryIndex = self.__summary_indexer(persist_dir)
             summary_store.insert_nodes(nodes)
-            summary_store.storage_context.persist(persist_dir=persist_dir)
+            self.__persist(summary_store, persist_dir)
 
-            self.__update_global_summary_store(summary_store, added_node_id=document_id)
+        _global_refresh.schedule(self.data_source_id, self.__refresh_global_summary)
 
         logger.debug(f"Summary for file {file_path} created")
 
-    def __update_global_summary_store(
-        self,
-        summary_store: DocumentSummaryIndex,
-        added_node_id: Optional[str] = None,
-        deleted_node_id: Optional[str] = None,
-    ) -> None:
-        # Llama index doesn't seem to support updating the summary when we add more documents.
-        # So what we do instead is re-load all the summaries for the documents already associated with the data source
-        # and re-index it with the addition/removal.
-        global_persist_dir = self.__persist_root_dir()
+    def __refresh_global_summary(self) -> None:
+        # Llama index doesn't support updating a summary when documents are added or removed, and re-summarizing
+        # every document's summary after each change gets expensive. So the data source's summary is built from the
+        # summaries of groups of its documents instead, and only the groups whose documents changed are re-summarized
+        # before the data source's summary is rebuilt from the group summaries.
+        #
+        # The summarizing is done without the global lock, so that readers of the global store never wait for the LLM;
+        # holding the data source's lock keeps it from being deleted meanwhile, and only one refresh of a data source
+        # runs at a time, so nothing else changes its nodes in the global store.
+        with _data_source_lock(self.data_source_id).read():
+            summary_store = self.__summary_indexer(self.__persist_dir())
+            with _global_lock.read():
+                grouping = self.__group_documents(summary_store)
+            if grouping is None:
+                return
+            new_nodes, summary_node = self.__summarize_groups(summary_store, *grouping)
+            with _global_lock.write():
+                self.__replace_global_summary(new_nodes, summary_node)
+
+    def __group_documents(
+        self, summary_store: DocumentSummaryIndex
+    ) -> Optional[Tuple[List[Dict[str, str]], List[Optional[str]]]]:
+        """
+        Group the data source's documents, keeping the groups in the global store whose documents are unchanged.
+
+        Returns the groups, with the summaries of those that don't need to be re-summarized, or None if none do.
+        """
         global_summary_store = self.__summary_indexer(
-            global_persist_dir, embed_summaries=False
+            self.__persist_root_dir(), embed_summaries=False
+        )
+        data_source_id = str(self.data_source_id)
+        # document ID to the ID of its current summary, which changes when the document is re-indexed
+        documents: Dict[str, str] = dict(
+            summary_store.index_struct.doc_id_to_summary_id
         )
-        data_source_node = Document(doc_id=str(self.data_source_id))
 
+        groups: List[Dict[str, str]] = []
+        group_summaries: List[Optional[str]] = []
+        previous_groups: List[str] = []
         summary_id = global_summary_store.index_struct.doc_id_to_summary_id.get(
-            str(self.data_source_id)
+            data_source_id
         )
-
-        new_nodes = []
         if summary_id:
-            document_ids = global_summary_store.index_struct.summary_id_to_node_ids.get(
-                summary_id
+            previous_groups = (
+                global_summary_store.index_struct.summary_id_to_node_ids.get(
+                    summary_id, []
+                )
             )
-            if document_ids:
-                # Reload the summary for each existing node id, which correspond to full documents
-                summaries = [
-                    summary_store.get_document_summary(document_id)
-                    for document_id in document_ids
-                ]
-
-                new_nodes = [
-                    Document(
-                        doc_id=document_id,
-                        text=document_summary,
-                        relationships={
-                            NodeRelationship.SOURCE: data_source_node.as_related_node_info()
-                        },
+            for node in global_summary_store.docstore.get_nodes(previous_groups):
+                group = node.metadata.get(GROUP_DOCUMENTS_KEY)
+                if not isinstance(group, dict):
+                    # A summary of a single document, from before summaries were grouped
+                    continue
+                current = {
+                    document_id: document_summary_id
+                    for document_id, document_summary_id in group.items()
+                    if documents.get(document_id) == document_summary_id
+                }
+                if current:
+                    groups.append(current)
+                    group_summaries.append(
+                        node.get_content() if current == group else None
                     )
-                    for document_id, document_summary in zip(document_ids, summaries)
-                ]
 
-        if added_node_id:
+        grouped = {document_id for group in groups for document_id in group}
+        for document_id, document_summary_id in documents.items():
+            if document_id in grouped:
+                continue
+            for i, group in enumerate(groups):
+                if len(group) < DOCUMENTS_PER_SUMMARY_GROUP:
+                    group[document_id] = document_summary_id
+                    group_summaries[i] = None
+                    break
+            else:
+                groups.append({document_id: document_summary_id})
+                group_summaries.append(None)
+
+        if len(groups) == len(previous_groups) and None not in group_summaries:
+            return None
+        return groups, group_summaries
+
+    def __summarize_groups(
+        self,
+        summary_store: DocumentSummaryIndex,
+        groups: List[Dict[str, str]],
+        group_summaries: List[Optional[str]],
+    ) -> Tuple[List[TextNode], TextNode]:
+        """Summarize the groups that need it, and the data source from its group summaries."""
+        response_synthesizer = self.__index_kwargs()["response_synthesizer"]
+        data_source_node = Document(doc_id=str(self.data_source_id))
+        new_nodes: List[TextNode] = []
+        for group, group_summary in zip(groups, group_summaries):
+            if group_summary is None:
+                group_summary = _summarize(
+                    response_synthesizer,
+                    [
+                        summary_store.get_document_summary(document_id)
+                        for document_id in group
+                    ],
+                )
             new_nodes.append(
-                Document(
-                    doc_id=added_node_id,
-                    text=summary_store.get_document_summary(added_node_id),
+                TextNode(
+                    text=group_summary,
+                    metadata={GROUP_DOCUMENTS_KEY: group},
+                    excluded_embed_metadata_keys=[GROUP_DOCUMENTS_KEY],
+                    excluded_llm_metadata_keys=[GROUP_DOCUMENTS_KEY],
                     relationships={
                         NodeRelationship.SOURCE: data_source_node.as_related_node_info()
                     },
                 )
             )
+        # The summary node the document summary index would make when inserting the group nodes
+        summary_node = TextNode(
+            text=_summarize(response_synthesizer, [node.text for node in new_nodes]),
+            metadata=new_nodes[0].metadata,
+            excluded_embed_metadata_keys=[GROUP_DOCUMENTS_KEY],
+            excluded_llm_metadata_keys=[GROUP_DOCUMENTS_KEY],
+            relationships={
+                NodeRelationship.SOURCE: data_source_node.as_related_node_info()
+            },
+        )
+        return new_nodes, summary_node
 
-        if deleted_node_id:
-            new_nodes = [node for node in new_nodes if node.id_ != deleted_node_id]
-
+    def __replace_global_summary(
+        self, new_nodes: List[TextNode], summary_node: TextNode
+    ) -> None:
+        """Swap the data source's nodes in the global store for already summarized ones; the caller holds its lock."""
+        global_persist_dir = self.__persist_root_dir()
+        global_summary_store = self.__summary_indexer(
+            global_persist_dir, embed_summaries=False
+        )
         # Delete first so that we don't accumulate trash in the summary store.
         try:
             global_summary_store.delete_ref_doc(
@@ -359,8 +562,19 @@ class SummaryIndexer(BaseTextIndexer):
         except (KeyError, UnexpectedResponse):
             # UnexpectedResponse is raised when the collection doesn't exist, which is fine, since it might be a new index.
             pass
-        global_summary_store.insert_nodes(new_nodes)
-        global_summary_store.storage_context.persist(persist_dir=global_persist_dir)
+        # What `insert_nodes` does, but with the summary made beforehand rather than by the LLM under the lock
+        global_summary_store.docstore.add_documents(
+            [*new_nodes, summary_node], allow_update=True
+        )
+        global_summary_store.index_struct.add_summary_and_nodes(
+            summary_node, list(new_nodes)
+        )
+        global_summary_store.storage_context.index_store.add_index_struct(
+            global_summary_store.index_struct
+        )
+        snapshot = _summary_snapshot()
+        snapshot.replace(SummaryIndexer.__summaries_of(global_summary_store))
+        self.__persist(global_summary_store, global_persist_dir, snapshot.write)
 
     def sample_nodes(
         self,
@@ -429,7 +643,7 @@ class SummaryIndexer(BaseTextIndexer):
             return sampled_nodes
 
     def get_summary(self, document_id: str) -> Optional[str]:
-        with _write_lock:
+        with _data_source_lock(self.data_source_id).read():
             persist_dir = self.__persist_dir()
             summary_store = self.__summary_indexer(persist_dir)
             if document_id not in summary_store.index_struct.doc_id_to_summary_id:
@@ -437,7 +651,9 @@ class SummaryIndexer(BaseTextIndexer):
             return summary_store.get_document_summary(document_id)
 
     def get_full_summary(self) -> Optional[str]:
-        with _write_lock:
+        # Bring the data source's summary up to date rather than wait for the scheduled refresh.
+        _global_refresh.run_now(self.data_source_id)
+        with _global_lock.read():
             global_persist_dir = self.__persist_root_dir()
             global_summary_store = self.__summary_indexer(global_persist_dir)
 
@@ -450,31 +666,32 @@ class SummaryIndexer(BaseTextIndexer):
             return global_summary_store.get_document_summary(document_id)
 
     def as_query_engine(self) -> BaseQueryEngine:
-        persist_dir = self.__persist_dir()
-        return self.__summary_indexer(persist_dir).as_query_engine(self.llm)
+        with _data_source_lock(self.data_source_id).read():
+            persist_dir = self.__persist_dir()
+            return self.__summary_indexer(persist_dir).as_query_engine(self.llm)
 
     def delete_document(self, document_id: str) -> None:
-        with _write_lock:
+        with _data_source_lock(self.data_source_id).write():
             persist_dir = self.__persist_dir()
             summary_store = self.__summary_indexer(persist_dir)
-
-            self.__update_global_summary_store(
-                summary_store, deleted_node_id=document_id
-            )
-
             summary_store.delete_ref_doc(document_id, delete_from_docstore=True)
-            summary_store.storage_context.persist(persist_dir=persist_dir)
+            self.__persist(summary_store, persist_dir)
             summary_store.vector_store.delete(document_id)
 
+        _global_refresh.schedule(self.data_source_id, self.__refresh_global_summary)
+
     def delete_data_source(self) -> None:
-        with _write_lock:
-            SummaryIndexer.delete_data_source_by_id(self.data_source_id)
+        SummaryIndexer.delete_data_source_by_id(self.data_source_id)
 
     @staticmethod
     def delete_data_source_by_id(data_source_id: int) -> None:
-        with _write_lock:
+        _global_refresh.cancel(data_source_id)
+        with _data_source_lock(data_source_id).write(), _global_lock.write():
             vector_store = VectorStoreFactory.for_summaries(data_source_id)
             vector_store.delete()
+            persist_dir = SummaryIndexer.__data_source_persist_dir(data_source_id)
+            _write_behind.discard(persist_dir)
+            _store_cache.invalidate(persist_dir)
             # TODO: figure out a less explosive way to do this.
             shutil.rmtree(
                 SummaryIndexer.__database_dir(data_source_id), ignore_errors=True
@@ -497,8 +714,16 @@ class SummaryIndexer(BaseTextIndexer):
                 global_summary_store.delete_ref_doc(
                     str(data_source_id), delete_from_docstore=True
                 )
-                global_summary_store.storage_context.persist(
-                    persist_dir=global_persist_dir
+                snapshot = _summary_snapshot()
+                snapshot.replace(SummaryIndexer.__summaries_of(global_summary_store))
+                _store_cache.changed(
+                    global_persist_dir, global_summary_store.storage_context
+                )
+                _write_behind.changed(
+                    global_persist_dir,
+                    global_summary_store.storage_context,
+                    _global_lock,
+                    snapshot.write,
                 )
             except Exception as e:
                 logger.debug(f"Error deleting data source {data_source_id}: {e}")
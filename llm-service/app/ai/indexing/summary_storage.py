@@ -0,0 +1,507 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2025
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+"""
+Locking and persistence for the summary stores.
+
+Each data source's summary store, and the global store of data source summaries, has its own reader/writer lock, so
+reading summaries never waits for an unrelated data source to be summarized. Writes are persisted behind the writer:
+a changed store is kept in memory and flushed once a short delay after its first change, so that a burst of inserts is
+written to disk once. Stores are flushed into a temporary directory and each file is renamed into place, so a crash
+mid-flush never leaves a half-written file behind.
+
+Loaded stores are kept in a `StorageContextCache`, so that reading a summary doesn't deserialize the whole docstore.
+
+The summary of each data source is also kept in a `SummarySnapshot`, which is rewritten whenever the global store
+changes, so that reading them doesn't need the global store at all.
+
+Summaries that are derived from others, like the summary of a whole data source, are refreshed by a `Debouncer` once
+its documents stop changing, rather than after every document.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, Hashable, Iterator, Mapping, Optional, Set, Tuple
+
+from llama_index.core import StorageContext
+from llama_index.core.constants import DATA_KEY
+from llama_index.core.storage.docstore import SimpleDocumentStore
+
+logger = logging.getLogger(__name__)
+
+
+class ReadWriteLock:
+    """
+    A lock that any number of readers can hold at once, or a single writer.
+
+    Waiting writers go before new readers, so a steady stream of reads can't starve writes. Neither side is reentrant.
+    """
+
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        with self._condition:
+            while self._writing or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        with self._condition:
+            self._waiting_writers += 1
+            try:
+                while self._writing or self._readers:
+                    self._condition.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+
+def persist_atomically(storage_context: StorageContext, persist_dir: str) -> None:
+    """Persist a storage context, replacing each of the files in `persist_dir` in a single step."""
+    parent = os.path.dirname(os.path.abspath(persist_dir))
+    os.makedirs(persist_dir, exist_ok=True)
+    temp_dir = tempfile.mkdtemp(dir=parent, prefix=f".{os.path.basename(persist_dir)}-")
+    try:
+        storage_context.persist(persist_dir=temp_dir)
+        for name in os.listdir(temp_dir):
+            os.replace(os.path.join(temp_dir, name), os.path.join(persist_dir, name))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+@dataclass
+class _Pending:
+    storage_context: StorageContext
+    lock: ReadWriteLock
+    due: float
+    on_persisted: Optional[Callable[[], None]] = None
+
+
+class WriteBehind:
+    """
+    Persists changed storage contexts in the background, `delay_seconds` after they were first changed.
+
+    Until a storage context is flushed, `pending` returns it, so that indexes are loaded from it rather than from the
+    out-of-date files on disk. Whatever is derived from a store and written alongside it can be written once the store
+    is, by an `on_persisted` callback.
+    """
+
+    def __init__(self, delay_seconds: float):
+        self.delay_seconds = delay_seconds
+        self._pending: Dict[str, _Pending] = {}
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def changed(
+        self,
+        persist_dir: str,
+        storage_context: StorageContext,
+        lock: ReadWriteLock,
+        on_persisted: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """
+        Record that `storage_context` changed; the caller holds `lock`, which guards it.
+
+        `on_persisted` is called after the storage context is next written out, replacing any given by earlier changes.
+        """
+        if self.delay_seconds <= 0:
+            persist_atomically(storage_context, persist_dir)
+            if on_persisted is not None:
+                on_persisted()
+            return
+        with self._condition:
+            pending = self._pending.get(persist_dir)
+            if pending is not None:
+                pending.storage_context = storage_context
+                pending.on_persisted = on_persisted or pending.on_persisted
+                return
+            self._pending[persist_dir] = _Pending(
+                storage_context,
+                lock,
+                time.monotonic() + self.delay_seconds,
+                on_persisted,
+            )
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="summary-write-behind", daemon=True
+                )
+                self._thread.start()
+            self._condition.notify()
+
+    def pending(self, persist_dir: str) -> Optional[StorageContext]:
+        with self._condition:
+            pending = self._pending.get(persist_dir)
+            return pending.storage_context if pending is not None else None
+
+    def discard(self, persist_dir: str) -> None:
+        """Forget the changes to a store that is being deleted."""
+        with self._condition:
+            self._pending.pop(persist_dir, None)
+
+    def flush(self) -> None:
+        """Persist every changed storage context now."""
+        with self._condition:
+            persist_dirs = list(self._pending)
+        for persist_dir in persist_dirs:
+            self._flush(persist_dir)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                persist_dir, pending = min(
+                    self._pending.items(), key=lambda item: item[1].due
+                )
+                wait = pending.due - time.monotonic()
+                if wait > 0:
+                    self._condition.wait(wait)
+                    continue
+            self._flush(persist_dir)
+
+    def _flush(self, persist_dir: str) -> None:
+        with self._condition:
+            pending = self._pending.get(persist_dir)
+        if pending is None:
+            return
+        # Holding the read side keeps writers from changing the stores while they are written out,
+        # and the entry stays pending until the files are in place so that readers never load stale ones
+        with pending.lock.read():
+            with self._condition:
+                if self._pending.get(persist_dir) is not pending:
+                    return
+            try:
+                persist_atomically(pending.storage_context, persist_dir)
+            except Exception:
+                logger.exception(f"Failed to persist summaries to {persist_dir}")
+                with self._condition:
+                    pending.due = time.monotonic() + self.delay_seconds
+                return
+            with self._condition:
+                del self._pending[persist_dir]
+            if pending.on_persisted is not None:
+                try:
+                    pending.on_persisted()
+                except Exception:
+                    logger.exception(f"Failed to write what depends on {persist_dir}")
+
+
+# Rough in-memory overhead of a node besides its text, and the size of a context whose documents are stored remotely
+_NODE_OVERHEAD_BYTES = 1024
+_REMOTE_STORE_BYTES = 64 * 1024
+
+
+def estimated_size(storage_context: StorageContext) -> int:
+    docstore = storage_context.docstore
+    if not isinstance(docstore, SimpleDocumentStore):
+        # The documents are fetched from the key-value store as they are needed
+        return _REMOTE_STORE_BYTES
+    # Read the stored JSON rather than `docstore.docs`, which would deserialize every node
+    stored = docstore._kvstore.get_all(docstore._node_collection)
+    return sum(
+        len(value.get(DATA_KEY, {}).get("text", "")) + _NODE_OVERHEAD_BYTES
+        for value in stored.values()
+    )
+
+
+@dataclass
+class _Cached:
+    storage_context: StorageContext
+    size: int
+
+
+class StorageContextCache:
+    """
+    Loaded storage contexts, by persist directory, with the least recently used ones evicted past `max_size_bytes`.
+
+    Every change to a store bumps its version. A context loaded from disk is only cached if its store's version is
+    still the one it was loaded at, so a load that raced a change can't put the old state back into the cache.
+    """
+
+    def __init__(self, max_size_bytes: int):
+        self.max_size_bytes = max_size_bytes
+        self._cached: OrderedDict[str, _Cached] = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, persist_dir: str) -> Optional[StorageContext]:
+        with self._lock:
+            cached = self._cached.get(persist_dir)
+            if cached is None:
+                return None
+            self._cached.move_to_end(persist_dir)
+            return cached.storage_context
+
+    def version(self, persist_dir: str) -> int:
+        with self._lock:
+            return self._versions.get(persist_dir, 0)
+
+    def put(
+        self, persist_dir: str, storage_context: StorageContext, version: int
+    ) -> None:
+        """Cache a context loaded when the store was at `version`."""
+        size = estimated_size(storage_context)
+        with self._lock:
+            if self._versions.get(persist_dir, 0) == version:
+                self._store(persist_dir, storage_context, size)
+
+    def changed(self, persist_dir: str, storage_context: StorageContext) -> None:
+        """Cache the context of a store that was just changed."""
+        size = estimated_size(storage_context)
+        with self._lock:
+            self._bump(persist_dir)
+            self._store(persist_dir, storage_context, size)
+
+    def invalidate(self, persist_dir: str) -> None:
+        with self._lock:
+            self._bump(persist_dir)
+            self._remove(persist_dir)
+
+    def size(self) -> int:
+        with self._lock:
+            return self._size
+
+    def _bump(self, persist_dir: str) -> None:
+        self._versions[persist_dir] = self._versions.get(persist_dir, 0) + 1
+
+    def _store(
+        self, persist_dir: str, storage_context: StorageContext, size: int
+    ) -> None:
+        self._remove(persist_dir)
+        if size > self.max_size_bytes:
+            return
+        self._cached[persist_dir] = _Cached(storage_context, size)
+        self._size += size
+        while self._size > self.max_size_bytes:
+            self._remove(next(iter(self._cached)))
+
+    def _remove(self, persist_dir: str) -> None:
+        cached = self._cached.pop(persist_dir, None)
+        if cached is not None:
+            self._size -= cached.size
+
+
+class SummarySnapshot:
+    """
+    The summary of every data source, by data source ID, held in memory and in a JSON file at `path`.
+
+    The summaries in memory change as soon as the summary store does, but the file is only replaced, in a single step,
+    by `write` once the store has been written out, so that it never gets ahead of the store on disk. The summaries
+    come with an ETag that changes with them, and must not be modified.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._summaries: Optional[Mapping[str, str]] = None
+        self._etag = ""
+        self._lock = threading.Lock()
+
+    def get(
+        self, load: Callable[[], Mapping[str, str]]
+    ) -> Tuple[Mapping[str, str], str]:
+        """Return the summaries and their ETag, reading them with `load` if there is no snapshot yet."""
+        with self._lock:
+            if self._summaries is not None:
+                return self._summaries, self._etag
+        # Loading takes the summary stores' locks, which are held while the snapshot is replaced
+        summaries = self._read()
+        written = summaries is not None
+        if summaries is None:
+            summaries = load()
+        with self._lock:
+            if self._summaries is None:
+                if not written:
+                    self._write(summaries)
+                self._set(summaries)
+            assert self._summaries is not None
+            return self._summaries, self._etag
+
+    def replace(self, summaries: Mapping[str, str]) -> None:
+        with self._lock:
+            self._set(summaries)
+
+    def write(self) -> None:
+        """Write the summaries in memory to the file."""
+        with self._lock:
+            if self._summaries is not None:
+                self._write(self._summaries)
+
+    def _set(self, summaries: Mapping[str, str]) -> None:
+        self._summaries = summaries
+        contents = json.dumps(summaries, sort_keys=True).encode("utf-8")
+        self._etag = f'"{hashlib.sha256(contents).hexdigest()[:32]}"'
+
+    def _read(self) -> Optional[Mapping[str, str]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                summaries = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return summaries if isinstance(summaries, dict) else None
+
+    def _write(self, summaries: Mapping[str, str]) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(summaries, f)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+@dataclass
+class _Scheduled:
+    action: Callable[[], None]
+    first: float
+    due: float
+
+
+class Debouncer:
+    """
+    Runs an action in the background once its key has stopped being scheduled for `delay_seconds`.
+
+    Scheduling a key again replaces its action and pushes it back, but never past `max_delay_seconds` after it was
+    first scheduled, so a steady stream of changes still gets acted on.
+    """
+
+    def __init__(self, delay_seconds: float, max_delay_seconds: float):
+        self.delay_seconds = delay_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self._scheduled: Dict[Hashable, _Scheduled] = {}
+        self._running: Set[Hashable] = set()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, key: Hashable, action: Callable[[], None]) -> None:
+        if self.delay_seconds <= 0:
+            self._run(key, action)
+            return
+        with self._condition:
+            now = time.monotonic()
+            scheduled = self._scheduled.get(key)
+            first = scheduled.first if scheduled is not None else now
+            self._scheduled[key] = _Scheduled(
+                action,
+                first,
+                min(now + self.delay_seconds, first + self.max_delay_seconds),
+            )
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._loop, name="summary-debouncer", daemon=True
+                )
+                self._thread.start()
+            self._condition.notify_all()
+
+    def run_now(self, key: Hashable) -> None:
+        """Run the action scheduled for `key` in this thread, or wait for it if it is already running."""
+        with self._condition:
+            while key in self._running:
+                self._condition.wait()
+            scheduled = self._scheduled.pop(key, None)
+            if scheduled is None:
+                return
+            self._running.add(key)
+        self._run(key, scheduled.action)
+
+    def cancel(self, key: Hashable) -> None:
+        with self._condition:
+            self._scheduled.pop(key, None)
+
+    def flush(self) -> None:
+        """Run every scheduled action now, and wait for those already running."""
+        with self._condition:
+            keys = set(self._scheduled) | self._running
+        for key in keys:
+            self.run_now(key)
+
+    def _loop(self) -> None:
+        while True:
+            with self._condition:
+                while not self._scheduled:
+                    self._condition.wait()
+                key, scheduled = min(
+                    self._scheduled.items(), key=lambda item: item[1].due
+                )
+                wait = scheduled.due - time.monotonic()
+                if wait > 0:
+                    self._condition.wait(wait)
+                    continue
+                del self._scheduled[key]
+                self._running.add(key)
+            self._run(key, scheduled.action)
+
+    def _run(self, key: Hashable, action: Callable[[], None]) -> None:
+        try:
+            action()
+        except Exception:
+            logger.exception(f"Failed to refresh summaries of {key}")
+        finally:
+            with self._condition:
+                self._running.discard(key)
+                self._condition.notify_all()
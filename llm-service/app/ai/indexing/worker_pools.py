@@ -0,0 +1,380 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2025
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+
+"""
+Worker pools shared by every indexing job in the process.
+
+Indexing used to spin up its own thread pool per document. Sharing the pools means that bulk loads are bounded by one
+set of limits: parsing runs on a pool of worker processes, and every embedding request goes through a single
+rate-limited thread pool, no matter how many documents are being indexed at once.
+"""
+
+import asyncio
+import dataclasses
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from pathlib import Path
+from typing import (
+    Awaitable,
+    Callable,
+    List,
+    Optional,
+    ParamSpec,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+)
+
+from llama_index.core.node_parser import SentenceSplitter
+
+from .readers.base_reader import BaseReader, ChunksResult, ReaderConfig
+from ...config import settings
+
+logger = logging.getLogger(__name__)
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+PARSE_WORKER_NICENESS = 10
+
+
+@dataclass(frozen=True)
+class ParseTask:
+    """
+    Everything a worker process needs to parse one file.
+
+    Splitters don't survive pickling, so the splitter is described by its settings and rebuilt in the worker.
+    """
+
+    reader_cls: Type[BaseReader]
+    file_path: Path
+    document_id: str
+    data_source_id: int
+    chunk_size: int
+    chunk_overlap: int
+    reader_config: Optional[ReaderConfig] = None
+    # Only parse these pages, counting from 1 and including both ends
+    pages: Optional[Tuple[int, int]] = None
+
+    def run(self) -> ChunksResult:
+        reader = self.reader_cls(
+            splitter=SentenceSplitter(
+                chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap
+            ),
+            document_id=self.document_id,
+            data_source_id=self.data_source_id,
+            config=self.reader_config,
+        )
+        if self.pages is not None:
+            return reader.load_pages(self.file_path, *self.pages)
+        return reader.load_chunks(self.file_path)
+
+
+def _run_parse_task(task: ParseTask) -> ChunksResult:
+    return task.run()
+
+
+class RateLimiter:
+    """Token bucket that allows `rate` acquisitions per second, with bursts of up to `rate`."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._tokens = rate
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while wait := self._take():
+            time.sleep(wait)
+
+    async def aacquire(self) -> None:
+        while wait := self._take():
+            await asyncio.sleep(wait)
+
+    def _take(self) -> float:
+        """Take a token if there is one, otherwise return how long to wait for the next."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.rate, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+
+class EmbeddingPool:
+    """
+    Runs embedding requests, optionally capped at a number of requests per second.
+
+    Models with a native async client are run as coroutines on a single event loop thread, so that many requests can
+    be in flight without a thread for each. Everything else runs on a thread pool.
+    """
+
+    def __init__(self, workers: int, max_requests_per_second: float):
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="embedding"
+        )
+        self._rate_limiter = (
+            RateLimiter(max_requests_per_second) if max_requests_per_second else None
+        )
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+
+    def submit(
+        self, fn: Callable[P, T], *args: P.args, **kwargs: P.kwargs
+    ) -> "Future[T]":
+        def rate_limited() -> T:
+            if self._rate_limiter:
+                self._rate_limiter.acquire()
+            return fn(*args, **kwargs)
+
+        return self._executor.submit(rate_limited)
+
+    def submit_async(
+        self, fn: Callable[P, Awaitable[T]], *args: P.args, **kwargs: P.kwargs
+    ) -> "Future[T]":
+        async def rate_limited() -> T:
+            if self._rate_limiter:
+                await self._rate_limiter.aacquire()
+            return await fn(*args, **kwargs)
+
+        return asyncio.run_coroutine_threadsafe(rate_limited(), self._event_loop())
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._loop_lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop = None
+
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name="embedding-loop", daemon=True
+                ).start()
+                self._loop = loop
+            return self._loop
+
+
+class ParsePool:
+    """
+    A pool of worker processes for parsing documents that is replaced after a number of documents.
+
+    Docling and torch don't give back all the memory they use for a document, so each worker is retired after about
+    `tasks_per_worker` documents. The whole pool is swapped for a fresh one instead of relying on
+    `max_tasks_per_child`, which needs Python 3.11; documents already running on the old pool finish normally. A pool
+    that has lost a worker (e.g. killed for using too much memory) is replaced the same way.
+    """
+
+    def __init__(self, workers: int, tasks_per_worker: int):
+        self.workers = workers
+        self.tasks_per_worker = tasks_per_worker
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._submitted = 0
+        self._lock = threading.Lock()
+
+    def submit(self, task: ParseTask) -> "Future[ChunksResult]":
+        with self._lock:
+            if self._executor is None or self._exhausted():
+                self._replace()
+            assert self._executor is not None
+            try:
+                future = self._executor.submit(_run_parse_task, task)
+            except BrokenProcessPool:
+                logger.warning("Document parsing pool is broken, starting a new one")
+                self._replace()
+                future = self._executor.submit(_run_parse_task, task)
+            self._submitted += 1
+            return future
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _exhausted(self) -> bool:
+        if self.tasks_per_worker <= 0:
+            return False
+        return self._submitted >= self.workers * self.tasks_per_worker
+
+    def _replace(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        logger.info(f"Starting document parsing pool with {self.workers} processes")
+        # Worker processes are spawned rather than forked: forking a process that is already running threads
+        # (uvicorn, the embedding pool, tokenizers) can deadlock the child.
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_parse_worker,
+        )
+        self._submitted = 0
+
+
+def _init_parse_worker() -> None:
+    # Parsing is background work; leave the CPU to the processes answering requests when they need it
+    try:
+        os.nice(PARSE_WORKER_NICENESS)
+    except OSError:
+        pass
+
+
+_lock = threading.Lock()
+_parse_pool: Optional[ParsePool] = None
+_embedding_pool: Optional[EmbeddingPool] = None
+
+
+def _get_parse_pool() -> Optional[ParsePool]:
+    global _parse_pool
+    workers = settings.indexing_parse_workers
+    if workers <= 0:
+        return None
+    with _lock:
+        if _parse_pool is None:
+            _parse_pool = ParsePool(workers, settings.indexing_parse_tasks_per_worker)
+        return _parse_pool
+
+
+def submit_parse(task: ParseTask) -> "Future[ChunksResult]":
+    """Parse a file on the shared process pool, or in the calling thread if the pool is disabled."""
+    pool = _get_parse_pool()
+    if pool is not None:
+        return pool.submit(task)
+    future: Future[ChunksResult] = Future()
+    try:
+        future.set_result(task.run())
+    except BaseException as e:
+        future.set_exception(e)
+    return future
+
+
+def parse(task: ParseTask) -> ChunksResult:
+    """
+    Parse a file on the shared process pool, splitting it into page ranges that are parsed at the same time.
+
+    Documents whose reader can read a range of pages are split over up to one process per worker, with at least
+    `settings.indexing_min_pages_per_shard` pages each. The chunks of the ranges are put back in page order.
+    """
+    pool = _get_parse_pool()
+    shards = page_shards(task, pool.workers) if pool is not None else []
+    if pool is None or len(shards) <= 1:
+        return submit_parse(task).result()
+
+    logger.info(f"Parsing {task.file_path} in {len(shards)} page ranges: {shards}")
+    futures = [pool.submit(dataclasses.replace(task, pages=pages)) for pages in shards]
+    try:
+        return merge_results([future.result() for future in futures])
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def page_shards(task: ParseTask, workers: int) -> List[Tuple[int, int]]:
+    """Split the pages of the task's file into about equal ranges, or return no ranges if it can't be split."""
+    try:
+        page_count = task.reader_cls.page_count(task.file_path)
+    except Exception:
+        # Let the parser report what is wrong with the file
+        logger.exception(f"Failed to count the pages of {task.file_path}")
+        return []
+    if not page_count:
+        return []
+
+    shard_count = min(
+        workers,
+        math.ceil(page_count / max(1, settings.indexing_min_pages_per_shard)),
+    )
+    shard_size = math.ceil(page_count / shard_count)
+    return [
+        (first, min(first + shard_size - 1, page_count))
+        for first in range(1, page_count + 1, shard_size)
+    ]
+
+
+def merge_results(results: List[ChunksResult]) -> ChunksResult:
+    """Combine the results of parsing the page ranges of a document, in order."""
+    secret_types: Set[str] = set()
+    merged = ChunksResult()
+    for result in results:
+        if result.secret_types:
+            secret_types |= result.secret_types
+        merged.pii_found = merged.pii_found or result.pii_found
+        merged.chunks.extend(result.chunks)
+    if secret_types:
+        return ChunksResult(secret_types=secret_types, pii_found=merged.pii_found)
+
+    for i, chunk in enumerate(merged.chunks):
+        chunk.metadata["chunk_number"] = i
+    return merged
+
+
+def embedding_pool() -> EmbeddingPool:
+    global _embedding_pool
+    with _lock:
+        if _embedding_pool is None:
+            _embedding_pool = EmbeddingPool(
+                settings.embedding_pool_size,
+                settings.embedding_max_requests_per_second,
+            )
+        return _embedding_pool
+
+
+def shutdown() -> None:
+    global _parse_pool, _embedding_pool
+    with _lock:
+        if _parse_pool is not None:
+            _parse_pool.shutdown()
+            _parse_pool = None
+        if _embedding_pool is not None:
+            _embedding_pool.shutdown()
+            _embedding_pool = None
@@ -0,0 +1,134 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2025
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+"""
+HNSW profiles, which trade search latency for recall the same way for every vector store.
+
+A profile sets how many neighbours each vector is linked to (`m`), how widely neighbours are searched for while the
+graph is built (`ef_construct`), and how widely the graph is searched at query time (`ef`). The first two are fixed
+when a collection is built; `ef` applies to every search.
+"""
+
+import statistics
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+from ...config import IndexProfileName, settings
+from .vector_store import VectorStore
+
+
+@dataclass(frozen=True)
+class IndexProfile:
+    name: IndexProfileName
+    m: int
+    ef_construct: int
+    ef: int
+
+
+INDEX_PROFILES: Dict[IndexProfileName, IndexProfile] = {
+    "fast": IndexProfile("fast", m=8, ef_construct=64, ef=32),
+    "balanced": IndexProfile("balanced", m=16, ef_construct=128, ef=128),
+    "high-recall": IndexProfile("high-recall", m=32, ef_construct=256, ef=512),
+}
+
+
+def default_profile() -> Optional[IndexProfile]:
+    """The profile new collections are built with, or None for the vector store's own defaults."""
+    name = settings.vector_index_profile
+    return INDEX_PROFILES[name] if name else None
+
+
+def profile_for(
+    m: Optional[int], ef_construct: Optional[int]
+) -> Optional[IndexProfile]:
+    """The profile a collection was built with, if it was built with one."""
+    for profile in INDEX_PROFILES.values():
+        if (profile.m, profile.ef_construct) == (m, ef_construct):
+            return profile
+    return None
+
+
+class ProfileBenchmark(BaseModel):
+    profile: IndexProfileName
+    ef: int
+    mean_latency_ms: float
+    p95_latency_ms: float
+    # share of the exact nearest neighbours that were found
+    recall: float
+
+
+def benchmark(
+    vector_store: VectorStore, query_embeddings: List[List[float]], top_k: int
+) -> List[ProfileBenchmark]:
+    """
+    Search for each query with the `ef` of every profile, and compare the results with an exact search.
+
+    The collection keeps the graph it was built with, so this measures the query-time side of each profile.
+    """
+    exact = [
+        set(vector_store.search_ids(embedding, top_k, ef=None))
+        for embedding in query_embeddings
+    ]
+    results: List[ProfileBenchmark] = []
+    for profile in INDEX_PROFILES.values():
+        latencies: List[float] = []
+        found = 0
+        with vector_store.search_width(profile.ef):
+            for embedding, expected in zip(query_embeddings, exact):
+                start = time.perf_counter()
+                ids = vector_store.search_ids(embedding, top_k, ef=profile.ef)
+                latencies.append((time.perf_counter() - start) * 1000)
+                found += len(expected.intersection(ids))
+        expected_count = sum(len(expected) for expected in exact)
+        results.append(
+            ProfileBenchmark(
+                profile=profile.name,
+                ef=profile.ef,
+                mean_latency_ms=statistics.fmean(latencies),
+                p95_latency_ms=_percentile(latencies, 0.95),
+                recall=found / expected_count if expected_count else 1.0,
+            )
+        )
+    return results
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
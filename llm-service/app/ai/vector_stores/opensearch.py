@@ -35,13 +35,15 @@
 #  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
 #  DATA.
 #
+import contextlib
 import functools
 import logging
 from abc import ABC
-from typing import Optional, List
+from typing import Any, Dict, Iterator, Optional, List
 
 import fastapi.exceptions
 import opensearchpy
+import opensearchpy.helpers
 from llama_index.core.base.embeddings.base import BaseEmbedding
 from llama_index.core.schema import BaseNode, TextNode
 from llama_index.core.vector_stores.types import BasePydanticVectorStore
@@ -51,19 +53,45 @@ from llama_index.vector_stores.opensearch import (
 )
 from opensearchpy.client import OpenSearch as OpensearchClient
 
-from app.ai.vector_stores.vector_store import VectorStore
+from app.ai.vector_stores.index_profiles import IndexProfile, default_profile
+from app.ai.vector_stores.vector_store import (
+    NODE_CONTENT_KEY,
+    VectorStore,
+    updated_metadata,
+)
 from app.config import settings
 from app.services.metadata_apis import data_sources_metadata_api
 from app.services.models import Embedding
 
 logger = logging.getLogger(__name__)
 
+# llama-index's default distance
+_SPACE_TYPE = "l2"
+# how wide the graph is searched; nmslib indexes don't take it per query
+_EF_SEARCH_SETTING = "index.knn.algo_param.ef_search"
+
 
 def _new_opensearch_client(dim: int, index: str) -> OpensearchVectorClient:
+    # The method and settings are only used when the index is created
+    method: Optional[Dict[str, Any]] = None
+    index_settings: Optional[Dict[str, Any]] = None
+    profile = default_profile()
+    if profile:
+        method = {
+            "name": "hnsw",
+            "space_type": _SPACE_TYPE,
+            "engine": "nmslib",
+            "parameters": {"ef_construction": profile.ef_construct, "m": profile.m},
+        }
+        index_settings = {
+            "index": {"knn": True, "knn.algo_param.ef_search": profile.ef}
+        }
     return OpensearchVectorClient(
         endpoint=settings.opensearch_endpoint,
         index=index,
         dim=dim,
+        method=method,
+        settings=index_settings,
         http_auth=(settings.opensearch_username, settings.opensearch_password),
     )
 
@@ -122,7 +150,59 @@ class OpenSearch(VectorStore, ABC):
             raise fastapi.exceptions.HTTPException(404, "Index not found")
 
     def delete_document(self, document_id: str) -> None:
-        self._get_client().delete_by_doc_id(document_id)
+        self.delete_documents([document_id])
+
+    def delete_documents(self, document_ids: List[str]) -> None:
+        if not document_ids or not self.exists():
+            return
+        self._low_level_client.delete_by_query(
+            index=self.table_name,
+            body={"query": {"terms": {"metadata.doc_id.keyword": document_ids}}},
+            refresh=True,
+        )
+
+    def get_chunk_metadata(
+        self, document_id: str, keys: List[str]
+    ) -> Dict[str, Dict[str, Any]]:
+        if not self.exists():
+            return {}
+        query = {
+            "query": {"term": {"metadata.doc_id.keyword": {"value": document_id}}},
+            "_source": [f"metadata.{key}" for key in keys],
+        }
+        chunks: Dict[str, Dict[str, Any]] = {}
+        for hit in opensearchpy.helpers.scan(
+            self._low_level_client, index=self.table_name, query=query
+        ):
+            chunks[hit["_id"]] = hit.get("_source", {}).get("metadata", {})
+        return chunks
+
+    def update_chunk_metadata(self, updates: Dict[str, Dict[str, Any]]) -> None:
+        if not updates:
+            return
+        stored = self._low_level_client.mget(
+            index=self.table_name,
+            body={"ids": list(updates)},
+            _source=[f"metadata.{NODE_CONTENT_KEY}"],
+        )
+        opensearchpy.helpers.bulk(
+            self._low_level_client,
+            [
+                {
+                    "_op_type": "update",
+                    "_index": self.table_name,
+                    "_id": doc["_id"],
+                    "doc": {
+                        "metadata": updated_metadata(
+                            doc["_source"].get("metadata", {}), updates[doc["_id"]]
+                        )
+                    },
+                }
+                for doc in stored["docs"]
+                if doc.get("found")
+            ],
+            refresh=True,
+        )
 
     def llama_vector_store(self) -> BasePydanticVectorStore:
         return OpensearchVectorStore(
@@ -149,6 +229,69 @@ class OpenSearch(VectorStore, ABC):
             index=self.table_name,
         )
 
+    def set_index_profile(self, profile: IndexProfile) -> None:
+        """
+        OpenSearch can't rebuild the graph of an existing index, so it keeps being searched with the graph it was
+        built with, but as widely as the profile says.
+        """
+        self._low_level_client.indices.put_settings(
+            index=self.table_name,
+            body={_EF_SEARCH_SETTING: profile.ef},
+        )
+
+    @contextlib.contextmanager
+    def search_width(self, ef: int) -> Iterator[None]:
+        indices = self._low_level_client.indices
+        current = indices.get_settings(
+            index=self.table_name, name=_EF_SEARCH_SETTING, flat_settings=True
+        )
+        previous = (
+            current.get(self.table_name, {}).get("settings", {}).get(_EF_SEARCH_SETTING)
+        )
+        indices.put_settings(index=self.table_name, body={_EF_SEARCH_SETTING: ef})
+        try:
+            yield
+        finally:
+            # None puts the index back on the default
+            indices.put_settings(
+                index=self.table_name, body={_EF_SEARCH_SETTING: previous}
+            )
+
+    def search_ids(
+        self, query_embedding: List[float], top_k: int, ef: Optional[int]
+    ) -> List[str]:
+        query: Dict[str, Any]
+        if ef is None:
+            query = {
+                "script_score": {
+                    "query": {"match_all": {}},
+                    "script": {
+                        "source": "knn_score",
+                        "lang": "knn",
+                        "params": {
+                            "field": "embedding",
+                            "query_value": query_embedding,
+                            "space_type": _SPACE_TYPE,
+                        },
+                    },
+                }
+            }
+        else:
+            # as wide as the index's ef_search setting, see search_width
+            query = {
+                "knn": {
+                    "embedding": {
+                        "vector": query_embedding,
+                        "k": top_k,
+                    }
+                }
+            }
+        results = self._low_level_client.search(
+            index=self.table_name,
+            body={"size": top_k, "_source": False, "query": query},
+        )
+        return [hit["_id"] for hit in results["hits"]["hits"]]
+
     def exists(self) -> bool:
         os_client = self._low_level_client
         return bool(os_client.indices.exists(index=self.table_name))
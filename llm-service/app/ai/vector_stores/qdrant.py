@@ -35,50 +35,447 @@
 #  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
 #  DATA.
 #
+import dataclasses
+import functools
 import logging
-from typing import Optional, cast
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple, cast
 
 import qdrant_client
 from llama_index.core.base.embeddings.base import BaseEmbedding
-from llama_index.core.indices import VectorStoreIndex
-from llama_index.core.vector_stores.types import BasePydanticVectorStore
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryMode,
+    VectorStoreQueryResult,
+)
 from llama_index.vector_stores.qdrant import (
     QdrantVectorStore as LlamaIndexQdrantVectorStore,
 )
-from qdrant_client.http.models import CountResult, Record
+from pydantic import PrivateAttr
+from qdrant_client.http import models as rest
+from qdrant_client.http.models import (
+    CountResult,
+    FieldCondition,
+    Filter,
+    MatchAny,
+    MatchValue,
+    Record,
+)
 
-from .vector_store import VectorStore
-from ...config import settings
+from .index_profiles import IndexProfile, default_profile, profile_for
+from .vector_store import NODE_CONTENT_KEY, VectorStore, updated_metadata
+from ...config import QdrantQuantizationType, settings
 from ...services import models
 from ...services.metadata_apis import data_sources_metadata_api
 
 logger = logging.getLogger(__name__)
 
 
-def _new_qdrant_client() -> qdrant_client.QdrantClient:
-    auth_token: str | None = settings.cdsw_apiv2_key
+# How many more candidates than requested are fetched with the quantized vectors, to be rescored with the originals.
+# Coarser quantization loses more precision, so it needs more of them for the same recall.
+_DEFAULT_OVERSAMPLING: Dict[QdrantQuantizationType, float] = {
+    "none": 1.0,
+    "scalar": 1.0,
+    "product": 2.0,
+    "binary": 3.0,
+}
+
+
+def _quantization_config(
+    quantization: QdrantQuantizationType,
+) -> Optional[rest.QuantizationConfig]:
+    # The quantized vectors are what is searched, so they stay in memory even when the originals are on disk.
+    match quantization:
+        case "scalar":
+            return rest.ScalarQuantization(
+                scalar=rest.ScalarQuantizationConfig(
+                    type=rest.ScalarType.INT8, quantile=0.99, always_ram=True
+                )
+            )
+        case "product":
+            return rest.ProductQuantization(
+                product=rest.ProductQuantizationConfig(
+                    compression=rest.CompressionRatio.X16, always_ram=True
+                )
+            )
+        case "binary":
+            return rest.BinaryQuantization(
+                binary=rest.BinaryQuantizationConfig(always_ram=True)
+            )
+    return None
+
+
+def _quantization_type(
+    config: Optional[rest.QuantizationConfig],
+) -> QdrantQuantizationType:
+    match config:
+        case rest.ScalarQuantization():
+            return "scalar"
+        case rest.ProductQuantization():
+            return "product"
+        case rest.BinaryQuantization():
+            return "binary"
+    return "none"
+
+
+@dataclass(frozen=True)
+class _CollectionSettings:
+    quantization: QdrantQuantizationType
+    profile: Optional[IndexProfile]
+    # Whether the original vectors are kept on disk
+    on_disk: bool = False
+
+
+def _search_params(
+    collection: _CollectionSettings, ef: Optional[int] = None
+) -> Optional[rest.SearchParams]:
+    """Search parameters for the collection, searching the graph `ef` wide if given, or as wide as its profile says."""
+    if ef is None and collection.profile is not None:
+        ef = collection.profile.ef
+    quantization: Optional[rest.QuantizationSearchParams] = None
+    if collection.quantization != "none":
+        quantization = rest.QuantizationSearchParams(
+            rescore=True,
+            oversampling=settings.qdrant_oversampling
+            or _DEFAULT_OVERSAMPLING[collection.quantization],
+        )
+    if ef is None and quantization is None:
+        return None
+    return rest.SearchParams(hnsw_ef=ef, quantization=quantization)
+
+
+class _LlamaIndexQdrantVectorStore(LlamaIndexQdrantVectorStore):
+    """
+    Creates collections with the quantization, vector storage and HNSW profile of the data source's settings, and
+    searches them with the profile's `ef`, oversampling and rescoring quantized ones.
+    """
+
+    _search_params: Optional[rest.SearchParams] = PrivateAttr(default=None)
+    _on_disk: bool = PrivateAttr(default=False)
+    _profile: Optional[IndexProfile] = PrivateAttr(default=None)
+    _tenants: Optional[List[int]] = PrivateAttr(default=None)
+
+    def __init__(
+        self,
+        collection_name: str,
+        client: qdrant_client.QdrantClient,
+        collection: _CollectionSettings,
+        tenants: Optional[List[int]] = None,
+    ):
+        super().__init__(
+            collection_name,
+            client,
+            quantization_config=_quantization_config(collection.quantization),
+        )
+        self._search_params = _search_params(collection)
+        self._on_disk = collection.on_disk
+        self._profile = collection.profile
+        self._tenants = tenants
+
+    def _create_collection(self, collection_name: str, vector_size: int) -> None:
+        self._dense_config = rest.VectorParams(
+            size=vector_size,
+            distance=rest.Distance.COSINE,
+            on_disk=self._on_disk,
+            hnsw_config=_hnsw_config(self._profile) if self._profile else None,
+        )
+        super()._create_collection(collection_name, vector_size)
+        # Deletes and per-document scrolls filter on these, which is a full scan without an index
+        payload_indexes: Dict[str, rest.PayloadSchemaType | rest.KeywordIndexParams] = {
+            **_PAYLOAD_INDEXES
+        }
+        if self._tenants is not None:
+            # Qdrant keeps each tenant's points together, so searching one data source doesn't go through the others
+            payload_indexes[_TENANT_KEY] = rest.KeywordIndexParams(
+                type=rest.KeywordIndexType.KEYWORD, is_tenant=True
+            )
+        for field_name, field_schema in payload_indexes.items():
+            self._client.create_payload_index(
+                collection_name=collection_name,
+                field_name=field_name,
+                field_schema=field_schema,
+            )
+
+    def _build_points(
+        self, nodes: List[BaseNode], sparse_vector_name: str
+    ) -> Tuple[List[Any], List[str]]:
+        points, ids = super()._build_points(nodes, sparse_vector_name)
+        if self._tenants is not None:
+            for point in points:
+                payload = point.payload
+                payload[_TENANT_KEY] = _tenant_value(
+                    payload.get("data_source_id", self._tenants[0])
+                )
+        return points, ids
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if (
+            self._search_params is None
+            or self.enable_hybrid
+            or query.mode != VectorStoreQueryMode.DEFAULT
+        ):
+            return super().query(query, **kwargs)
+        response = self._client.search(
+            collection_name=self.collection_name,
+            query_vector=rest.NamedVector(
+                name=self.dense_vector_name,
+                vector=cast(List[float], query.query_embedding),
+            ),
+            limit=query.similarity_top_k,
+            query_filter=self.__query_filter(query, **kwargs),
+            search_params=self._search_params,
+        )
+        return self.parse_to_query_result(response)
+
+    async def aquery(
+        self, query: VectorStoreQuery, **kwargs: Any
+    ) -> VectorStoreQueryResult:
+        if (
+            self._search_params is None
+            or self._aclient is None
+            or self.enable_hybrid
+            or query.mode != VectorStoreQueryMode.DEFAULT
+        ):
+            return await super().aquery(query, **kwargs)
+        response = await self._aclient.search(
+            collection_name=self.collection_name,
+            query_vector=rest.NamedVector(
+                name=self.dense_vector_name,
+                vector=cast(List[float], query.query_embedding),
+            ),
+            limit=query.similarity_top_k,
+            query_filter=self.__query_filter(query, **kwargs),
+            search_params=self._search_params,
+        )
+        return self.parse_to_query_result(response)
+
+    def __query_filter(self, query: VectorStoreQuery, **kwargs: Any) -> Filter:
+        qdrant_filters = kwargs.get("qdrant_filters")
+        if qdrant_filters is not None:
+            return cast(Filter, qdrant_filters)
+        return cast(Filter, self._build_query_filter(query))
+
+    def _build_query_filter(self, query: VectorStoreQuery) -> Optional[Any]:
+        query_filter = super()._build_query_filter(query)
+        if self._tenants is None:
+            return query_filter
+        if query_filter is None:
+            return Filter(must=[_tenant_condition(self._tenants)])
+        query_filter.must = [
+            *(query_filter.must or []),
+            _tenant_condition(self._tenants),
+        ]
+        return query_filter
+
+    def get_nodes(
+        self,
+        node_ids: Optional[List[str]] = None,
+        filters: Optional[MetadataFilters] = None,
+        limit: Optional[int] = None,
+    ) -> List[BaseNode]:
+        if self._tenants is None:
+            return super().get_nodes(node_ids, filters, limit)
+        # llama-index matches lists of metadata values as strings, which data source IDs aren't
+        must: List[rest.Condition] = [_tenant_condition(self._tenants)]
+        if node_ids is not None:
+            must.append(rest.HasIdCondition(has_id=list(node_ids)))
+            limit = len(node_ids) if limit is None else min(len(node_ids), limit)
+        if filters is not None:
+            must.append(self._build_subfilter(filters))
+        records, _ = self._client.scroll(
+            collection_name=self.collection_name,
+            limit=limit or 9999,
+            scroll_filter=Filter(must=must),
+            with_vectors=True,
+        )
+        return list(self.parse_to_query_result(records).nodes or [])
+
+
+# The llama-index store already indexes "doc_id" when it creates a collection
+_PAYLOAD_INDEXES: Dict[str, rest.PayloadSchemaType] = {
+    "document_id": rest.PayloadSchemaType.KEYWORD,
+    "data_source_id": rest.PayloadSchemaType.INTEGER,
+    "file_name": rest.PayloadSchemaType.KEYWORD,
+}
+
+
+# Chunks in a shared collection are told apart by the data source they come from. Qdrant only groups the points of
+# each tenant for keyword fields, so this is kept next to the integer "data_source_id" of the chunk's metadata.
+_TENANT_KEY = "tenant"
+
+
+def _tenant_value(data_source_id: int) -> str:
+    return str(data_source_id)
+
+
+def _tenant_condition(tenants: List[int]) -> FieldCondition:
+    return FieldCondition(
+        key=_TENANT_KEY,
+        match=MatchAny(any=[_tenant_value(tenant) for tenant in tenants]),
+    )
+
+
+def _hnsw_config(profile: IndexProfile) -> rest.HnswConfigDiff:
+    return rest.HnswConfigDiff(m=profile.m, ef_construct=profile.ef_construct)
+
+
+# How each collection is quantized and indexed, which decides how it is searched
+_collection_settings: Dict[str, _CollectionSettings] = {}
+
+# The collection the chunks of each data source are in, when collections are shared; None for those that keep a
+# collection of their own
+_shared_collections: Dict[int, Optional[str]] = {}
+_shared_collections_lock = threading.Lock()
 
+
+@functools.cache
+def _embedding_dimension(embedding_model: str) -> int:
+    return len(models.Embedding.get(embedding_model).get_query_embedding("any"))
+
+
+def _model_collection(embedding_model: str, client: qdrant_client.QdrantClient) -> str:
+    """
+    The name of the collection shared by the data sources embedded with a model, which includes the model's dimension.
+
+    The dimension is taken from the name of the model's collection if there is one already; the model is only asked
+    for an embedding to find it out before the first chunks embedded with it are stored.
+    """
+    model_name = re.sub(r"[^\w.-]", "_", embedding_model)
+    prefix = f"chunks_{model_name}_"
+    for collection in client.get_collections().collections:
+        if (
+            collection.name.startswith(prefix)
+            and collection.name[len(prefix) :].isdigit()
+        ):
+            return collection.name
+    return f"{prefix}{_embedding_dimension(embedding_model)}"
+
+
+def _shared_collection(
+    data_source_id: int, client: qdrant_client.QdrantClient
+) -> Optional[str]:
+    """
+    The collection shared by every data source embedded with the same model as this one, or None if the data source
+    was indexed into a collection of its own before collections were shared, which it keeps using.
+    """
+    with _shared_collections_lock:
+        if data_source_id in _shared_collections:
+            return _shared_collections[data_source_id]
+    collection: Optional[str] = None
+    if not client.collection_exists(f"index_{data_source_id}"):
+        embedding_model = data_sources_metadata_api.get_metadata(
+            data_source_id
+        ).embedding_model
+        collection = _model_collection(embedding_model, client)
+    with _shared_collections_lock:
+        return _shared_collections.setdefault(data_source_id, collection)
+
+
+def _forget_shared_collections(data_source_ids: List[int]) -> None:
+    with _shared_collections_lock:
+        for data_source_id in data_source_ids:
+            _shared_collections.pop(data_source_id, None)
+
+
+def _new_qdrant_client(auth_token: Optional[str]) -> qdrant_client.QdrantClient:
     def auth_token_provider() -> str:
         return auth_token or "You should never see this"
 
     return qdrant_client.QdrantClient(
         host=settings.qdrant_host,
         port=settings.qdrant_port,
+        grpc_port=settings.qdrant_grpc_port,
+        prefer_grpc=settings.qdrant_prefer_grpc,
         auth_token_provider=auth_token_provider if auth_token else None,
     )
 
 
+# Clients keep a pool of connections to Qdrant open, so they are shared by every vector store in the process.
+_clients: Dict[
+    Tuple[str, int, int, bool, Optional[str]], qdrant_client.QdrantClient
+] = {}
+_clients_lock = threading.Lock()
+
+
+def _shared_qdrant_client() -> qdrant_client.QdrantClient:
+    auth_token = settings.cdsw_apiv2_key
+    key = (
+        settings.qdrant_host,
+        settings.qdrant_port,
+        settings.qdrant_grpc_port,
+        settings.qdrant_prefer_grpc,
+        auth_token,
+    )
+    client = _clients.get(key)
+    if client is None:
+        stale: List[qdrant_client.QdrantClient] = []
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                # A client for the same server with another key or protocol won't be used again
+                stale_keys = [other for other in _clients if other[:3] == key[:3]]
+                stale = [_clients.pop(other) for other in stale_keys]
+                client = _clients[key] = _new_qdrant_client(auth_token)
+        for old_client in stale:
+            old_client.close()
+    return client
+
+
+def close_clients() -> None:
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
+
+
 class QdrantVectorStore(VectorStore):
     @staticmethod
     def for_chunks(
         data_source_id: int, client: Optional[qdrant_client.QdrantClient] = None
     ) -> "QdrantVectorStore":
+        if settings.qdrant_shared_collections:
+            client = client or _shared_qdrant_client()
+            collection = _shared_collection(data_source_id, client)
+            if collection is not None:
+                return QdrantVectorStore(
+                    table_name=collection,
+                    data_source_id=data_source_id,
+                    client=client,
+                    tenants=[data_source_id],
+                )
         return QdrantVectorStore(
             table_name=f"index_{data_source_id}",
             data_source_id=data_source_id,
             client=client,
         )
 
+    @staticmethod
+    def for_chunks_of(
+        data_source_ids: List[int], client: Optional[qdrant_client.QdrantClient] = None
+    ) -> List["QdrantVectorStore"]:
+        """Stores for the chunks of the data sources, where those sharing a collection share a single store."""
+        stores: List[QdrantVectorStore] = []
+        shared: Dict[str, QdrantVectorStore] = {}
+        for data_source_id in data_source_ids:
+            store = QdrantVectorStore.for_chunks(data_source_id, client)
+            if store.tenants is None:
+                stores.append(store)
+            elif store.table_name in shared:
+                shared[store.table_name].tenants = [
+                    *(shared[store.table_name].tenants or []),
+                    data_source_id,
+                ]
+            else:
+                shared[store.table_name] = store
+                stores.append(store)
+        return stores
+
     @staticmethod
     def for_summaries(
         data_source_id: int, client: Optional[qdrant_client.QdrantClient] = None
@@ -94,10 +491,13 @@ class QdrantVectorStore(VectorStore):
         table_name: str,
         data_source_id: int,
         client: Optional[qdrant_client.QdrantClient] = None,
+        tenants: Optional[List[int]] = None,
     ):
-        self.client = client or _new_qdrant_client()
+        self.client = client or _shared_qdrant_client()
         self.table_name = table_name
         self.data_source_id = data_source_id
+        # The data sources whose chunks this store holds, in a collection shared with others; None if it's their own
+        self.tenants = tenants
 
     def get_embedding_model(self) -> BaseEmbedding:
         data_source_metadata = data_sources_metadata_api.get_metadata(
@@ -109,26 +509,192 @@ class QdrantVectorStore(VectorStore):
         """If the collection does not exist, return None."""
         if not self.client.collection_exists(self.table_name):
             return None
-        document_count: CountResult = self.client.count(self.table_name)
+        document_count: CountResult = self.client.count(
+            self.table_name, count_filter=self.__tenant_filter()
+        )
         return document_count.count
 
     def delete(self) -> None:
+        if self.tenants is not None:
+            # Only this data source's chunks, the collection is shared
+            _forget_shared_collections(self.tenants)
+            if self.exists():
+                self.client.delete(
+                    self.table_name,
+                    points_selector=rest.FilterSelector(filter=self.__scoped()),
+                )
+            return
+        _collection_settings.pop(self.table_name, None)
+        _forget_shared_collections([self.data_source_id])
         if self.exists():
             self.client.delete_collection(self.table_name)
 
+    def quantization(self) -> QdrantQuantizationType:
+        """Return how the collection's vectors are quantized; the collection must exist."""
+        info = self.client.get_collection(self.table_name)
+        return _quantization_type(info.config.quantization_config)
+
+    def set_quantization(
+        self, quantization: QdrantQuantizationType, on_disk: bool
+    ) -> None:
+        """
+        Change how an existing collection's vectors are quantized, and whether the original vectors are kept on disk.
+
+        Qdrant rebuilds the quantized vectors in the background, and the collection can be searched in the meantime.
+        """
+        self.client.update_collection(
+            self.table_name,
+            vectors_config={"": rest.VectorParamsDiff(on_disk=on_disk)},
+            quantization_config=_quantization_config(quantization)
+            or rest.Disabled.DISABLED,
+        )
+        _collection_settings[self.table_name] = dataclasses.replace(
+            self.__collection_settings(), quantization=quantization, on_disk=on_disk
+        )
+
+    def set_index_profile(self, profile: IndexProfile) -> None:
+        """Qdrant rebuilds the collection's graph in the background, and the collection can be searched in the meantime."""
+        self.client.update_collection(
+            self.table_name,
+            vectors_config={
+                "": rest.VectorParamsDiff(hnsw_config=_hnsw_config(profile))
+            },
+        )
+        _collection_settings[self.table_name] = dataclasses.replace(
+            self.__collection_settings(), profile=profile
+        )
+
+    def search_ids(
+        self, query_embedding: List[float], top_k: int, ef: Optional[int]
+    ) -> List[str]:
+        search_params = (
+            _search_params(self.__collection_settings(), ef) or rest.SearchParams()
+        )
+        search_params.exact = ef is None
+        points = self.client.search(
+            self.table_name,
+            query_vector=query_embedding,
+            query_filter=self.__tenant_filter(),
+            limit=top_k,
+            search_params=search_params,
+            with_payload=False,
+        )
+        return [str(point.id) for point in points]
+
+    def __collection_settings(self) -> _CollectionSettings:
+        collection = _collection_settings.get(self.table_name)
+        if collection is not None:
+            return collection
+        if not self.exists():
+            # It will be created as configured
+            return _CollectionSettings(
+                settings.qdrant_quantization,
+                default_profile(),
+                settings.qdrant_on_disk_vectors,
+            )
+        info = self.client.get_collection(self.table_name)
+        hnsw_config: Optional[rest.HnswConfigDiff | rest.HnswConfig] = (
+            info.config.hnsw_config
+        )
+        vectors = info.config.params.vectors
+        on_disk = False
+        if isinstance(vectors, rest.VectorParams):
+            hnsw_config = vectors.hnsw_config or hnsw_config
+            on_disk = bool(vectors.on_disk)
+        collection = _CollectionSettings(
+            _quantization_type(info.config.quantization_config),
+            profile_for(
+                hnsw_config.m if hnsw_config else None,
+                hnsw_config.ef_construct if hnsw_config else None,
+            ),
+            on_disk,
+        )
+        _collection_settings[self.table_name] = collection
+        return collection
+
     def delete_document(self, document_id: str) -> None:
-        if self.exists():
-            index = VectorStoreIndex.from_vector_store(
-                vector_store=self.llama_vector_store(),
-                embed_model=models.Embedding.get_noop(),
+        self.delete_documents([document_id])
+
+    def delete_documents(self, document_ids: List[str]) -> None:
+        if not document_ids or not self.exists():
+            return
+        self.client.delete(
+            self.table_name,
+            points_selector=rest.FilterSelector(
+                filter=self.__scoped(
+                    FieldCondition(key="doc_id", match=MatchAny(any=document_ids))
+                )
+            ),
+        )
+
+    def get_chunk_metadata(
+        self, document_id: str, keys: List[str]
+    ) -> Dict[str, Dict[str, Any]]:
+        if not self.exists():
+            return {}
+        document_filter = self.__scoped(
+            FieldCondition(key="doc_id", match=MatchValue(value=document_id))
+        )
+        chunks: Dict[str, Dict[str, Any]] = {}
+        offset = None
+        while True:
+            records, offset = self.client.scroll(
+                self.table_name,
+                scroll_filter=document_filter,
+                limit=1000,
+                offset=offset,
+                with_payload=keys,
+                with_vectors=False,
             )
-            index.delete_ref_doc(document_id)
+            for record in records:
+                chunks[str(record.id)] = dict(record.payload or {})
+            if offset is None:
+                return chunks
+
+    def update_chunk_metadata(self, updates: Dict[str, Dict[str, Any]]) -> None:
+        if not updates:
+            return
+        records = self.client.retrieve(
+            self.table_name,
+            ids=list(updates),
+            with_payload=[NODE_CONTENT_KEY],
+            with_vectors=False,
+        )
+        self.client.batch_update_points(
+            self.table_name,
+            [
+                rest.SetPayloadOperation(
+                    set_payload=rest.SetPayload(
+                        payload=updated_metadata(
+                            record.payload or {}, updates[str(record.id)]
+                        ),
+                        points=[record.id],
+                    )
+                )
+                for record in records
+            ],
+        )
+
+    def __scoped(self, *conditions: rest.Condition) -> Filter:
+        """A filter for the points matching all the conditions, among this store's data sources' chunks."""
+        must = list(conditions)
+        if self.tenants is not None:
+            must.append(_tenant_condition(self.tenants))
+        return Filter(must=must)
+
+    def __tenant_filter(self) -> Optional[Filter]:
+        return self.__scoped() if self.tenants is not None else None
 
     def exists(self) -> bool:
         return self.client.collection_exists(self.table_name)
 
     def llama_vector_store(self) -> BasePydanticVectorStore:
-        vector_store = LlamaIndexQdrantVectorStore(self.table_name, self.client)
+        vector_store = _LlamaIndexQdrantVectorStore(
+            self.table_name,
+            self.client,
+            self.__collection_settings(),
+            self.tenants,
+        )
         return vector_store
 
     def visualize(
@@ -137,7 +703,12 @@ class QdrantVectorStore(VectorStore):
         if not self.exists():
             return []
         records: list[Record]
-        records, _ = self.client.scroll(self.table_name, limit=5000, with_vectors=True)
+        records, _ = self.client.scroll(
+            self.table_name,
+            scroll_filter=self.__tenant_filter(),
+            limit=5000,
+            with_vectors=True,
+        )
 
         embeddings: list[list[float]] = []
         filenames: list[str] = []
@@ -35,17 +35,40 @@
 #  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
 #  DATA.
 #
+import contextlib
+import json
 import logging
 from abc import abstractmethod, ABCMeta
-from typing import Optional, List, cast
+from typing import TYPE_CHECKING, Any, Dict, Iterator, Optional, List, cast
 
 import umap
 from llama_index.core.base.embeddings.base import BaseEmbedding
 from llama_index.core.schema import BaseNode
 from llama_index.core.vector_stores.types import BasePydanticVectorStore
 
+if TYPE_CHECKING:
+    from .index_profiles import IndexProfile
+
 logger = logging.getLogger(__name__)
 
+# llama-index keeps a serialized copy of each node, metadata included, next to the metadata it stores for filtering
+NODE_CONTENT_KEY = "_node_content"
+
+
+def updated_metadata(stored: Dict[str, Any], updates: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Return the stored fields to overwrite to change the metadata of a chunk stored by llama-index.
+
+    `stored` needs the serialized node, which is what nodes are read back from.
+    """
+    fields = dict(updates)
+    node_content = stored.get(NODE_CONTENT_KEY)
+    if node_content is not None:
+        node = json.loads(node_content)
+        node.setdefault("metadata", {}).update(updates)
+        fields[NODE_CONTENT_KEY] = json.dumps(node)
+    return fields
+
 
 class VectorStore(metaclass=ABCMeta):
     """RAG Studio Vector Store functionality. Implementations of this should house the vectors for a single document collection."""
@@ -64,6 +87,34 @@ class VectorStore(metaclass=ABCMeta):
     def delete_document(self, document_id: str) -> None:
         """Delete a single document from the vector store"""
 
+    def delete_documents(self, document_ids: List[str]) -> None:
+        """Delete several documents from the vector store"""
+        for document_id in document_ids:
+            self.delete_document(document_id)
+
+    def get_chunk_hashes(self, document_id: str) -> Dict[str, Optional[str]]:
+        """Map the ID of every chunk stored for a document to the content hash recorded when it was indexed"""
+        return {
+            chunk_id: metadata.get("chunk_hash")
+            for chunk_id, metadata in self.get_chunk_metadata(
+                document_id, ["chunk_hash"]
+            ).items()
+        }
+
+    @abstractmethod
+    def get_chunk_metadata(
+        self, document_id: str, keys: List[str]
+    ) -> Dict[str, Dict[str, Any]]:
+        """Map the ID of every chunk stored for a document to the values of some of its metadata keys"""
+
+    @abstractmethod
+    def update_chunk_metadata(self, updates: Dict[str, Dict[str, Any]]) -> None:
+        """Change some of the metadata of stored chunks, by chunk ID, without writing them again"""
+
+    def delete_chunks(self, chunk_ids: List[str]) -> None:
+        """Delete individual chunks from the vector store"""
+        self.llama_vector_store().delete_nodes(chunk_ids)
+
     @abstractmethod
     def llama_vector_store(self) -> BasePydanticVectorStore:
         """Access the underlying llama-index vector store implementation"""
@@ -111,5 +162,20 @@ class VectorStore(metaclass=ABCMeta):
             logger.error(f"Error during UMAP transformation: {e}")
             return []
 
-    def get_chunk_contents(self, chunk_id: str) -> BaseNode :
+    @abstractmethod
+    def search_ids(
+        self, query_embedding: List[float], top_k: int, ef: Optional[int]
+    ) -> List[str]:
+        """Return the IDs of the nearest chunks, searching the graph `ef` wide, or exhaustively if `ef` is None"""
+
+    @contextlib.contextmanager
+    def search_width(self, ef: int) -> Iterator[None]:
+        """Search the graph `ef` wide inside the block, for stores that can't be given `ef` per query"""
+        yield
+
+    @abstractmethod
+    def set_index_profile(self, profile: "IndexProfile") -> None:
+        """Build the collection with an HNSW profile from now on, and search it with the profile's `ef`"""
+
+    def get_chunk_contents(self, chunk_id: str) -> BaseNode:
         return self.llama_vector_store().get_nodes([chunk_id])[0]
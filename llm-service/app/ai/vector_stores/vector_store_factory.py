@@ -35,6 +35,7 @@
 #  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
 #  DATA.
 #
+from typing import List, Tuple
 
 from app.ai.vector_stores.opensearch import OpenSearch
 from app.ai.vector_stores.qdrant import QdrantVectorStore
@@ -50,6 +51,21 @@ class VectorStoreFactory:
             return OpenSearch.for_chunks(data_source_id)
         return QdrantVectorStore.for_chunks(data_source_id)
 
+    @staticmethod
+    def for_chunks_of(
+        data_source_ids: List[int],
+    ) -> List[Tuple[List[int], VectorStore]]:
+        """The vector stores holding the chunks of the data sources, each with the data sources whose chunks it holds"""
+        if settings.vector_db_provider == "OPENSEARCH":
+            return [
+                ([data_source_id], OpenSearch.for_chunks(data_source_id))
+                for data_source_id in data_source_ids
+            ]
+        return [
+            (store.tenants or [store.data_source_id], store)
+            for store in QdrantVectorStore.for_chunks_of(data_source_ids)
+        ]
+
     @staticmethod
     def for_summaries(data_source_id: int) -> VectorStore:
         if settings.vector_db_provider == "OPENSEARCH":
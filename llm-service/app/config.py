@@ -46,17 +46,34 @@ simply the field name in all capital letters.
 
 import logging
 import os.path
-from typing import cast, Optional, Literal
+from typing import cast, Optional, Literal, Any, get_args
 
 
 SummaryStorageProviderType = Literal["Local", "S3"]
 ChatStoreProviderType = Literal["Local", "S3"]
 VectorDbProviderType = Literal["QDRANT", "OPENSEARCH"]
+QdrantQuantizationType = Literal["none", "scalar", "product", "binary"]
+IndexProfileName = Literal["fast", "balanced", "high-recall"]
+
+
+def _choice(env_var: str, value: str, choices: Any) -> str:
+    """Check that an env var's value is one of the `Literal` type `choices`."""
+    allowed = get_args(choices)
+    if value not in allowed:
+        raise ValueError(
+            f"{env_var} must be one of {', '.join(allowed)}, not {value!r}"
+        )
+    return value
 
 
 class _Settings:
     """RAG configuration."""
 
+    def validate(self) -> None:
+        """Raise for env vars set to values that aren't allowed, rather than failing when they are first used."""
+        for name in ("qdrant_quantization", "vector_index_profile"):
+            getattr(self, name)
+
     @property
     def metadata_api_url(self) -> str:
         return os.environ.get("API_URL", "http://localhost:8080")
@@ -101,10 +118,167 @@ class _Settings:
     def qdrant_port(self) -> int:
         return int(os.environ.get("QDRANT_PORT", "6333"))
 
+    @property
+    def qdrant_grpc_port(self) -> int:
+        return int(os.environ.get("QDRANT_GRPC_PORT", "6334"))
+
+    @property
+    def qdrant_prefer_grpc(self) -> bool:
+        """Whether to talk to Qdrant over gRPC, rather than its REST API."""
+        return os.environ.get("QDRANT_PREFER_GRPC", "false").lower() == "true"
+
+    @property
+    def qdrant_shared_collections(self) -> bool:
+        """Whether the chunks of data sources with the same embedding model share a Qdrant collection."""
+        return os.environ.get("QDRANT_SHARED_COLLECTIONS", "false").lower() == "true"
+
+    @property
+    def qdrant_quantization(self) -> QdrantQuantizationType:
+        """How the vectors of new Qdrant collections are quantized: none, scalar, product or binary."""
+        return cast(
+            QdrantQuantizationType,
+            _choice(
+                "QDRANT_QUANTIZATION",
+                os.environ.get("QDRANT_QUANTIZATION", "none").lower(),
+                QdrantQuantizationType,
+            ),
+        )
+
+    @property
+    def qdrant_on_disk_vectors(self) -> bool:
+        """Whether new Qdrant collections keep their original vectors on disk rather than in memory."""
+        return os.environ.get("QDRANT_ON_DISK_VECTORS", "false").lower() == "true"
+
+    @property
+    def qdrant_oversampling(self) -> float:
+        """Oversampling of searches in quantized Qdrant collections. 0 uses a default that suits the quantization."""
+        return float(os.environ.get("QDRANT_OVERSAMPLING", "0"))
+
+    @property
+    def vector_index_profile(self) -> Optional[IndexProfileName]:
+        """HNSW profile new collections are built with: fast, balanced or high-recall. Unset uses the defaults."""
+        profile = os.environ.get("VECTOR_INDEX_PROFILE", "").lower()
+        if not profile:
+            return None
+        return cast(
+            IndexProfileName,
+            _choice("VECTOR_INDEX_PROFILE", profile, IndexProfileName),
+        )
+
     @property
     def advanced_pdf_parsing(self) -> bool:
         return os.environ.get("USE_ENHANCED_PDF_PROCESSING", "false").lower() == "true"
 
+    @property
+    def indexing_queue_depth(self) -> int:
+        """Number of chunk batches that can be waiting between each stage of the indexing pipeline."""
+        return int(os.environ.get("INDEXING_QUEUE_DEPTH", "4"))
+
+    @property
+    def indexing_parse_workers(self) -> int:
+        """
+        Number of processes used to parse documents. 0 parses in the calling thread.
+
+        Each process loads its own copy of the parsing models, so the default is half the CPUs, and no more than 4.
+        """
+        default = max(1, min(4, (os.cpu_count() or 1) // 2))
+        return int(os.environ.get("INDEXING_PARSE_WORKERS", str(default)))
+
+    @property
+    def indexing_parse_tasks_per_worker(self) -> int:
+        """Number of documents each parsing process handles before it is replaced. 0 never replaces them."""
+        return int(os.environ.get("INDEXING_PARSE_TASKS_PER_WORKER", "25"))
+
+    @property
+    def indexing_min_pages_per_shard(self) -> int:
+        """Fewest pages a parsing process is given when a long document is split across several of them."""
+        return int(os.environ.get("INDEXING_MIN_PAGES_PER_SHARD", "20"))
+
+    @property
+    def docling_converters(self) -> int:
+        """Number of warm Docling converters kept by each process that parses documents."""
+        return int(os.environ.get("DOCLING_CONVERTERS", "1"))
+
+    @property
+    def pii_analysis_processes(self) -> int:
+        """Number of processes each document's PII analysis is spread over."""
+        return int(os.environ.get("PII_ANALYSIS_PROCESSES", "1"))
+
+    @property
+    def indexing_batch_concurrency(self) -> int:
+        """Number of documents from a batch request that are downloaded and indexed at the same time."""
+        return int(os.environ.get("INDEXING_BATCH_CONCURRENCY", "8"))
+
+    @property
+    def indexing_job_workers(self) -> int:
+        """Number of background indexing jobs that run at the same time."""
+        return int(os.environ.get("INDEXING_JOB_WORKERS", "2"))
+
+    @property
+    def indexing_jobs_per_data_source(self) -> int:
+        """Number of background indexing jobs of the same data source that run at the same time."""
+        return int(os.environ.get("INDEXING_JOBS_PER_DATA_SOURCE", "1"))
+
+    @property
+    def indexing_job_max_attempts(self) -> int:
+        return int(os.environ.get("INDEXING_JOB_MAX_ATTEMPTS", "3"))
+
+    @property
+    def indexing_job_retry_seconds(self) -> float:
+        """Delay before the first retry of a failed indexing job; each retry after that waits twice as long."""
+        return float(os.environ.get("INDEXING_JOB_RETRY_SECONDS", "30"))
+
+    @property
+    def embedding_pool_size(self) -> int:
+        """Number of embedding requests that can be in flight across all indexing jobs."""
+        return int(os.environ.get("EMBEDDING_POOL_SIZE", "20"))
+
+    @property
+    def query_embedding_pool_size(self) -> int:
+        """Number of connections for embedding chat queries, kept apart from the ones indexing uses."""
+        return int(os.environ.get("QUERY_EMBEDDING_POOL_SIZE", "10"))
+
+    @property
+    def embedding_max_requests_per_second(self) -> float:
+        """Cap on embedding requests per second across all indexing jobs. 0 means no cap."""
+        return float(os.environ.get("EMBEDDING_MAX_REQUESTS_PER_SECOND", "0"))
+
+    @property
+    def embedding_cache_enabled(self) -> bool:
+        return os.environ.get("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+
+    @property
+    def embedding_cache_max_bytes(self) -> int:
+        return int(os.environ.get("EMBEDDING_CACHE_MAX_MB", "1024")) * 1024 * 1024
+
+    @property
+    def parse_cache_enabled(self) -> bool:
+        return os.environ.get("PARSE_CACHE_ENABLED", "true").lower() == "true"
+
+    @property
+    def parse_cache_max_bytes(self) -> int:
+        return int(os.environ.get("PARSE_CACHE_MAX_MB", "2048")) * 1024 * 1024
+
+    @property
+    def parse_cache_ttl_seconds(self) -> int:
+        """How long a parsed document is kept in the parse cache after it was parsed."""
+        return int(os.environ.get("PARSE_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+
+    @property
+    def summary_persist_delay_seconds(self) -> float:
+        """How long changes to a summary store are kept in memory before they are written out. 0 writes them at once."""
+        return float(os.environ.get("SUMMARY_PERSIST_DELAY_SECONDS", "2"))
+
+    @property
+    def summary_refresh_delay_seconds(self) -> float:
+        """How long a data source's documents must go unchanged before its summary is refreshed. 0 refreshes at once."""
+        return float(os.environ.get("SUMMARY_REFRESH_DELAY_SECONDS", "10"))
+
+    @property
+    def summary_cache_max_bytes(self) -> int:
+        """Memory the loaded summary stores may take up before the least recently used ones are dropped."""
+        return int(os.environ.get("SUMMARY_CACHE_MAX_MB", "256")) * 1024 * 1024
+
     @property
     def vector_db_provider(self) -> Optional[str]:
         return os.environ.get("VECTOR_DB_PROVIDER")
@@ -65,6 +65,10 @@ from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from uvicorn.logging import DefaultFormatter
 
+from .ai.indexing import worker_pools
+from .ai.indexing.job_queue import get_job_queue
+from .ai.indexing.summary_indexer import SummaryIndexer
+from .ai.vector_stores import qdrant
 from .config import settings
 from .routers import index
 
@@ -154,7 +158,14 @@ def initialize_logging() -> None:
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     initialize_logging()
+    settings.validate()
+    job_queue = get_job_queue()
+    job_queue.start(index.data_source.run_index_job)
     yield
+    job_queue.stop()
+    SummaryIndexer.flush()
+    worker_pools.shutdown()
+    qdrant.close_clients()
 
 
 ###################################
@@ -29,8 +29,10 @@
 # ##############################################################################
 import logging
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
-from typing import Any, Dict, Optional
+from pathlib import Path
+from typing import Any, Dict, List, Literal, Optional, Union
 
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi_utils.cbv import cbv
@@ -41,9 +43,20 @@ from pydantic import BaseModel
 from .... import exceptions
 from ....ai.indexing.base import NotSupportedFileExtensionError
 from ....ai.indexing.embedding_indexer import EmbeddingIndexer
+from ....ai.indexing.job_queue import (
+    IndexingJob,
+    IndexingJobsReport,
+    JobFailed,
+    ProgressCallback,
+    get_job_queue,
+)
 from ....ai.indexing.summary_indexer import SummaryIndexer
+from ....ai.vector_stores import index_profiles
+from ....ai.vector_stores.index_profiles import INDEX_PROFILES, ProfileBenchmark
+from ....ai.vector_stores.qdrant import QdrantVectorStore
 from ....ai.vector_stores.vector_store import VectorStore
 from ....ai.vector_stores.vector_store_factory import VectorStoreFactory
+from ....config import IndexProfileName, QdrantQuantizationType, settings
 from ....services import document_storage, models
 from ....services.metadata_apis import data_sources_metadata_api
 from ....services.metadata_apis.data_sources_metadata_api import RagDataSource
@@ -65,6 +78,8 @@ class SummarizeDocumentRequest(BaseModel):
 class RagIndexDocumentConfiguration(BaseModel):
     chunk_size: int = 512  # this is llama-index's default
     chunk_overlap: int = 10  # percentage of tokens in a chunk (chunk_size)
+    # diff against the chunks already indexed for the document, instead of deleting and rebuilding it
+    incremental: bool = False
 
 
 class RagIndexDocumentRequest(BaseModel):
@@ -74,6 +89,54 @@ class RagIndexDocumentRequest(BaseModel):
     configuration: RagIndexDocumentConfiguration = RagIndexDocumentConfiguration()
 
 
+class RagBatchIndexDocument(BaseModel):
+    document_id: str
+    s3_bucket_name: str
+    s3_document_key: str
+    original_filename: str
+
+
+class RagBatchIndexRequest(BaseModel):
+    documents: List[RagBatchIndexDocument]
+    configuration: RagIndexDocumentConfiguration = RagIndexDocumentConfiguration()
+
+
+class RagBatchDeleteRequest(BaseModel):
+    document_ids: List[str]
+
+
+class RagIndexJobRequest(BaseModel):
+    document_id: str
+    s3_bucket_name: str
+    s3_document_key: str
+    original_filename: str
+    configuration: RagIndexDocumentConfiguration = RagIndexDocumentConfiguration()
+    # jobs with a higher priority run first
+    priority: int = 0
+
+
+class DocumentIndexStatus(BaseModel):
+    document_id: str
+    status: Literal["indexed", "unsupported", "failed"]
+    detail: Optional[str] = None
+
+
+class QuantizationSettings(BaseModel):
+    quantization: QdrantQuantizationType
+    # keep the original vectors, which are only used for rescoring, on disk rather than in memory
+    on_disk: bool = False
+
+
+class IndexProfileRequest(BaseModel):
+    profile: IndexProfileName
+
+
+class IndexProfileBenchmarkRequest(BaseModel):
+    # sample queries, as users would ask them
+    queries: List[str]
+    top_k: int = 10
+
+
 class ChunkContentsResponse(BaseModel):
     text: str
     metadata: Dict[str, Any]
@@ -102,6 +165,7 @@ class DataSourceController:
     )
     @exceptions.propagates
     def delete(self, data_source_id: int) -> None:
+        get_job_queue().delete_data_source(data_source_id)
         self.chunks_vector_store.delete()
         SummaryIndexer.delete_data_source_by_id(data_source_id)
 
@@ -123,14 +187,28 @@ class DataSourceController:
     )
     @exceptions.propagates
     def delete_document(self, data_source_id: int, doc_id: str) -> None:
-        self.chunks_vector_store.delete_document(doc_id)
+        self._delete_documents(data_source_id, [doc_id])
+
+    @router.post(
+        "/documents/delete", summary="delete several documents", response_model=None
+    )
+    @exceptions.propagates
+    def delete_documents(
+        self, data_source_id: int, request: RagBatchDeleteRequest
+    ) -> None:
+        self._delete_documents(data_source_id, request.document_ids)
+
+    def _delete_documents(self, data_source_id: int, doc_ids: List[str]) -> None:
+        get_job_queue().delete_documents(data_source_id, doc_ids)
+        self.chunks_vector_store.delete_documents(doc_ids)
         summary_indexer = self._get_summary_indexer(data_source_id)
         if summary_indexer:
-            try:
-                summary_indexer.delete_document(doc_id)
-            except Exception as e:
-                # ignore, since it might just be because the summary index doesn't exist yet
-                logger.info("Failed to delete document %s: %s", doc_id, e)
+            for doc_id in doc_ids:
+                try:
+                    summary_indexer.delete_document(doc_id)
+                except Exception as e:
+                    # ignore, since it might just be because the summary index doesn't exist yet
+                    logger.info("Failed to delete document %s: %s", doc_id, e)
 
     @router.post(
         "/documents/{doc_id}/index",
@@ -145,62 +223,105 @@ class DataSourceController:
         request: RagIndexDocumentRequest,
     ) -> None:
         datasource = data_sources_metadata_api.get_metadata(data_source_id)
-        self._download_and_index(datasource, doc_id, request)
+        download_and_index(datasource, doc_id, request, self.chunks_vector_store)
 
-    def _download_and_index(
-        self, datasource: RagDataSource, doc_id: str, request: RagIndexDocumentRequest
-    ) -> None:
-        with tempfile.TemporaryDirectory() as tmpdirname:
-            logger.debug("created temporary directory %s", tmpdirname)
-            doc_storage = document_storage.from_environment()
-            file_path = doc_storage.download(
-                tmpdirname,
-                request.s3_bucket_name,
-                request.s3_document_key,
-                request.original_filename,
-            )
-            llm: Optional[LLM] = None
-            if datasource.summarization_model:
-                llm = models.LLM.get(datasource.summarization_model)
-            indexer = EmbeddingIndexer(
-                datasource.id,
-                splitter=SentenceSplitter(
-                    chunk_size=request.configuration.chunk_size,
-                    chunk_overlap=int(
-                        request.configuration.chunk_overlap
-                        * 0.01
-                        * request.configuration.chunk_size
-                    ),
-                ),
-                embedding_model=models.Embedding.get(datasource.embedding_model),
-                llm=llm,
-                chunks_vector_store=self.chunks_vector_store,
-            )
-            write_mlflow_run_json(
-                f"datasource_{datasource.name}_{datasource.id}",
-                f"doc_{doc_id}",
-                {
-                    "params": {
-                        "data_source_id": str(datasource.id),
-                        "embedding_model": datasource.embedding_model,
-                        "summarization_model": datasource.summarization_model,
-                        "chunk_size": str(request.configuration.chunk_size),
-                        "chunk_overlap": str(request.configuration.chunk_overlap),
-                        "file_name": request.original_filename,
-                        "file_size_bytes": str(file_path.stat().st_size),
-                    }
-                },
-            )
+    @router.post(
+        "/documents/index",
+        summary="Download and index a batch of documents",
+        response_model=None,
+    )
+    @exceptions.propagates
+    def batch_download_and_index(
+        self,
+        data_source_id: int,
+        request: RagBatchIndexRequest,
+    ) -> List[DocumentIndexStatus]:
+        """
+        Index many documents of one data source as a single job.
 
-            # Delete to avoid duplicates
-            self.chunks_vector_store.delete_document(doc_id)
+        Documents are downloaded concurrently, parsed on the shared process pool, and embedded through the shared
+        embedding pool by a single indexer, instead of each document paying for its own set-up.
+        """
+        datasource = data_sources_metadata_api.get_metadata(data_source_id)
+        indexer = new_indexer(
+            datasource,
+            request.configuration,
+            self.chunks_vector_store,
+            use_parse_pool=True,
+        )
+
+        def index_document(document: RagBatchIndexDocument) -> DocumentIndexStatus:
+            document_request = RagIndexDocumentRequest(
+                s3_bucket_name=document.s3_bucket_name,
+                s3_document_key=document.s3_document_key,
+                original_filename=document.original_filename,
+                configuration=request.configuration,
+            )
             try:
-                indexer.index_file(file_path, doc_id)
-            except NotSupportedFileExtensionError as e:
-                raise HTTPException(
-                    status_code=HTTPStatus.UNSUPPORTED_MEDIA_TYPE,
-                    detail=f"Unsupported file extension: {e.file_extension}",
+                download_and_index(
+                    datasource,
+                    document.document_id,
+                    document_request,
+                    self.chunks_vector_store,
+                    indexer,
                 )
+            except HTTPException as e:
+                if e.status_code == HTTPStatus.UNSUPPORTED_MEDIA_TYPE:
+                    return DocumentIndexStatus(
+                        document_id=document.document_id,
+                        status="unsupported",
+                        detail=e.detail,
+                    )
+                return DocumentIndexStatus(
+                    document_id=document.document_id, status="failed", detail=e.detail
+                )
+            except Exception as e:
+                logger.exception("Failed to index document %s", document.document_id)
+                return DocumentIndexStatus(
+                    document_id=document.document_id, status="failed", detail=str(e)
+                )
+            return DocumentIndexStatus(
+                document_id=document.document_id, status="indexed"
+            )
+
+        with ThreadPoolExecutor(
+            max_workers=settings.indexing_batch_concurrency,
+            thread_name_prefix="batch-index",
+        ) as executor:
+            return list(executor.map(index_document, request.documents))
+
+    @router.post(
+        "/jobs",
+        summary="Queue a document to be downloaded and indexed in the background",
+    )
+    @exceptions.propagates
+    def enqueue_index_job(
+        self,
+        data_source_id: int,
+        request: RagIndexJobRequest,
+    ) -> IndexingJob:
+        document_request = RagIndexDocumentRequest(
+            s3_bucket_name=request.s3_bucket_name,
+            s3_document_key=request.s3_document_key,
+            original_filename=request.original_filename,
+            configuration=request.configuration,
+        )
+        return get_job_queue().enqueue(
+            data_source_id,
+            request.document_id,
+            document_request.model_dump(),
+            priority=request.priority,
+        )
+
+    @router.get(
+        "/jobs",
+        summary="Report the progress of the data source's background indexing jobs",
+    )
+    @exceptions.propagates
+    def get_index_jobs(
+        self, data_source_id: int, limit: int = 100
+    ) -> IndexingJobsReport:
+        return get_job_queue().report(data_source_id, limit)
 
     @router.get(
         "/documents/{doc_id}/summary",
@@ -231,38 +352,65 @@ class DataSourceController:
     ) -> str:
         with tempfile.TemporaryDirectory() as tmpdirname:
             logger.debug("created temporary directory %s", tmpdirname)
-            doc_storage = document_storage.from_environment()
-            file_path = doc_storage.download(
-                tmpdirname,
-                request.s3_bucket_name,
-                request.s3_document_key,
-                request.original_filename,
-            )
+            file_path = _download(tmpdirname, request)
 
             indexer = self._get_summary_indexer(data_source_id)
             if not indexer:
                 return SUMMARIZATION_DISABLED
-            # Delete to avoid duplicates
-            try:
-                indexer.delete_document(doc_id)
-            except Exception as e:
-                # ignore, since it might just be because the summary index doesn't exist yet
-                logger.info("Failed to delete document %s: %s", doc_id, e)
+            return self._summarize(indexer, doc_id, file_path)
 
-            try:
-                indexer.index_file(file_path, doc_id)
-                summary = indexer.get_summary(doc_id)
-                if summary is None:
-                    raise HTTPException(
-                        status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
-                        detail="No content to summarize.",
-                    )
-                return summary
-            except NotSupportedFileExtensionError as e:
+    @router.post(
+        "/documents/{doc_id}/index-and-summarize",
+        summary="Download, index and summarize a document",
+        response_model=None,
+    )
+    @exceptions.propagates
+    def download_index_and_summarize(
+        self,
+        data_source_id: int,
+        doc_id: str,
+        request: RagIndexDocumentRequest,
+    ) -> str:
+        """
+        Index and summarize a document from a single download.
+
+        The summary is made from the same 2048-token chunks as `/summary` makes it from, so it doesn't depend on how
+        the document was chunked for embedding.
+        """
+        datasource = data_sources_metadata_api.get_metadata(data_source_id)
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            logger.debug("created temporary directory %s", tmpdirname)
+            file_path = _download(tmpdirname, request)
+            _index(datasource, doc_id, request, file_path, self.chunks_vector_store)
+
+            indexer = self._get_summary_indexer(data_source_id)
+            if not indexer:
+                return SUMMARIZATION_DISABLED
+            return self._summarize(indexer, doc_id, file_path)
+
+    @staticmethod
+    def _summarize(indexer: SummaryIndexer, doc_id: str, file_path: Path) -> str:
+        # Delete to avoid duplicates
+        try:
+            indexer.delete_document(doc_id)
+        except Exception as e:
+            # ignore, since it might just be because the summary index doesn't exist yet
+            logger.info("Failed to delete document %s: %s", doc_id, e)
+
+        try:
+            indexer.index_file(file_path, doc_id)
+            summary = indexer.get_summary(doc_id)
+            if summary is None:
                 raise HTTPException(
-                    status_code=HTTPStatus.UNSUPPORTED_MEDIA_TYPE,
-                    detail=f"Unsupported file extension: {e.file_extension}",
+                    status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+                    detail="No content to summarize.",
                 )
+            return summary
+        except NotSupportedFileExtensionError as e:
+            raise HTTPException(
+                status_code=HTTPStatus.UNSUPPORTED_MEDIA_TYPE,
+                detail=f"Unsupported file extension: {e.file_extension}",
+            )
 
     @router.get(
         "/size",
@@ -273,6 +421,68 @@ class DataSourceController:
     def size(self) -> int:
         return self.chunks_vector_store.size() or 0
 
+    @router.put(
+        "/quantization",
+        summary="Changes how the data source's vectors are quantized. Only supported by Qdrant.",
+        response_model=None,
+    )
+    @exceptions.propagates
+    def set_quantization(self, request: QuantizationSettings) -> None:
+        if not isinstance(self.chunks_vector_store, QdrantVectorStore):
+            raise HTTPException(
+                status_code=HTTPStatus.BAD_REQUEST,
+                detail="Quantization is only supported by Qdrant.",
+            )
+        self._require_own_collection()
+        self._require_vectors()
+        self.chunks_vector_store.set_quantization(request.quantization, request.on_disk)
+
+    @router.put(
+        "/index-profile",
+        summary="Changes the HNSW profile the data source's vectors are indexed and searched with.",
+        response_model=None,
+    )
+    @exceptions.propagates
+    def set_index_profile(self, request: IndexProfileRequest) -> None:
+        self._require_own_collection()
+        self._require_vectors()
+        self.chunks_vector_store.set_index_profile(INDEX_PROFILES[request.profile])
+
+    @router.post(
+        "/index-profile/benchmark",
+        summary="Reports the search latency and recall of each HNSW profile on sample queries.",
+        response_model=None,
+    )
+    @exceptions.propagates
+    def benchmark_index_profiles(
+        self, request: IndexProfileBenchmarkRequest
+    ) -> List[ProfileBenchmark]:
+        self._require_vectors()
+        embedding_model = self.chunks_vector_store.get_embedding_model()
+        query_embeddings = [
+            embedding_model.get_query_embedding(query) for query in request.queries
+        ]
+        return index_profiles.benchmark(
+            self.chunks_vector_store, query_embeddings, request.top_k
+        )
+
+    def _require_own_collection(self) -> None:
+        if (
+            isinstance(self.chunks_vector_store, QdrantVectorStore)
+            and self.chunks_vector_store.tenants is not None
+        ):
+            raise HTTPException(
+                status_code=HTTPStatus.BAD_REQUEST,
+                detail="The data source's vectors are in a collection shared with other data sources.",
+            )
+
+    def _require_vectors(self) -> None:
+        if not self.chunks_vector_store.exists():
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND,
+                detail="The data source has no vectors yet.",
+            )
+
     @router.get(
         "/summary",
         summary="summarize all documents for a datasource",
@@ -302,3 +512,123 @@ class DataSourceController:
         self, request: VisualizationRequest
     ) -> list[tuple[tuple[float, float], str]]:
         return self.chunks_vector_store.visualize(request.user_query)
+
+
+def new_indexer(
+    datasource: RagDataSource,
+    configuration: RagIndexDocumentConfiguration,
+    chunks_vector_store: VectorStore,
+    use_parse_pool: Optional[bool] = None,
+) -> EmbeddingIndexer:
+    llm: Optional[LLM] = None
+    if datasource.summarization_model:
+        llm = models.LLM.get(datasource.summarization_model)
+    return EmbeddingIndexer(
+        datasource.id,
+        splitter=_splitter(configuration),
+        embedding_model=models.Embedding.get(datasource.embedding_model),
+        llm=llm,
+        chunks_vector_store=chunks_vector_store,
+        use_parse_pool=use_parse_pool,
+        max_batch_size=models.Embedding.get_batch_size_limit(
+            datasource.embedding_model
+        ),
+        max_batch_tokens=models.Embedding.get_batch_token_limit(
+            datasource.embedding_model
+        ),
+    )
+
+
+def _splitter(configuration: RagIndexDocumentConfiguration) -> SentenceSplitter:
+    return SentenceSplitter(
+        chunk_size=configuration.chunk_size,
+        chunk_overlap=int(
+            configuration.chunk_overlap * 0.01 * configuration.chunk_size
+        ),
+    )
+
+
+def download_and_index(
+    datasource: RagDataSource,
+    doc_id: str,
+    request: RagIndexDocumentRequest,
+    chunks_vector_store: VectorStore,
+    indexer: Optional[EmbeddingIndexer] = None,
+) -> None:
+    """Download a document and index it into `chunks_vector_store`, with a new indexer unless one is given."""
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        logger.debug("created temporary directory %s", tmpdirname)
+        file_path = _download(tmpdirname, request)
+        _index(datasource, doc_id, request, file_path, chunks_vector_store, indexer)
+
+
+def _download(
+    tmpdirname: str,
+    request: Union[RagIndexDocumentRequest, SummarizeDocumentRequest],
+) -> Path:
+    doc_storage = document_storage.from_environment()
+    return doc_storage.download(
+        tmpdirname,
+        request.s3_bucket_name,
+        request.s3_document_key,
+        request.original_filename,
+    )
+
+
+def _index(
+    datasource: RagDataSource,
+    doc_id: str,
+    request: RagIndexDocumentRequest,
+    file_path: Path,
+    chunks_vector_store: VectorStore,
+    indexer: Optional[EmbeddingIndexer] = None,
+) -> None:
+    if indexer is None:
+        indexer = new_indexer(datasource, request.configuration, chunks_vector_store)
+    write_mlflow_run_json(
+        f"datasource_{datasource.name}_{datasource.id}",
+        f"doc_{doc_id}",
+        {
+            "params": {
+                "data_source_id": str(datasource.id),
+                "embedding_model": datasource.embedding_model,
+                "summarization_model": datasource.summarization_model,
+                "chunk_size": str(request.configuration.chunk_size),
+                "chunk_overlap": str(request.configuration.chunk_overlap),
+                "file_name": request.original_filename,
+                "file_size_bytes": str(file_path.stat().st_size),
+            }
+        },
+    )
+
+    try:
+        if request.configuration.incremental:
+            indexer.reindex_file(file_path, doc_id)
+        else:
+            # Delete to avoid duplicates
+            chunks_vector_store.delete_document(doc_id)
+            indexer.index_file(file_path, doc_id)
+    except NotSupportedFileExtensionError as e:
+        raise HTTPException(
+            status_code=HTTPStatus.UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Unsupported file extension: {e.file_extension}",
+        )
+
+
+def run_index_job(job: IndexingJob, progress: ProgressCallback) -> None:
+    """Download and index the document of a background indexing job."""
+    request = RagIndexDocumentRequest.model_validate(job.payload)
+    chunks_vector_store = VectorStoreFactory.for_chunks(job.data_source_id)
+    datasource = data_sources_metadata_api.get_metadata(job.data_source_id)
+    indexer = new_indexer(datasource, request.configuration, chunks_vector_store)
+    indexer.on_progress = progress
+    # Stop writing once the document or its data source has been deleted
+    indexer.before_write = lambda: get_job_queue().check_active(job)
+    try:
+        download_and_index(
+            datasource, job.document_id, request, chunks_vector_store, indexer
+        )
+    except HTTPException as e:
+        if e.status_code == HTTPStatus.UNSUPPORTED_MEDIA_TYPE:
+            raise JobFailed(e.detail) from e
+        raise
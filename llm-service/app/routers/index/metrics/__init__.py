@@ -35,11 +35,14 @@
 #  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
 #  DATA.
 #
-from typing import Optional
+from typing import List, Optional
 
 from fastapi import APIRouter
 
 from app import exceptions
+from app.ai.indexing.adaptive_limiter import EmbeddingLimits, all_limits
+from app.ai.indexing.embedding_cache import EmbeddingCacheStats, get_embedding_cache
+from app.ai.indexing.parse_cache import ParseCacheStats, get_parse_cache
 from app.services.metrics import Metrics, generate_metrics, MetricFilter
 
 router = APIRouter(prefix="/app-metrics", tags=["App Metrics"])
@@ -50,3 +53,38 @@ router = APIRouter(prefix="/app-metrics", tags=["App Metrics"])
 def app_metrics(metric_filter: Optional[MetricFilter] = None) -> Metrics:
     metrics = generate_metrics(metric_filter)
     return metrics
+
+
+@router.get(
+    "/embedding-cache",
+    summary="Get hit/miss statistics for the embedding cache.",
+    response_model=None,
+)
+@exceptions.propagates
+def embedding_cache_stats() -> Optional[EmbeddingCacheStats]:
+    cache = get_embedding_cache()
+    if cache is None:
+        return None
+    return cache.stats()
+
+
+@router.get(
+    "/parse-cache",
+    summary="Get hit/miss statistics for the cache of parsed documents.",
+    response_model=None,
+)
+@exceptions.propagates
+def parse_cache_stats() -> Optional[ParseCacheStats]:
+    cache = get_parse_cache()
+    if cache is None:
+        return None
+    return cache.stats()
+
+
+@router.get(
+    "/embedding-limits",
+    summary="Get the current adaptive request limits for each embedding model.",
+)
+@exceptions.propagates
+def embedding_limits() -> List[EmbeddingLimits]:
+    return all_limits()
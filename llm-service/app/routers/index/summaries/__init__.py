@@ -1,6 +1,7 @@
 import logging
+from typing import Mapping, Optional
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Header, Response
 
 from .... import exceptions
 from ....ai.indexing.summary_indexer import SummaryIndexer
@@ -16,5 +17,11 @@ router = APIRouter(prefix="/data_sources", tags=["Data Sources"])
     response_model=None,
 )
 @exceptions.propagates
-def summaries() -> dict[str, str]:
-    return SummaryIndexer.get_all_data_source_summaries()
+def summaries(
+    response: Response, if_none_match: Optional[str] = Header(None)
+) -> Mapping[str, str] | Response:
+    data_source_summaries, etag = SummaryIndexer.data_source_summaries()
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return data_source_summaries
@@ -36,12 +36,13 @@
 #  DATA.
 #
 import json
-from typing import Any, List
+from typing import Any, List, Optional
 
 import httpx
 from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
 from pydantic import Field
 
+from .http_clients import shared_async_client, shared_client
 from .types import Endpoint
 from .utils import build_auth_headers
 
@@ -51,62 +52,107 @@ class CaiiEmbeddingModel(BaseEmbedding):
         Endpoint, description="The endpoint to use for embeddings"
     )
     http_client: httpx.Client = Field(httpx.Client, description="The http client to use for requests")
+    query_http_client: httpx.Client = Field(
+        httpx.Client,
+        description="The http client to use for query embeddings. Defaults to a pool separate from document embeddings.",
+    )
+    async_http_client: Optional[httpx.AsyncClient] = Field(
+        None,
+        description="The async http client to use for requests. Defaults to a client shared per event loop.",
+    )
 
-    def __init__(self, endpoint: Endpoint, http_client: httpx.Client | None = httpx.Client()):
-        super().__init__()
+    def __init__(
+        self,
+        endpoint: Endpoint,
+        http_client: httpx.Client | None = None,
+        async_http_client: httpx.AsyncClient | None = None,
+    ):
+        super().__init__(model_name=endpoint.model_name)
         self.endpoint = endpoint
-        self.http_client = http_client or httpx.Client()
+        self.http_client = http_client or shared_client()
+        self.query_http_client = http_client or shared_client("query")
+        self.async_http_client = async_http_client
 
     def _get_text_embedding(self, text: str) -> Embedding:
         return self._get_embedding(text, "passage")
 
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return await self._aget_embedding(text, "passage")
+
     async def _aget_query_embedding(self, query: str) -> Embedding:
-        raise NotImplementedError("Not implemented")
+        return await self._aget_embedding(query, "query")
 
     def _get_query_embedding(self, query: str) -> Embedding:
         return self._get_embedding(query, "query")
 
     def _get_embedding(self, query: str, input_type: str) -> Embedding:
-        model = self.endpoint.model_name
-        body = json.dumps(
-            {
-                "input": query,
-                "input_type": input_type,
-                "truncate": "END",
-                "model": model,
-            }
+        structured_response = self.make_embedding_request(
+            self._request_body(query, input_type), input_type
         )
-        structured_response = self.make_embedding_request(body)
-        embedding = structured_response["data"][0]["embedding"]
-        assert isinstance(embedding, list)
-        assert all(isinstance(x, float) for x in embedding)
+        return self._single_embedding(structured_response)
 
-        return embedding
+    async def _aget_embedding(self, query: str, input_type: str) -> Embedding:
+        structured_response = await self.amake_embedding_request(
+            self._request_body(query, input_type), input_type
+        )
+        return self._single_embedding(structured_response)
 
-    def make_embedding_request(self, body: str) -> Any:
+    def make_embedding_request(self, body: str, input_type: str = "passage") -> Any:
         headers = build_auth_headers()
         headers["Content-Type"] = "application/json"
-        response = self.http_client.post(url=self.endpoint.url, content=body, headers=headers)
+        client = self.query_http_client if input_type == "query" else self.http_client
+        response = client.post(url=self.endpoint.url, content=body, headers=headers)
+        response.raise_for_status()
         res = response.content
         json_response = res.decode("utf-8")
         structured_response = json.loads(json_response)
         return structured_response
 
+    async def amake_embedding_request(self, body: str, input_type: str = "passage") -> Any:
+        headers = build_auth_headers()
+        headers["Content-Type"] = "application/json"
+        client = self.async_http_client or shared_async_client(
+            "query" if input_type == "query" else "passage"
+        )
+        response = await client.post(url=self.endpoint.url, content=body, headers=headers)
+        response.raise_for_status()
+        return json.loads(response.content.decode("utf-8"))
+
     def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
         if len(texts) == 1:
             return [self._get_text_embedding(texts[0])]
 
-        model = self.endpoint.model_name
-        body = json.dumps(
+        structured_response = self.make_embedding_request(
+            self._request_body(texts, "passage")
+        )
+        return self._embeddings(structured_response)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        structured_response = await self.amake_embedding_request(
+            self._request_body(texts, "passage")
+        )
+        return self._embeddings(structured_response)
+
+    def _request_body(self, query: str | List[str], input_type: str) -> str:
+        return json.dumps(
             {
-                "input": texts,
-                "input_type": "passage",
+                "input": query,
+                "input_type": input_type,
                 "truncate": "END",
-                "model": model,
+                "model": self.endpoint.model_name,
             }
         )
-        structured_response = self.make_embedding_request(body)
 
+    @staticmethod
+    def _single_embedding(structured_response: Any) -> Embedding:
+        embedding = structured_response["data"][0]["embedding"]
+        assert isinstance(embedding, list)
+        assert all(isinstance(x, float) for x in embedding)
+
+        return embedding
+
+    @staticmethod
+    def _embeddings(structured_response: Any) -> List[Embedding]:
         embeddings = list(
             map(lambda data: data["embedding"], structured_response["data"])
         )
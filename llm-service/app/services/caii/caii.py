@@ -138,13 +138,8 @@ def get_embedding_model(model_name: str) -> BaseEmbedding:
     endpoint_name = model_name
     endpoint = describe_endpoint(endpoint_name=endpoint_name)
 
-    if os.path.exists("/etc/ssl/certs/ca-certificates.crt"):
-        http_client = httpx.Client(verify="/etc/ssl/certs/ca-certificates.crt")
-    else:
-        http_client = None
-
     # todo: figure out if the Nvidia library can be made to work for embeddings as well.
-    return CaiiEmbeddingModel(endpoint=endpoint, http_client=http_client)
+    return CaiiEmbeddingModel(endpoint=endpoint)
 
 
 # task types from the MLServing proto definition
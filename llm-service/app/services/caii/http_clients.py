@@ -0,0 +1,113 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2025
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+"""
+HTTP clients shared by every request to CAII endpoints.
+
+Creating a client per model means a new connection pool (and TLS handshakes) per request path. These clients are
+shared instead. Document embeddings and query embeddings get separate pools, bounded by `EMBEDDING_POOL_SIZE` and
+`QUERY_EMBEDDING_POOL_SIZE`, so that indexing can't use up the connections chat queries need. HTTP/2 is offered
+whenever the `h2` package is installed, and used if the endpoint agrees to it.
+"""
+
+import asyncio
+import os
+import threading
+import weakref
+from typing import Dict, Literal, Union
+
+import httpx
+
+from app.config import settings
+
+CA_BUNDLE = "/etc/ssl/certs/ca-certificates.crt"
+
+
+def _verify() -> Union[str, bool]:
+    return CA_BUNDLE if os.path.exists(CA_BUNDLE) else True
+
+
+# Which embeddings a client's connections are for
+Pool = Literal["passage", "query"]
+
+
+def _limits(pool: Pool) -> httpx.Limits:
+    size = (
+        settings.query_embedding_pool_size
+        if pool == "query"
+        else settings.embedding_pool_size
+    )
+    return httpx.Limits(max_connections=size, max_keepalive_connections=size)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+_lock = threading.Lock()
+_clients: Dict[Pool, httpx.Client] = {}
+# An async client is bound to the event loop its connections were opened on
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Pool, httpx.AsyncClient]]" = (weakref.WeakKeyDictionary())
+
+
+def shared_client(pool: Pool = "passage") -> httpx.Client:
+    with _lock:
+        client = _clients.get(pool)
+        if client is None:
+            client = httpx.Client(
+                verify=_verify(), limits=_limits(pool), http2=_http2_available()
+            )
+            _clients[pool] = client
+        return client
+
+
+def shared_async_client(pool: Pool = "passage") -> httpx.AsyncClient:
+    """Return the async client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(pool)
+        if client is None:
+            client = httpx.AsyncClient(
+                verify=_verify(), limits=_limits(pool), http2=_http2_available()
+            )
+            clients[pool] = client
+        return client
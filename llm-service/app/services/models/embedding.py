@@ -39,6 +39,7 @@ from typing import Optional
 
 from fastapi import HTTPException
 from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.embeddings.openai import OpenAIEmbedding
 
 from . import _model_type, _noop
 from .providers import (
@@ -47,6 +48,7 @@ from .providers import (
     CAIIModelProvider,
 )
 from .providers.openai import OpenAiModelProvider
+from ..caii.CaiiEmbeddingModel import CaiiEmbeddingModel
 from ..caii.types import ModelResponse
 
 
@@ -64,6 +66,38 @@ class Embedding(_model_type.ModelType[BaseEmbedding]):
             return OpenAiModelProvider.get_embedding_model(model_name)
         return BedrockModelProvider.get_embedding_model(model_name)
 
+    @staticmethod
+    def get_batch_size_limit(model_name: str) -> int:
+        """Return the most texts to send to the model in one request."""
+        if AzureModelProvider.is_enabled():
+            return AzureModelProvider.get_embedding_batch_size_limit(model_name)
+        if CAIIModelProvider.is_enabled():
+            return CAIIModelProvider.get_embedding_batch_size_limit(model_name)
+        if OpenAiModelProvider.is_enabled():
+            return OpenAiModelProvider.get_embedding_batch_size_limit(model_name)
+        return BedrockModelProvider.get_embedding_batch_size_limit(model_name)
+
+    @staticmethod
+    def get_batch_token_limit(model_name: str) -> int:
+        """Return the most tokens to send to the model in one request."""
+        if AzureModelProvider.is_enabled():
+            return AzureModelProvider.get_embedding_batch_token_limit(model_name)
+        if CAIIModelProvider.is_enabled():
+            return CAIIModelProvider.get_embedding_batch_token_limit(model_name)
+        if OpenAiModelProvider.is_enabled():
+            return OpenAiModelProvider.get_embedding_batch_token_limit(model_name)
+        return BedrockModelProvider.get_embedding_batch_token_limit(model_name)
+
+    @staticmethod
+    def has_native_async(model: BaseEmbedding) -> bool:
+        """
+        Whether the model's async methods make non-blocking requests.
+
+        Other models (e.g. Bedrock) implement them by calling the blocking methods, which would stall the event loop.
+        """
+        # AzureOpenAIEmbedding is an OpenAIEmbedding
+        return isinstance(model, (CaiiEmbeddingModel, OpenAIEmbedding))
+
     @staticmethod
     def get_noop() -> BaseEmbedding:
         return _noop.DummyEmbeddingModel()
@@ -46,11 +46,31 @@ from ...caii.types import ModelResponse
 
 
 class ModelProvider(abc.ABC):
+    # Most texts, and most tokens as counted by the splitter's tokenizer, to send in one embedding request
+    embedding_batch_size_limit: int = 32
+    embedding_batch_token_limit: int = 8_000
+
     @classmethod
     def is_enabled(cls) -> bool:
         """Return whether this model provider is enabled, based on the presence of required env vars."""
         return all(map(os.environ.get, cls.get_env_var_names()))
 
+    @classmethod
+    def get_embedding_batch_size_limit(cls, model_name: str) -> int:
+        """Return the most texts to send to a model in one embedding request. EMBEDDING_MAX_BATCH_SIZE overrides it."""
+        return int(
+            os.environ.get("EMBEDDING_MAX_BATCH_SIZE", cls.embedding_batch_size_limit)
+        )
+
+    @classmethod
+    def get_embedding_batch_token_limit(cls, model_name: str) -> int:
+        """Return the most tokens to send to a model in one embedding request. EMBEDDING_MAX_BATCH_TOKENS overrides it."""
+        return int(
+            os.environ.get(
+                "EMBEDDING_MAX_BATCH_TOKENS", cls.embedding_batch_token_limit
+            )
+        )
+
     @staticmethod
     @abc.abstractmethod
     def get_env_var_names() -> set[str]:
@@ -46,6 +46,10 @@ from ....config import settings
 
 
 class AzureModelProvider(ModelProvider):
+    # The API accepts up to 2048 inputs and 300k tokens per request; leave room for tokenizer differences
+    embedding_batch_size_limit = 2048
+    embedding_batch_token_limit = 250_000
+
     @staticmethod
     def get_env_var_names() -> set[str]:
         return {"AZURE_OPENAI_API_KEY", "AZURE_OPENAI_ENDPOINT", "OPENAI_API_VERSION"}
@@ -37,6 +37,7 @@
 #
 import concurrent.futures
 import logging
+import os
 from typing import Optional, cast, Any, Literal
 from urllib.parse import unquote
 
@@ -66,6 +67,20 @@ BedrockModality = Literal["TEXT", "IMAGE", "EMBEDDING"]
 
 
 class BedrockModelProvider(ModelProvider):
+    @classmethod
+    def get_embedding_batch_size_limit(cls, model_name: str) -> int:
+        if "EMBEDDING_MAX_BATCH_SIZE" in os.environ:
+            return super().get_embedding_batch_size_limit(model_name)
+        # Cohere models take up to 96 texts per request; Titan models take a single text
+        return 96 if model_name.split(".")[0] == "cohere" else 1
+
+    @classmethod
+    def get_embedding_batch_token_limit(cls, model_name: str) -> int:
+        if "EMBEDDING_MAX_BATCH_TOKENS" in os.environ:
+            return super().get_embedding_batch_token_limit(model_name)
+        # Cohere models truncate each text to 512 tokens, so only the number of texts bounds a request
+        return 96 * 512 if model_name.split(".")[0] == "cohere" else 8_000
+
     @staticmethod
     def get_env_var_names() -> set[str]:
         return {"AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_DEFAULT_REGION"}
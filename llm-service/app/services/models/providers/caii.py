@@ -54,6 +54,8 @@ from ...llama_utils import completion_to_prompt, messages_to_prompt
 
 
 class CAIIModelProvider(ModelProvider):
+    embedding_batch_token_limit = 16_000
+
     @staticmethod
     def get_env_var_names() -> set[str]:
         return {"CAII_DOMAIN"}
@@ -50,6 +50,10 @@ from ....config import settings
 
 
 class OpenAiModelProvider(ModelProvider):
+    # The API accepts up to 2048 inputs and 300k tokens per request; leave room for tokenizer differences
+    embedding_batch_size_limit = 2048
+    embedding_batch_token_limit = 250_000
+
     @staticmethod
     def get_env_var_names() -> set[str]:
         return {"OPENAI_API_KEY"}
@@ -87,7 +91,6 @@ class OpenAiModelProvider(ModelProvider):
         else:
             return None
 
-
     @staticmethod
     def get_llm_model(name: str) -> OpenAI:
         return OpenAI(
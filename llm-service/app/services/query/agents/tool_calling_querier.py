@@ -91,12 +91,7 @@ def should_use_retrieval(
 ) -> tuple[bool, dict[int, str]]:
     if exclude_knowledge_base:
         return False, {}
-    data_source_summaries: dict[int, str] = {}
-    for data_source_id in data_source_ids:
-        data_source_summary_indexer = SummaryIndexer.get_summary_indexer(data_source_id)
-        if data_source_summary_indexer:
-            data_source_summary = data_source_summary_indexer.get_full_summary()
-            data_source_summaries[data_source_id] = data_source_summary
+    data_source_summaries = SummaryIndexer.get_data_source_summaries(data_source_ids)
     return len(data_source_ids) > 0, data_source_summaries
 
 
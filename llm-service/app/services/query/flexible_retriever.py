@@ -35,14 +35,17 @@
 #  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
 #  DATA.
 #
+import asyncio
 import logging
-from typing import cast
+from typing import Optional, cast
 
 from llama_index.core import QueryBundle, VectorStoreIndex
+from llama_index.core.base.base_query_engine import BaseQueryEngine
 from llama_index.core.base.base_retriever import BaseRetriever
 from llama_index.core.base.embeddings.base import BaseEmbedding
 from llama_index.core.indices.vector_store import VectorIndexRetriever
 from llama_index.core.llms import LLM
+from llama_index.core.query_engine import RetrieverQueryEngine
 from llama_index.core.node_parser import SentenceSplitter
 from llama_index.core.schema import NodeWithScore
 
@@ -54,29 +57,25 @@ logger = logging.getLogger(__name__)
 
 
 class FlexibleRetriever(BaseRetriever):
+    """Retrieves from the chunks of one or more data sources that share a vector store, with a single search."""
+
     def __init__(
         self,
         configuration: QueryConfiguration,
         index: VectorStoreIndex,
         embedding_model: BaseEmbedding,
-        data_source_id: int,
+        data_source_ids: list[int],
         llm: LLM,
     ) -> None:
         super().__init__()
         self.index = index
         self.configuration = configuration
         self.embedding_model = embedding_model
-        self.data_source_id = data_source_id
+        self.data_source_ids = data_source_ids
         self.llm = llm
 
     def _retrieve(self, query_bundle: QueryBundle) -> list[NodeWithScore]:
-        summarization_model = get_metadata(self.data_source_id).summarization_model
-
-        base_retriever = VectorIndexRetriever(
-            index=self.index,
-            similarity_top_k=self.configuration.top_k,
-            embed_model=self.embedding_model,  # is this needed, really, if it's in the index?
-        )
+        base_retriever = self._vector_retriever()
 
         result_nodes: list[NodeWithScore] = base_retriever.retrieve(query_bundle)
         logger.debug(f"result_nodes: {len(result_nodes)}")
@@ -86,16 +85,19 @@ class FlexibleRetriever(BaseRetriever):
                 node.node.node_id, node.node.metadata["document_id"], node.score
             )
 
-        if summarization_model is not None and self.configuration.use_summary_filter:
+        if self.configuration.use_summary_filter:
             # add a filter to the retriever with the resulting document ids.
-            doc_ids = self._filter_doc_ids_by_summary(query_bundle.query_str)
+            doc_ids: list[str] = []
+            for data_source_id in self.data_source_ids:
+                if get_metadata(data_source_id).summarization_model is not None:
+                    doc_ids.extend(
+                        self._filter_doc_ids_by_summary(
+                            data_source_id, query_bundle.query_str
+                        )
+                        or []
+                    )
             if doc_ids:
-                simple_retriever = VectorIndexRetriever(
-                    index=self.index,
-                    similarity_top_k=self.configuration.top_k,
-                    embed_model=self.embedding_model,  # is this needed, really, if it's in the index?
-                    doc_ids=doc_ids,
-                )
+                simple_retriever = self._vector_retriever(doc_ids)
                 result_nodes.extend(simple_retriever.retrieve(query_bundle))
         logger.debug(f"result_nodes(2): {len(result_nodes)}")
         for node in sorted(result_nodes, key=lambda n: n.node.node_id):
@@ -104,24 +106,92 @@ class FlexibleRetriever(BaseRetriever):
             )
         return result_nodes
 
-    def _filter_doc_ids_by_summary(self, query_str: str) -> list[str] | None:
-        try:
-            # first query the summary index to get documents to filter by (assuming summarization is enabled)
-            summary_engine = SummaryIndexer(
-                data_source_id=self.data_source_id,
-                splitter=SentenceSplitter(chunk_size=2048),
-                embedding_model=self.embedding_model,
-                llm=self.llm,
-            ).as_query_engine()
-            summaries: list[NodeWithScore] = summary_engine.retrieve(
-                QueryBundle(query_str)
+    async def _aretrieve(self, query_bundle: QueryBundle) -> list[NodeWithScore]:
+        """
+        Retrieve without blocking the event loop, so that the query embeddings for several data sources (and the
+        summary filter) can be computed concurrently by embedding models with a native async implementation.
+        """
+        result_nodes: list[NodeWithScore] = await self._vector_retriever().aretrieve(
+            query_bundle
+        )
+        logger.debug(f"result_nodes: {len(result_nodes)}")
+
+        if self.configuration.use_summary_filter:
+            doc_ids_by_data_source = await asyncio.gather(
+                *(
+                    self._afilter_doc_ids_by_summary(
+                        data_source_id, query_bundle.query_str
+                    )
+                    for data_source_id in self.data_source_ids
+                )
             )
+            doc_ids = [
+                doc_id for doc_ids in doc_ids_by_data_source for doc_id in doc_ids or []
+            ]
+            if doc_ids:
+                result_nodes.extend(
+                    await self._vector_retriever(doc_ids).aretrieve(query_bundle)
+                )
+        logger.debug(f"result_nodes(2): {len(result_nodes)}")
+        return result_nodes
 
-            def document_ids(node: NodeWithScore) -> str:
-                return cast(str, node.metadata["document_id"])
+    def _vector_retriever(
+        self, doc_ids: Optional[list[str]] = None
+    ) -> VectorIndexRetriever:
+        return VectorIndexRetriever(
+            index=self.index,
+            similarity_top_k=self.configuration.top_k,
+            embed_model=self.embedding_model,  # is this needed, really, if it's in the index?
+            doc_ids=doc_ids,
+        )
 
-            doc_ids: list[str] = list(map(document_ids, summaries))
-            return doc_ids
+    def _filter_doc_ids_by_summary(
+        self, data_source_id: int, query_str: str
+    ) -> list[str] | None:
+        try:
+            # first query the summary index to get documents to filter by (assuming summarization is enabled)
+            summaries: list[NodeWithScore] = self._summary_query_engine(
+                data_source_id
+            ).retrieve(QueryBundle(query_str))
+            return self._document_ids(summaries)
         except Exception as e:
             logger.debug(f"Failed to retrieve document ids from summary index: {e}")
             return None
+
+    async def _afilter_doc_ids_by_summary(
+        self, data_source_id: int, query_str: str
+    ) -> list[str] | None:
+        metadata = await asyncio.to_thread(get_metadata, data_source_id)
+        if metadata.summarization_model is None:
+            return None
+        try:
+            # Loading the summary index reads it from disk unless it is cached
+            summary_engine = await asyncio.to_thread(
+                self._summary_query_engine, data_source_id
+            )
+            summaries: list[NodeWithScore]
+            if isinstance(summary_engine, RetrieverQueryEngine):
+                summaries = await summary_engine.aretrieve(QueryBundle(query_str))
+            else:
+                summaries = await asyncio.to_thread(
+                    summary_engine.retrieve, QueryBundle(query_str)
+                )
+            return self._document_ids(summaries)
+        except Exception as e:
+            logger.debug(f"Failed to retrieve document ids from summary index: {e}")
+            return None
+
+    def _summary_query_engine(self, data_source_id: int) -> BaseQueryEngine:
+        return SummaryIndexer(
+            data_source_id=data_source_id,
+            splitter=SentenceSplitter(chunk_size=2048),
+            embedding_model=self.embedding_model,
+            llm=self.llm,
+        ).as_query_engine()
+
+    @staticmethod
+    def _document_ids(summaries: list[NodeWithScore]) -> list[str]:
+        def document_ids(node: NodeWithScore) -> str:
+            return cast(str, node.metadata["document_id"])
+
+        return list(map(document_ids, summaries))
@@ -35,6 +35,7 @@
 #  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
 #  DATA.
 #
+import asyncio
 from typing import List
 
 from llama_index.core import QueryBundle
@@ -55,4 +56,9 @@ class MultiSourceRetriever(BaseRetriever):
             results.extend(retriever.retrieve(query_bundle))
         return results
 
-
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        # Query every data source at once; results keep the order of the retrievers
+        results = await asyncio.gather(
+            *(retriever.aretrieve(query_bundle) for retriever in self.retrievers)
+        )
+        return [node for nodes in results for node in nodes]
@@ -73,6 +73,7 @@ from llama_index.core.indices import VectorStoreIndex
 from app.services import models
 from app.services.query.query_configuration import QueryConfiguration
 from .chat_engine import build_flexible_chat_engine, FlexibleContextChatEngine
+from ...ai.vector_stores.vector_store import VectorStore
 from ...ai.vector_stores.vector_store_factory import VectorStoreFactory
 
 logger = logging.getLogger(__name__)
@@ -169,9 +170,10 @@ def get_nodes_from_output(
     source_nodes: list[NodeWithScore] = []
     if len(source_node_ids_w_score) > 0:
         try:
-            for ds_id in extracted_data_source_ids:
+            for _, qdrant_store in VectorStoreFactory.for_chunks_of(
+                extracted_data_source_ids
+            ):
                 node_ids = list(source_node_ids_w_score.keys())
-                qdrant_store = VectorStoreFactory.for_chunks(ds_id)
                 vector_store = qdrant_store.llama_vector_store()
                 extracted_source_nodes = vector_store.get_nodes(node_ids=node_ids)
 
@@ -196,9 +198,8 @@ def get_nodes_from_output(
 
 
 def build_datasource_query_components(
-    data_source_id: int,
+    qdrant_store: VectorStore,
 ) -> tuple[BaseEmbedding, VectorStoreIndex]:
-    qdrant_store = VectorStoreFactory.for_chunks(data_source_id)
     vector_store = qdrant_store.llama_vector_store()
     embedding_model = qdrant_store.get_embedding_model()
     index = VectorStoreIndex.from_vector_store(
@@ -259,15 +260,17 @@ def build_retriever(
     llm: LLM,
 ) -> Optional[BaseRetriever]:
     retrievers: list[FlexibleRetriever] = []
-    for data_source_id in data_source_ids:
-        if data_source_id is None:
-            continue
-
-        embedding_model, vector_store = build_datasource_query_components(
+    # Data sources whose chunks share a collection are searched together, with a single query
+    for store_data_source_ids, qdrant_store in VectorStoreFactory.for_chunks_of(
+        [
             data_source_id
-        )
+            for data_source_id in data_source_ids
+            if data_source_id is not None
+        ]
+    ):
+        embedding_model, vector_store = build_datasource_query_components(qdrant_store)
         retriever = FlexibleRetriever(
-            configuration, vector_store, embedding_model, data_source_id, llm
+            configuration, vector_store, embedding_model, store_data_source_ids, llm
         )
         retrievers.append(retriever)
     return MultiSourceRetriever(retrievers)
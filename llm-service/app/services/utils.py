@@ -37,7 +37,7 @@
 # ##############################################################################
 
 import re
-from typing import Generator, List, Sequence, Tuple, TypeVar, Union, Any
+from typing import Generator, Iterable, List, Sequence, Tuple, TypeVar, Union, Any
 
 import requests
 
@@ -86,7 +86,7 @@ T = TypeVar("T")
 
 
 def batch_sequence(
-    sequence: Union[Sequence[T], Generator[T, None, None]], batch_size: int
+    sequence: Iterable[T], batch_size: int
 ) -> Generator[List[T], None, None]:
     batch = []
     for val in sequence:
@@ -0,0 +1,226 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2025
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+import asyncio
+from typing import List
+
+import botocore.exceptions
+import httpx
+import pytest
+
+from app.ai.indexing import adaptive_limiter
+from app.ai.indexing.adaptive_limiter import (
+    AdaptiveLimiter,
+    classify_error,
+    limiter_for,
+)
+from app.services.models._noop import DummyEmbeddingModel
+
+
+def http_error(status: int, retry_after: str | None = None) -> httpx.HTTPStatusError:
+    headers = {"Retry-After": retry_after} if retry_after else {}
+    request = httpx.Request("POST", "http://embeddings")
+    response = httpx.Response(status, headers=headers, request=request)
+    return httpx.HTTPStatusError("error", request=request, response=response)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(adaptive_limiter, "BACKOFF_BASE_SECONDS", 0.0)
+
+
+def test_classify_error() -> None:
+    assert classify_error(http_error(429, "2")) == ("throttled", 2.0)
+    assert classify_error(http_error(503)) == ("transient", None)
+    assert classify_error(http_error(400)) == (None, None)
+    assert classify_error(httpx.ReadTimeout("timeout")) == ("transient", None)
+    throttled = botocore.exceptions.ClientError(
+        {"Error": {"Code": "ThrottlingException"}}, "InvokeModel"
+    )
+    assert classify_error(throttled) == ("throttled", None)
+
+
+def test_splits_into_batches_and_grows_concurrency() -> None:
+    limiter = AdaptiveLimiter("model", max_concurrency=4, max_batch_size=3)
+    requests: List[List[str]] = []
+
+    def embed(texts: List[str]) -> List[int]:
+        requests.append(texts)
+        return [len(text) for text in texts]
+
+    texts = ["a" * i for i in range(10)]
+    assert limiter.call(embed, texts) == list(range(10))
+    assert [len(request) for request in requests] == [3, 3, 3, 1]
+    assert limiter.limits().concurrency == 4
+
+
+def test_throttling_is_retried_and_cuts_concurrency() -> None:
+    limiter = AdaptiveLimiter("model", max_concurrency=8, max_batch_size=10)
+    limiter.call(lambda texts: texts, ["warm-up"] * 10)
+    limiter.call(lambda texts: texts, ["warm-up"] * 10)
+    before = limiter.limits().concurrency
+    failures = [http_error(429, "0.01")]
+
+    def embed(texts: List[str]) -> List[str]:
+        if failures:
+            raise failures.pop()
+        return texts
+
+    assert limiter.call(embed, ["a", "b"]) == ["a", "b"]
+    limits = limiter.limits()
+    assert limits.throttled == 1
+    assert limits.retries == 1
+    assert limits.concurrency < before
+    assert limits.in_flight == 0
+
+
+def test_small_batches_are_not_slow(monkeypatch: pytest.MonkeyPatch) -> None:
+    limiter = AdaptiveLimiter("model", max_concurrency=8, max_batch_size=100)
+    clock = 0.0
+    monkeypatch.setattr(
+        "app.ai.indexing.adaptive_limiter.time.monotonic", lambda: clock
+    )
+
+    def embed(texts: List[str]) -> List[str]:
+        nonlocal clock
+        # A fixed overhead per request, and a little more per text
+        clock += 0.2 + 0.001 * len(texts)
+        return texts
+
+    limiter.call(embed, ["text"] * 100)
+    for _ in range(5):
+        limiter.call(embed, ["text"])
+    assert limiter.limits().concurrency == 8
+
+    def slow_embed(texts: List[str]) -> List[str]:
+        nonlocal clock
+        clock += 1.0
+        return texts
+
+    limiter.call(slow_embed, ["text"])
+    assert limiter.limits().concurrency < 8
+
+
+def test_non_retryable_errors_are_raised() -> None:
+    limiter = AdaptiveLimiter("model", max_concurrency=2, max_batch_size=10)
+    attempts = 0
+
+    def embed(texts: List[str]) -> List[str]:
+        nonlocal attempts
+        attempts += 1
+        raise http_error(400)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        limiter.call(embed, ["a"])
+    assert attempts == 1
+    assert limiter.limits().in_flight == 0
+
+
+def test_batches_are_limited_by_token_budget() -> None:
+    limiter = AdaptiveLimiter(
+        "model", max_concurrency=2, max_batch_size=10, max_batch_tokens=100
+    )
+    requests: List[List[str]] = []
+
+    def embed(texts: List[str]) -> List[str]:
+        requests.append(texts)
+        return texts
+
+    texts = ["small"] * 6 + ["huge", "small"]
+    token_counts = [30] * 6 + [150, 30]
+    assert limiter.call(embed, texts, token_counts) == texts
+    assert [len(request) for request in requests] == [3, 3, 1, 1]
+
+
+def test_cached_limiters_follow_the_latest_limits() -> None:
+    model = DummyEmbeddingModel(model_name="limits")
+    limiter = limiter_for(model, max_batch_size=10, max_batch_tokens=100)
+
+    assert limiter_for(model, max_batch_size=96, max_batch_tokens=5000) is limiter
+    limits = limiter.limits()
+    assert (limits.batch_size, limits.max_batch_tokens) == (96, 5000)
+
+    limiter_for(model, max_batch_size=1, max_batch_tokens=None)
+    limits = limiter.limits()
+    assert (limits.batch_size, limits.max_batch_tokens) == (1, None)
+
+
+def test_async_calls_share_the_limits() -> None:
+    limiter = AdaptiveLimiter("model", max_concurrency=2, max_batch_size=2)
+    failures = [http_error(503)]
+    peak = 0
+
+    async def embed(texts: List[str]) -> List[str]:
+        nonlocal peak
+        peak = max(peak, limiter.limits().in_flight)
+        await asyncio.sleep(0.01)
+        if failures:
+            raise failures.pop()
+        return texts
+
+    async def embed_all() -> List[List[str]]:
+        return await asyncio.gather(
+            *(limiter.acall(embed, [f"{i}a", f"{i}b", f"{i}c"]) for i in range(4))
+        )
+
+    results = asyncio.run(embed_all())
+
+    assert results == [[f"{i}a", f"{i}b", f"{i}c"] for i in range(4)]
+    assert peak <= 2
+    limits = limiter.limits()
+    assert limits.retries == 1
+    assert limits.in_flight == 0
+
+
+def test_cancelled_async_calls_give_their_slot_back() -> None:
+    limiter = AdaptiveLimiter("model", max_concurrency=1, max_batch_size=10)
+
+    async def embed(texts: List[str]) -> List[str]:
+        await asyncio.sleep(10)
+        return texts
+
+    async def cancel() -> None:
+        task = asyncio.create_task(limiter.acall(embed, ["a"]))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel())
+
+    limits = limiter.limits()
+    assert (limits.in_flight, limits.retries) == (0, 0)
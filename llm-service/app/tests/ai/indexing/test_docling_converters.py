@@ -0,0 +1,78 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2025
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+from typing import List
+
+import pytest
+
+from app.ai.indexing.readers import docling_converters
+from app.ai.indexing.readers.docling_converters import ConverterPool
+
+
+@pytest.fixture
+def created(monkeypatch: pytest.MonkeyPatch) -> List[object]:
+    """Stand in for loading the Docling models, and record each converter created."""
+    converters: List[object] = []
+
+    def new_converter() -> object:
+        converter = object()
+        converters.append(converter)
+        return converter
+
+    monkeypatch.setattr(docling_converters, "_new_converter", new_converter)
+    return converters
+
+
+def test_converters_are_reused(created: List[object]) -> None:
+    pool = ConverterPool(size=2)
+
+    with pool.borrow() as first:
+        pass
+    with pool.borrow() as second:
+        pass
+
+    assert first is second
+    assert len(created) == 1
+
+
+def test_concurrent_borrowers_get_their_own_converter(created: List[object]) -> None:
+    pool = ConverterPool(size=2)
+
+    with pool.borrow() as first, pool.borrow() as second:
+        assert first is not second
+
+    assert len(created) == 2
@@ -0,0 +1,118 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2025
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+
+import os
+import uuid
+from pathlib import Path
+
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.node_parser import SentenceSplitter
+
+from app.ai.indexing.embedding_cache import EmbeddingCache, get_embedding_cache
+from app.ai.indexing.embedding_indexer import EmbeddingIndexer
+from app.ai.vector_stores.qdrant import QdrantVectorStore
+
+
+class CountingEmbeddingModel(BaseEmbedding):
+    texts_embedded: int = 0
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        return [0.1] * 1024
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        return [0.1] * 1024
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        self.texts_embedded += 1
+        return [float(len(text))] * 1024
+
+
+def test_cache_round_trip(tmp_path: Path) -> None:
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), max_size_bytes=1024 * 1024)
+    cache.put_many("model", ["a", "b"], [[0.25, 0.5], [1.0, 2.0]])
+
+    assert cache.get_many("model", ["b", "c", "a"]) == [[1.0, 2.0], None, [0.25, 0.5]]
+    assert cache.get_many("other-model", ["a"]) == [None]
+
+    stats = cache.stats()
+    assert stats.hits == 2
+    assert stats.misses == 2
+    assert stats.entries == 2
+
+
+def test_cache_evicts_least_recently_used(tmp_path: Path) -> None:
+    vector = [0.5] * 128  # 1 KiB per entry
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), max_size_bytes=3 * 1024)
+    cache.put_many("model", ["first", "second", "third"], [vector] * 3)
+    # touch "first" so "second" becomes the least recently used entry
+    cache.get_many("model", ["first"])
+    cache.put_many("model", ["fourth"], [vector])
+
+    assert cache.stats().size_bytes <= 3 * 1024
+    assert cache.get_many("model", ["second"]) == [None]
+    assert cache.get_many("model", ["first", "fourth"]) == [vector, vector]
+
+
+def test_reindexing_unchanged_file_reuses_embeddings(tmp_path: Path) -> None:
+    file_path = tmp_path / "document.txt"
+    with open(file_path, "w") as f:
+        f.write(" ".join(f"Sentence number {i}." for i in range(500)))
+
+    embedding_model = CountingEmbeddingModel()
+    vector_store = QdrantVectorStore.for_chunks(1)
+    indexer = EmbeddingIndexer(
+        1,
+        splitter=SentenceSplitter(chunk_size=64, chunk_overlap=0),
+        embedding_model=embedding_model,
+        chunks_vector_store=vector_store,
+        llm=None,
+    )
+
+    document_id = str(uuid.uuid4())
+    indexer.index_file(file_path, document_id)
+    first_pass = embedding_model.texts_embedded
+    assert first_pass > 0
+
+    vector_store.delete_document(document_id)
+    indexer.index_file(file_path, document_id)
+    assert embedding_model.texts_embedded == first_pass
+
+    cache = get_embedding_cache()
+    assert cache is not None
+    assert os.path.dirname(cache.path) == os.environ["RAG_DATABASES_DIR"]
+    assert cache.stats().hits == first_pass
@@ -0,0 +1,272 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2025
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, List, Optional
+
+import lipsum
+import pytest
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import TextNode
+
+from app.ai.indexing.embedding_indexer import EmbeddingIndexer
+from app.ai.indexing.readers.base_reader import ReaderConfig
+from app.ai.vector_stores.qdrant import QdrantVectorStore
+from app.services import models
+from app.services.models._noop import DummyEmbeddingModel
+
+
+def _write_text_file(tmp_path: Path) -> Path:
+    file_path = tmp_path / "document.txt"
+    with open(file_path, "w") as f:
+        f.write(lipsum.generate_paragraphs(40))
+    return file_path
+
+
+def _indexer(data_source_id: int, vector_store: QdrantVectorStore) -> EmbeddingIndexer:
+    return EmbeddingIndexer(
+        data_source_id,
+        splitter=SentenceSplitter(chunk_size=64, chunk_overlap=0),
+        embedding_model=models.Embedding.get("dummy_model"),
+        chunks_vector_store=vector_store,
+        llm=None,
+    )
+
+
+def test_pipeline_indexes_every_chunk(tmp_path: Path) -> None:
+    data_source_id = 1
+    vector_store = QdrantVectorStore.for_chunks(data_source_id)
+    indexer = _indexer(data_source_id, vector_store)
+
+    indexer.index_file(_write_text_file(tmp_path), str(uuid.uuid4()))
+
+    stats = indexer.pipeline_stats
+    assert stats is not None
+    read = stats.stage("read").items
+    assert read > 100
+    assert stats.stage("embed").items == read
+    assert stats.stage("upsert").items == read
+    assert vector_store.size() == read
+
+
+def test_threads_sharing_an_indexer_get_their_own_stats(tmp_path: Path) -> None:
+    data_source_id = 1
+    vector_store = QdrantVectorStore.for_chunks(data_source_id)
+    indexer = _indexer(data_source_id, vector_store)
+    sizes = {"short": 5, "long": 40}
+
+    def index(name: str) -> int:
+        file_path = tmp_path / f"{name}.txt"
+        file_path.write_text(lipsum.generate_paragraphs(sizes[name]))
+        indexer.index_file(file_path, name)
+        stats = indexer.pipeline_stats
+        assert stats is not None
+        return stats.stage("read").items
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        read = dict(zip(sizes, executor.map(index, sizes)))
+
+    assert read["short"] < read["long"]
+    assert read["short"] + read["long"] == vector_store.size()
+
+
+def test_pipeline_failure_removes_partial_document(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    data_source_id = 1
+    vector_store = QdrantVectorStore.for_chunks(data_source_id)
+    indexer = _indexer(data_source_id, vector_store)
+
+    original = indexer._compute_embeddings
+    calls = 0
+
+    def flaky_embeddings(*args: Any) -> Any:
+        nonlocal calls
+        calls += 1
+        if calls > 1:
+            raise RuntimeError("embedding provider unavailable")
+        return original(*args)
+
+    monkeypatch.setattr(indexer, "_compute_embeddings", flaky_embeddings)
+
+    with pytest.raises(RuntimeError, match="embedding provider unavailable"):
+        indexer.index_file(_write_text_file(tmp_path), str(uuid.uuid4()))
+
+    assert not vector_store.size()
+
+
+@pytest.mark.parametrize("use_parse_pool", [None, True])
+def test_streaming_readers_are_not_parsed_in_pool(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, use_parse_pool: Optional[bool]
+) -> None:
+    data_source_id = 1
+    vector_store = QdrantVectorStore.for_chunks(data_source_id)
+    indexer = EmbeddingIndexer(
+        data_source_id,
+        splitter=SentenceSplitter(chunk_size=64, chunk_overlap=0),
+        embedding_model=models.Embedding.get("dummy_model"),
+        chunks_vector_store=vector_store,
+        llm=None,
+        reader_config=ReaderConfig(block_secrets=True),
+        use_parse_pool=use_parse_pool,
+    )
+
+    def parse_in_pool(*args: Any) -> Any:
+        raise AssertionError("streaming readers should not be parsed in the pool")
+
+    monkeypatch.setattr(indexer, "_parse_in_pool", parse_in_pool)
+    file_path = tmp_path / "people.csv"
+    rows = [f"person {i},{20 + i}" for i in range(200)]
+    file_path.write_text("name,age\n" + "\n".join(rows) + "\n")
+
+    indexer.index_file(file_path, str(uuid.uuid4()))
+
+    assert vector_store.size()
+
+
+def test_short_texts_are_packed_into_one_request(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    data_source_id = 1
+    embedding_model = DummyEmbeddingModel(model_name="packed")
+    indexer = EmbeddingIndexer(
+        data_source_id,
+        splitter=SentenceSplitter(chunk_size=64, chunk_overlap=0),
+        embedding_model=embedding_model,
+        chunks_vector_store=QdrantVectorStore.for_chunks(data_source_id),
+        llm=None,
+        max_batch_size=96,
+        max_batch_tokens=1000,
+    )
+    requests: List[int] = []
+
+    def embed(self: DummyEmbeddingModel, texts: List[str]) -> List[List[float]]:
+        requests.append(len(texts))
+        return [[0.0] for _ in texts]
+
+    monkeypatch.setattr(DummyEmbeddingModel, "_get_text_embeddings", embed)
+    chunks = [TextNode(text=f"row {i}") for i in range(50)]
+
+    indexer._compute_embeddings(chunks)
+
+    assert embedding_model.embed_batch_size < 50
+    assert requests == [50]
+
+
+def test_chunks_are_batched_by_the_token_budget() -> None:
+    data_source_id = 1
+    indexer = EmbeddingIndexer(
+        data_source_id,
+        splitter=SentenceSplitter(chunk_size=64, chunk_overlap=0),
+        embedding_model=DummyEmbeddingModel(),
+        chunks_vector_store=QdrantVectorStore.for_chunks(data_source_id),
+        llm=None,
+        max_batch_size=500,
+        max_batch_tokens=10_000,
+    )
+    chunks = [TextNode(text=f"row {i}") for i in range(250)]
+
+    assert [len(batch) for batch in indexer._embedding_batches(chunks)] == [250]
+
+    # the provider's own limit still applies
+    indexer.max_batch_size = 96
+    batches = list(indexer._embedding_batches(chunks))
+    assert [len(batch) for batch in batches] == [96, 96, 58]
+
+    indexer.max_batch_tokens = 100
+    for batch in indexer._embedding_batches(chunks):
+        assert sum(indexer._token_counts([chunk.text for chunk in batch])) <= 100
+
+
+def test_reindex_only_writes_changed_chunks(tmp_path: Path) -> None:
+    data_source_id = 1
+    document_id = str(uuid.uuid4())
+    vector_store = QdrantVectorStore.for_chunks(data_source_id)
+    indexer = _indexer(data_source_id, vector_store)
+    paragraphs = [lipsum.generate_paragraphs(1) for _ in range(20)]
+    file_path = tmp_path / "document.txt"
+
+    file_path.write_text("\n\n".join(paragraphs))
+    indexer.reindex_file(file_path, document_id)
+    original_chunks = vector_store.get_chunk_hashes(document_id)
+    assert len(original_chunks) == vector_store.size()
+    assert all(original_chunks.values())
+
+    # re-indexing an unchanged file is a no-op
+    indexer.reindex_file(file_path, document_id)
+    assert indexer.pipeline_stats is not None
+    assert indexer.pipeline_stats.stage("upsert").items == 0
+    assert vector_store.get_chunk_hashes(document_id) == original_chunks
+
+    paragraphs[-1] = "This paragraph was rewritten since the last upload."
+    file_path.write_text("\n\n".join(paragraphs))
+    indexer.reindex_file(file_path, document_id)
+
+    updated_chunks = vector_store.get_chunk_hashes(document_id)
+    upserted = indexer.pipeline_stats.stage("upsert").items
+    assert 0 < upserted < len(original_chunks) / 2
+    assert len(set(updated_chunks) - set(original_chunks)) == upserted
+    assert len(updated_chunks) == vector_store.size()
+
+
+def test_reindex_renumbers_chunks_that_moved(tmp_path: Path) -> None:
+    data_source_id = 1
+    document_id = str(uuid.uuid4())
+    vector_store = QdrantVectorStore.for_chunks(data_source_id)
+    indexer = _indexer(data_source_id, vector_store)
+    paragraphs = [lipsum.generate_paragraphs(1) for _ in range(10)]
+    file_path = tmp_path / "document.txt"
+    file_path.write_text("\n\n".join(paragraphs))
+    indexer.reindex_file(file_path, document_id)
+    original_chunks = vector_store.get_chunk_hashes(document_id)
+
+    file_path.write_text("\n\n".join([lipsum.generate_paragraphs(1), *paragraphs]))
+    indexer.reindex_file(file_path, document_id)
+
+    chunks = vector_store.get_chunk_metadata(document_id, ["chunk_number"])
+    assert indexer.pipeline_stats is not None
+    assert indexer.pipeline_stats.stage("upsert").items < len(original_chunks) / 2
+    assert sorted(chunk["chunk_number"] for chunk in chunks.values()) == list(
+        range(len(chunks))
+    )
+    # nodes are read back from llama-index's copy of them, which has to be renumbered too
+    for chunk_id, chunk in chunks.items():
+        node = vector_store.get_chunk_contents(chunk_id)
+        assert node.metadata["chunk_number"] == chunk["chunk_number"]
@@ -0,0 +1,261 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2025
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from app.ai.indexing import job_queue
+from app.ai.indexing.job_queue import (
+    IndexingJob,
+    JobCancelled,
+    JobFailed,
+    JobQueue,
+    ProgressCallback,
+)
+
+
+def new_queue(
+    tmp_path: Path, workers: int = 1, jobs_per_data_source: int = 1
+) -> JobQueue:
+    return JobQueue(
+        str(tmp_path / "jobs.sqlite"),
+        workers=workers,
+        jobs_per_data_source=jobs_per_data_source,
+        max_attempts=3,
+        retry_seconds=0,
+    )
+
+
+def wait_until_done(queue: JobQueue, data_source_ids: List[int]) -> None:
+    deadline = time.monotonic() + 10
+    while any(
+        report.queued or report.running
+        for report in (
+            queue.report(data_source_id) for data_source_id in data_source_ids
+        )
+    ):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_jobs_run_in_priority_order(tmp_path: Path) -> None:
+    queue = new_queue(tmp_path)
+    for document_id, priority in [("low", 0), ("high", 10), ("also low", 0)]:
+        queue.enqueue(1, document_id, {}, priority=priority)
+    ran: List[str] = []
+
+    def handler(job: IndexingJob, progress: ProgressCallback) -> None:
+        ran.append(job.document_id)
+        progress(10, 5)
+
+    queue.start(handler)
+    try:
+        wait_until_done(queue, [1])
+    finally:
+        queue.stop()
+
+    assert ran == ["high", "low", "also low"]
+    report = queue.report(1)
+    assert report.succeeded == 3
+    assert all(job.chunks_read == 10 and job.chunks_written == 5 for job in report.jobs)
+
+
+def test_concurrency_is_limited_per_data_source(tmp_path: Path) -> None:
+    queue = new_queue(tmp_path, workers=4, jobs_per_data_source=1)
+    for data_source_id in [1, 2]:
+        for i in range(3):
+            queue.enqueue(data_source_id, f"document-{i}", {})
+    lock = threading.Lock()
+    running = {1: 0, 2: 0}
+    most_running = {1: 0, 2: 0}
+    most_running_overall = 0
+
+    def handler(job: IndexingJob, progress: ProgressCallback) -> None:
+        nonlocal most_running_overall
+        with lock:
+            running[job.data_source_id] += 1
+            most_running[job.data_source_id] = max(
+                most_running[job.data_source_id], running[job.data_source_id]
+            )
+            most_running_overall = max(most_running_overall, sum(running.values()))
+        time.sleep(0.05)
+        with lock:
+            running[job.data_source_id] -= 1
+
+    queue.start(handler)
+    try:
+        wait_until_done(queue, [1, 2])
+    finally:
+        queue.stop()
+
+    assert most_running == {1: 1, 2: 1}
+    assert most_running_overall == 2
+
+
+def test_failed_jobs_are_retried(tmp_path: Path) -> None:
+    queue = new_queue(tmp_path)
+    flaky = queue.enqueue(1, "flaky", {})
+    broken = queue.enqueue(1, "broken", {})
+    unsupported = queue.enqueue(1, "unsupported", {})
+
+    def handler(job: IndexingJob, progress: ProgressCallback) -> None:
+        if job.document_id == "unsupported":
+            raise JobFailed("unsupported file")
+        if job.document_id == "broken" or job.attempts < 2:
+            raise RuntimeError(f"attempt {job.attempts} failed")
+
+    queue.start(handler)
+    try:
+        wait_until_done(queue, [1])
+    finally:
+        queue.stop()
+
+    flaky_job = queue.get(flaky.id)
+    assert flaky_job is not None
+    assert (flaky_job.status, flaky_job.attempts) == ("succeeded", 2)
+    broken_job = queue.get(broken.id)
+    assert broken_job is not None
+    assert (broken_job.status, broken_job.attempts) == ("failed", 3)
+    assert broken_job.error == "attempt 3 failed"
+    unsupported_job = queue.get(unsupported.id)
+    assert unsupported_job is not None
+    assert (unsupported_job.status, unsupported_job.attempts) == ("failed", 1)
+
+
+def test_interrupted_jobs_run_again_after_a_restart(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(job_queue, "LEASE_SECONDS", 0.1)
+    queue = new_queue(tmp_path)
+    job = queue.enqueue(1, "document", {"s3_document_key": "key"})
+    claimed = queue._claim()
+    assert claimed is not None and claimed.id == job.id
+
+    # a new process finds the job still marked as running, and nothing renewing its lease
+    restarted = new_queue(tmp_path)
+    ran: List[IndexingJob] = []
+    restarted.start(lambda job, progress: ran.append(job))
+    try:
+        wait_until_done(restarted, [1])
+    finally:
+        restarted.stop()
+
+    assert [(job.document_id, job.attempts, job.payload) for job in ran] == [
+        ("document", 2, {"s3_document_key": "key"})
+    ]
+
+
+def test_jobs_interrupted_too_often_fail(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(job_queue, "LEASE_SECONDS", 0.1)
+    queue = new_queue(tmp_path)
+    job = queue.enqueue(1, "crashes the process", {})
+    # each claim stands for a process that crashed while running the job
+    for _ in range(job.max_attempts):
+        assert queue._claim() is not None
+        time.sleep(0.2)
+
+    assert queue._claim() is None
+    failed = queue.get(job.id)
+    assert failed is not None
+    assert (failed.status, failed.attempts) == ("failed", 3)
+    assert failed.error == job_queue._INTERRUPTED
+
+
+def test_jobs_of_running_processes_are_not_taken_over(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(job_queue, "LEASE_SECONDS", 0.1)
+    monkeypatch.setattr(job_queue, "POLL_SECONDS", 0.01)
+    release = threading.Event()
+    ran: List[str] = []
+
+    def handler(job: IndexingJob, progress: ProgressCallback) -> None:
+        ran.append(job.document_id)
+        release.wait(timeout=10)
+
+    queue, other = new_queue(tmp_path), new_queue(tmp_path)
+    queue.enqueue(1, "document", {})
+    queue.start(handler)
+    other.start(handler)
+    try:
+        while not ran:
+            time.sleep(0.01)
+        # long enough for the lease to have run out several times over, had it not been renewed
+        time.sleep(0.5)
+        release.set()
+        wait_until_done(queue, [1])
+    finally:
+        queue.stop()
+        other.stop()
+
+    assert ran == ["document"]
+
+
+def test_deleted_jobs_stop_before_writing(tmp_path: Path) -> None:
+    queue = new_queue(tmp_path)
+    started, deleted = threading.Event(), threading.Event()
+    writes: List[str] = []
+
+    def handler(job: IndexingJob, progress: ProgressCallback) -> None:
+        queue.check_active(job)
+        writes.append(job.document_id)
+        started.set()
+        deleted.wait(timeout=10)
+        queue.check_active(job)
+        writes.append(job.document_id)
+
+    queue.enqueue(1, "deleted", {})
+    queue.enqueue(1, "kept", {})
+    queue.start(handler)
+    try:
+        started.wait(timeout=10)
+        queue.delete_documents(1, ["deleted"])
+        deleted.set()
+        wait_until_done(queue, [1])
+    finally:
+        queue.stop()
+
+    assert writes == ["deleted", "kept", "kept"]
+    assert [job.document_id for job in queue.report(1).jobs] == ["kept"]
+    with pytest.raises(JobCancelled):
+        queue.check_active(queue.report(1).jobs[0])
@@ -0,0 +1,164 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2025
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+import os
+import time
+from pathlib import Path
+from typing import List
+
+import lipsum
+import pytest
+from llama_index.core.node_parser import SentenceSplitter
+
+from app.ai.indexing import base
+from app.ai.indexing.base import BaseTextIndexer
+from app.ai.indexing.parse_cache import ParseCache, ParseKey
+from app.ai.indexing.readers.base_reader import ChunksResult
+from app.ai.indexing.readers.simple_file import SimpleFileReader
+from app.ai.indexing.worker_pools import ParseTask
+
+
+def key(content_hash: str, chunk_size: int = 256) -> ParseKey:
+    return ParseKey(
+        content_hash=content_hash,
+        reader_cls=SimpleFileReader,
+        chunk_size=chunk_size,
+        chunk_overlap=10,
+        reader_config=None,
+        document_id="document",
+        data_source_id=1,
+    )
+
+
+def parsed(tmp_path: Path) -> ChunksResult:
+    path = tmp_path / "file.txt"
+    path.write_text(lipsum.generate_words(500))
+    reader = SimpleFileReader(
+        splitter=SentenceSplitter(chunk_size=256, chunk_overlap=10),
+        document_id="document",
+        data_source_id=1,
+    )
+    return reader.load_chunks(path)
+
+
+def test_cache_round_trip(tmp_path: Path) -> None:
+    cache = ParseCache(
+        str(tmp_path / "cache"), max_size_bytes=1024 * 1024, ttl_seconds=60
+    )
+    result = parsed(tmp_path)
+    cache.put(key("a"), result)
+
+    cached = cache.get(key("a"))
+    assert cached is not None
+    assert [chunk.text for chunk in cached.chunks] == [
+        chunk.text for chunk in result.chunks
+    ]
+    assert cache.get(key("a", chunk_size=512)) is None
+    assert cache.get(key("b")) is None
+
+    stats = cache.stats()
+    assert stats.hits == 1
+    assert stats.misses == 2
+    assert stats.entries == 1
+
+
+def test_entries_expire(tmp_path: Path) -> None:
+    cache = ParseCache(
+        str(tmp_path / "cache"), max_size_bytes=1024 * 1024, ttl_seconds=60
+    )
+    cache.put(key("a"), ChunksResult())
+    path = cache._path(key("a"))
+    an_hour_ago = time.time() - 3600
+    os.utime(path, (an_hour_ago, an_hour_ago))
+
+    assert cache.get(key("a")) is None
+    assert not os.path.exists(path)
+
+
+def test_cache_evicts_oldest_entries(tmp_path: Path) -> None:
+    result = parsed(tmp_path)
+    cache = ParseCache(
+        str(tmp_path / "cache"), max_size_bytes=1024 * 1024, ttl_seconds=60
+    )
+    cache.put(key("size"), result)
+    entry_size = cache.stats().size_bytes
+    cache = ParseCache(
+        str(tmp_path / "cache2"), max_size_bytes=int(entry_size * 2.5), ttl_seconds=60
+    )
+
+    for i, content_hash in enumerate(["a", "b", "c"]):
+        cache.put(key(content_hash), result)
+        written = time.time() - 10 + i
+        os.utime(cache._path(key(content_hash)), (written, written))
+
+    assert cache.get(key("a")) is None
+    assert cache.get(key("b")) is not None
+    assert cache.get(key("c")) is not None
+
+
+class Indexer(BaseTextIndexer):
+    def index_file(self, file_path: Path, doc_id: str) -> None:
+        pass
+
+
+def test_indexers_share_parses_of_unchanged_files(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    parses: List[ParseTask] = []
+
+    def parse(task: ParseTask) -> ChunksResult:
+        parses.append(task)
+        return task.run()
+
+    monkeypatch.setattr(base, "parse", parse)
+    path = tmp_path / "file.txt"
+    path.write_text(lipsum.generate_words(500))
+    splitter = SentenceSplitter(chunk_size=256, chunk_overlap=10)
+
+    first = Indexer(1)._parse_in_pool(SimpleFileReader, path, "document", splitter)
+    second = Indexer(1)._parse_in_pool(SimpleFileReader, path, "document", splitter)
+    assert len(parses) == 1
+    assert [chunk.text for chunk in second.chunks] == [
+        chunk.text for chunk in first.chunks
+    ]
+    assert [chunk.node_id for chunk in second.chunks] == [
+        chunk.node_id for chunk in first.chunks
+    ]
+
+    path.write_text(lipsum.generate_words(500))
+    Indexer(1)._parse_in_pool(SimpleFileReader, path, "document", splitter)
+    assert len(parses) == 2
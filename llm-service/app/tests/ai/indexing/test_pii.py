@@ -0,0 +1,103 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2025
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+import re
+from typing import Any, Iterable, List
+
+import pytest
+from presidio_analyzer import RecognizerResult
+
+from app.ai.indexing.readers import pii
+
+NAME = "Jane Doe"
+
+
+class FakeBatchAnalyzer:
+    """Stands in for presidio's batch analyzer, which needs a spaCy model: finds NAME, even cut short."""
+
+    def __init__(self) -> None:
+        self.segments: List[str] = []
+
+    def analyze_iterator(
+        self, texts: Iterable[str], **kwargs: Any
+    ) -> List[List[RecognizerResult]]:
+        results = []
+        for text in texts:
+            self.segments.append(text)
+            results.append(
+                [
+                    RecognizerResult("PERSON", match.start(), match.end(), 0.85)
+                    for match in re.finditer(r"Jane(?: Doe| Do| D)?", text)
+                ]
+            )
+        return results
+
+
+@pytest.fixture(autouse=True)
+def small_segments(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(pii, "SEGMENT_CHARS", 100)
+    monkeypatch.setattr(pii, "SEGMENT_OVERLAP_CHARS", 20)
+
+
+def test_segments_cover_text_at_line_breaks() -> None:
+    text = "\n".join(["x" * 30] * 20)
+    segments = pii.split_segments(text)
+
+    assert segments[0][2] == 0
+    assert segments[-1][3] == len(text)
+    for (_, _, _, owned_end), (_, _, next_owned_start, _) in zip(
+        segments, segments[1:]
+    ):
+        assert owned_end == next_owned_start
+        assert text[owned_end - 1] == "\n"
+    for start, end, owned_start, owned_end in segments:
+        assert start == max(0, owned_start - 10)
+        assert end == min(len(text), owned_end + 10)
+
+
+def test_entities_straddling_cuts_are_found_once_and_whole() -> None:
+    # No line breaks or spaces near the cuts, so the names get cut in half
+    text = ("y" * 96 + NAME) * 5
+    analyzer = FakeBatchAnalyzer()
+
+    results = pii.analyze(text, analyzer)  # type: ignore[arg-type]
+
+    assert len(analyzer.segments) > 1
+    assert [text[result.start : result.end] for result in results] == [NAME] * 5
+    assert [result.start for result in results] == [
+        match.start() for match in re.finditer(NAME, text)
+    ]
@@ -1,8 +1,14 @@
 import random
+from pathlib import Path
+from typing import List
 
+import lipsum
+import pytest
 from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.response_synthesizers import BaseSynthesizer
 from llama_index.core.schema import TextNode
 
+from app.ai.indexing import summary_indexer
 from app.ai.indexing.summary_indexer import SummaryIndexer
 from app.services.models import LLM, Embedding
 
@@ -175,3 +181,59 @@ def test_fallback_behavior() -> None:
     finally:
         # Restore the original random.sample function
         random.sample = original_sample
+
+
+def test_data_source_summary_is_refreshed_incrementally(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that a document change only re-summarizes the group of documents it belongs to."""
+    monkeypatch.setattr(summary_indexer, "DOCUMENTS_PER_SUMMARY_GROUP", 2)
+    summarized_groups: List[int] = []
+    summarize = summary_indexer._summarize
+
+    def counting_summarize(
+        response_synthesizer: BaseSynthesizer, texts: List[str]
+    ) -> str:
+        # Readers of the global store don't wait for the LLM
+        assert not summary_indexer._global_lock._writing
+        summarized_groups.append(len(texts))
+        return summarize(response_synthesizer, texts)
+
+    monkeypatch.setattr(summary_indexer, "_summarize", counting_summarize)
+
+    indexer = SummaryIndexer(
+        data_source_id=4242,
+        splitter=SentenceSplitter(),
+        llm=LLM.get_noop(),
+        embedding_model=Embedding.get_noop(),
+    )
+
+    def index(document_id: str) -> None:
+        file_path = tmp_path / f"{document_id}.txt"
+        file_path.write_text(lipsum.generate_words(100))
+        indexer.index_file(file_path, document_id)
+
+    for document_id in ["first", "second", "third"]:
+        index(document_id)
+    # Serving the summaries doesn't wait for the pending refresh
+    assert str(4242) not in SummaryIndexer.get_all_data_source_summaries()
+    assert summarized_groups == []
+    # The data source's summary is refreshed once, for all three documents: two groups are summarized, and then the
+    # data source from the two group summaries
+    assert indexer.get_full_summary()
+    assert sorted(summarized_groups) == [1, 2, 2]
+    assert str(4242) in SummaryIndexer.get_all_data_source_summaries()
+
+    summarized_groups.clear()
+    indexer.delete_document("third")
+    assert indexer.get_full_summary()
+    # Only the data source, from the remaining group
+    assert summarized_groups == [1]
+
+    summarized_groups.clear()
+    index("fourth")
+    assert indexer.get_full_summary()
+    assert summarized_groups == [1, 2]
+
+    SummaryIndexer.delete_data_source_by_id(4242)
+    assert indexer.get_full_summary() is None
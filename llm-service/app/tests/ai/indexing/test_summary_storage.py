@@ -0,0 +1,260 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2025
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import List, cast
+
+import pytest
+from llama_index.core import StorageContext
+from llama_index.core.schema import TextNode
+from llama_index.core.storage.docstore import SimpleDocumentStore
+
+from app.ai.indexing.summary_storage import (
+    ReadWriteLock,
+    StorageContextCache,
+    SummarySnapshot,
+    WriteBehind,
+    estimated_size,
+    persist_atomically,
+)
+
+
+class CountingStorageContext:
+    def __init__(self, contents: str = "summaries") -> None:
+        self.contents = contents
+        self.persisted: List[str] = []
+
+    def persist(self, persist_dir: str) -> None:
+        self.persisted.append(persist_dir)
+        with open(os.path.join(persist_dir, "docstore.json"), "w") as f:
+            f.write(self.contents)
+
+
+def storage_context(context: CountingStorageContext) -> StorageContext:
+    return cast(StorageContext, context)
+
+
+def test_readers_share_the_lock() -> None:
+    lock = ReadWriteLock()
+    both_reading = threading.Barrier(2, timeout=5)
+
+    def read() -> None:
+        with lock.read():
+            both_reading.wait()
+
+    thread = threading.Thread(target=read)
+    thread.start()
+    read()
+    thread.join()
+
+
+def test_writer_excludes_readers() -> None:
+    lock = ReadWriteLock()
+    events: List[str] = []
+
+    def read() -> None:
+        with lock.read():
+            events.append("read")
+
+    with lock.write():
+        reader = threading.Thread(target=read)
+        reader.start()
+        time.sleep(0.1)
+        events.append("written")
+    reader.join()
+    assert events == ["written", "read"]
+
+
+def test_persist_atomically_replaces_files(tmp_path: Path) -> None:
+    tmp_path = tmp_path / "stores"
+    tmp_path.mkdir()
+    persist_dir = tmp_path / "store"
+    persist_atomically(storage_context(CountingStorageContext("old")), str(persist_dir))
+    persist_atomically(storage_context(CountingStorageContext("new")), str(persist_dir))
+
+    assert (persist_dir / "docstore.json").read_text() == "new"
+    # The temporary directory is cleaned up
+    assert os.listdir(tmp_path) == ["store"]
+
+
+def test_changes_are_coalesced(tmp_path: Path) -> None:
+    write_behind = WriteBehind(delay_seconds=0.2)
+    lock = ReadWriteLock()
+    persist_dir = str(tmp_path / "store")
+    first, second = CountingStorageContext("first"), CountingStorageContext("second")
+
+    write_behind.changed(persist_dir, storage_context(first), lock)
+    write_behind.changed(persist_dir, storage_context(second), lock)
+    assert write_behind.pending(persist_dir) is storage_context(second)
+    assert not os.path.exists(persist_dir)
+
+    deadline = time.monotonic() + 5
+    while write_behind.pending(persist_dir) is not None and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    assert write_behind.pending(persist_dir) is None
+    assert first.persisted == []
+    assert len(second.persisted) == 1
+    assert (tmp_path / "store" / "docstore.json").read_text() == "second"
+
+
+def test_flush_and_discard(tmp_path: Path) -> None:
+    tmp_path = tmp_path / "stores"
+    write_behind = WriteBehind(delay_seconds=60)
+    lock = ReadWriteLock()
+    kept, discarded = CountingStorageContext(), CountingStorageContext()
+    write_behind.changed(str(tmp_path / "kept"), storage_context(kept), lock)
+    write_behind.changed(str(tmp_path / "discarded"), storage_context(discarded), lock)
+
+    write_behind.discard(str(tmp_path / "discarded"))
+    write_behind.flush()
+
+    assert len(kept.persisted) == 1
+    assert discarded.persisted == []
+    assert os.listdir(tmp_path) == ["kept"]
+
+
+def test_callback_runs_once_the_store_is_persisted(tmp_path: Path) -> None:
+    write_behind = WriteBehind(delay_seconds=60)
+    context = CountingStorageContext()
+    # How many times the store had been persisted at each call
+    persisted: List[int] = []
+
+    def on_persisted() -> None:
+        persisted.append(len(context.persisted))
+
+    write_behind.changed(
+        str(tmp_path), storage_context(context), ReadWriteLock(), on_persisted
+    )
+    write_behind.changed(str(tmp_path), storage_context(context), ReadWriteLock())
+    assert persisted == []
+
+    write_behind.flush()
+    assert persisted == [1]
+
+
+def test_no_delay_writes_through(tmp_path: Path) -> None:
+    write_behind = WriteBehind(delay_seconds=0)
+    context = CountingStorageContext()
+    write_behind.changed(str(tmp_path), storage_context(context), ReadWriteLock())
+
+    assert len(context.persisted) == 1
+    assert write_behind.pending(str(tmp_path)) is None
+
+
+def loaded_store(text_size: int) -> StorageContext:
+    storage_context = StorageContext.from_defaults()
+    storage_context.docstore.add_documents([TextNode(text="x" * text_size)])
+    return storage_context
+
+
+def test_cache_evicts_least_recently_used() -> None:
+    first, second, third = loaded_store(1000), loaded_store(1000), loaded_store(1000)
+    cache = StorageContextCache(max_size_bytes=2 * estimated_size(first))
+    cache.put("first", first, cache.version("first"))
+    cache.put("second", second, cache.version("second"))
+    assert cache.get("first") is first
+
+    cache.put("third", third, cache.version("third"))
+
+    assert cache.get("first") is first
+    assert cache.get("second") is None
+    assert cache.get("third") is third
+    assert cache.size() == 2 * estimated_size(first)
+
+
+def test_size_is_estimated_without_loading_nodes(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    store = loaded_store(1000)
+    store.docstore.add_documents([TextNode(text="x" * 500)])
+
+    def docs(self: SimpleDocumentStore) -> None:
+        raise AssertionError("nodes should not be deserialized")
+
+    monkeypatch.setattr(SimpleDocumentStore, "docs", property(docs))
+
+    # An empty node counts only the per-node overhead
+    assert estimated_size(store) == 1500 + 2 * estimated_size(loaded_store(0))
+
+
+def test_cache_ignores_loads_that_raced_a_change() -> None:
+    cache = StorageContextCache(max_size_bytes=1024 * 1024)
+    stale, changed = loaded_store(10), loaded_store(20)
+    version = cache.version("store")
+
+    cache.changed("store", changed)
+    cache.put("store", stale, version)
+    assert cache.get("store") is changed
+
+    cache.invalidate("store")
+    assert cache.get("store") is None
+    cache.put("store", stale, version)
+    assert cache.get("store") is None
+
+
+def test_snapshot_is_loaded_once_and_replaced(tmp_path: Path) -> None:
+    path = tmp_path / "snapshot" / "summaries.json"
+    loads: List[int] = []
+
+    def load() -> dict[str, str]:
+        loads.append(1)
+        return {"1": "first"}
+
+    snapshot = SummarySnapshot(str(path))
+    summaries, etag = snapshot.get(load)
+    assert summaries == {"1": "first"}
+    assert snapshot.get(load) == (summaries, etag)
+    assert len(loads) == 1
+    assert json.loads(path.read_text()) == {"1": "first"}
+
+    snapshot.replace({"1": "first", "2": "second"})
+    summaries, new_etag = snapshot.get(load)
+    assert summaries == {"1": "first", "2": "second"}
+    assert new_etag != etag
+    # The file waits for the summary store to be written out
+    assert json.loads(path.read_text()) == {"1": "first"}
+
+    snapshot.write()
+    # Another process reads the snapshot from its file
+    assert SummarySnapshot(str(path)).get(load) == (summaries, new_etag)
+    assert len(loads) == 1
+    assert os.listdir(path.parent) == ["summaries.json"]
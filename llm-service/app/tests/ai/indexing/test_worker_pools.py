@@ -0,0 +1,220 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2025
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+import pickle
+import re
+from concurrent.futures import Future
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import lipsum
+import pytest
+from llama_index.core.node_parser import SentenceSplitter
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from app.ai.indexing import worker_pools
+from app.ai.indexing.readers.base_reader import ChunksResult
+from app.ai.indexing.readers.pdf import PDFReader
+from app.ai.indexing.readers.simple_file import SimpleFileReader
+from app.ai.indexing.worker_pools import ParsePool, ParseTask
+
+
+def write_file(tmp_path: Path, name: str) -> Path:
+    path = tmp_path / name
+    path.write_text(lipsum.generate_words(2000))
+    return path
+
+
+def test_chunks_result_pickles_losslessly(tmp_path: Path) -> None:
+    reader = SimpleFileReader(
+        splitter=SentenceSplitter(chunk_size=256, chunk_overlap=10),
+        document_id="document",
+        data_source_id=1,
+    )
+    result = reader.load_chunks(write_file(tmp_path, "file.txt"))
+    result.pii_found = True
+    result.chunks[0].excluded_embed_metadata_keys.append("chunk_hash")
+
+    copy: ChunksResult = pickle.loads(pickle.dumps(result))
+
+    assert copy.pii_found
+    assert copy.secret_types is None
+    assert [chunk.to_dict() for chunk in copy.chunks] == [
+        chunk.to_dict() for chunk in result.chunks
+    ]
+
+
+def test_parse_pool_is_replaced_after_tasks_per_worker(tmp_path: Path) -> None:
+    pool = ParsePool(workers=1, tasks_per_worker=2)
+    try:
+        executors = []
+        for i in range(3):
+            task = ParseTask(
+                reader_cls=SimpleFileReader,
+                file_path=write_file(tmp_path, f"file-{i}.txt"),
+                document_id=f"document-{i}",
+                data_source_id=1,
+                chunk_size=256,
+                chunk_overlap=10,
+            )
+            result = pool.submit(task).result()
+            assert result.chunks
+            assert all(
+                chunk.metadata["document_id"] == f"document-{i}"
+                for chunk in result.chunks
+            )
+            executors.append(pool._executor)
+
+        assert executors[0] is executors[1]
+        assert executors[1] is not executors[2]
+    finally:
+        pool.shutdown()
+
+
+def write_pdf(tmp_path: Path, pages: int) -> Path:
+    """Write a PDF where every word on page n is "pagen"."""
+    writer = PdfWriter()
+    font = writer._add_object(
+        DictionaryObject(
+            {
+                NameObject("/Type"): NameObject("/Font"),
+                NameObject("/Subtype"): NameObject("/Type1"),
+                NameObject("/BaseFont"): NameObject("/Helvetica"),
+            }
+        )
+    )
+    for n in range(1, pages + 1):
+        page = writer.add_blank_page(612, 792)
+        content = DecodedStreamObject()
+        content.set_data(f"BT /F1 12 Tf 72 720 Td ({f'page{n} ' * 100}) Tj ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(content)
+        page[NameObject("/Resources")] = DictionaryObject(
+            {NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})}
+        )
+    path = tmp_path / "document.pdf"
+    writer.write(path)
+    return path
+
+
+def test_page_shards(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("INDEXING_MIN_PAGES_PER_SHARD", "2")
+    task = ParseTask(
+        reader_cls=PDFReader,
+        file_path=write_pdf(tmp_path, pages=9),
+        document_id="document",
+        data_source_id=1,
+        chunk_size=64,
+        chunk_overlap=0,
+    )
+
+    assert worker_pools.page_shards(task, workers=3) == [(1, 3), (4, 6), (7, 9)]
+    assert worker_pools.page_shards(task, workers=8) == [
+        (1, 2),
+        (3, 4),
+        (5, 6),
+        (7, 8),
+        (9, 9),
+    ]
+    assert worker_pools.page_shards(task, workers=1) == [(1, 9)]
+
+    text_task = ParseTask(
+        reader_cls=SimpleFileReader,
+        file_path=write_file(tmp_path, "file.txt"),
+        document_id="document",
+        data_source_id=1,
+        chunk_size=64,
+        chunk_overlap=0,
+    )
+    assert worker_pools.page_shards(text_task, workers=3) == []
+
+
+def test_merge_results_blocks_secrets_from_any_range() -> None:
+    results = [
+        ChunksResult(pii_found=True),
+        ChunksResult(secret_types={"AWS Access Key"}),
+    ]
+
+    merged = worker_pools.merge_results(results)
+
+    assert merged.chunks == []
+    assert merged.secret_types == {"AWS Access Key"}
+    assert merged.pii_found
+
+
+class InlinePool:
+    """Runs parse tasks in the calling thread, recording which pages each one was given."""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.submitted: List[Optional[Tuple[int, int]]] = []
+
+    def submit(self, task: ParseTask) -> "Future[ChunksResult]":
+        self.submitted.append(task.pages)
+        future: Future[ChunksResult] = Future()
+        future.set_result(task.run())
+        return future
+
+
+def test_pdf_is_parsed_in_page_ranges(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("INDEXING_MIN_PAGES_PER_SHARD", "2")
+    pool = InlinePool(workers=3)
+    monkeypatch.setattr(worker_pools, "_get_parse_pool", lambda: pool)
+    task = ParseTask(
+        reader_cls=PDFReader,
+        file_path=write_pdf(tmp_path, pages=9),
+        document_id="document",
+        data_source_id=1,
+        chunk_size=64,
+        chunk_overlap=0,
+    )
+
+    result = worker_pools.parse(task)
+
+    assert pool.submitted == [(1, 3), (4, 6), (7, 9)]
+    assert [chunk.metadata["chunk_number"] for chunk in result.chunks] == list(
+        range(len(result.chunks))
+    )
+    page_numbers = [int(chunk.metadata["page_number"]) for chunk in result.chunks]
+    assert page_numbers == sorted(page_numbers)
+    assert set(page_numbers) == set(range(1, 10))
+    for chunk in result.chunks:
+        first_page = re.search(r"page(\d+)", chunk.text)
+        assert first_page is not None
+        assert chunk.metadata["page_number"] == first_page.group(1)
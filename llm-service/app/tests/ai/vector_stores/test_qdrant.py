@@ -0,0 +1,318 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2025
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+
+import pytest
+import qdrant_client
+from llama_index.core.schema import NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.core.vector_stores import VectorStoreQuery
+from qdrant_client.http import models as rest
+
+from app.ai.vector_stores import qdrant
+from app.ai.vector_stores.index_profiles import INDEX_PROFILES
+from app.ai.vector_stores.qdrant import QdrantVectorStore
+from app.ai.vector_stores.vector_store_factory import VectorStoreFactory
+from app.config import settings
+
+
+@pytest.fixture
+def created_clients(monkeypatch: pytest.MonkeyPatch) -> Iterator[List[Optional[str]]]:
+    created: List[Optional[str]] = []
+
+    def new_qdrant_client(auth_token: Optional[str]) -> qdrant_client.QdrantClient:
+        created.append(auth_token)
+        return qdrant_client.QdrantClient(":memory:")
+
+    monkeypatch.setattr(qdrant, "_new_qdrant_client", new_qdrant_client)
+    qdrant.close_clients()
+    yield created
+    qdrant.close_clients()
+
+
+def test_vector_stores_share_a_client(created_clients: List[Optional[str]]) -> None:
+    chunks = QdrantVectorStore("index_1", 1)
+    summaries = QdrantVectorStore("summary_index_2", 2)
+
+    assert chunks.client is summaries.client
+    assert len(created_clients) == 1
+
+
+def test_client_is_replaced_when_its_settings_change(
+    created_clients: List[Optional[str]], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    closed: List[qdrant_client.QdrantClient] = []
+
+    def client() -> qdrant_client.QdrantClient:
+        client = QdrantVectorStore("index_1", 1).client
+        monkeypatch.setattr(client, "close", lambda: closed.append(client))
+        return client
+
+    monkeypatch.setenv("CDSW_APIV2_KEY", "first")
+    first = client()
+    monkeypatch.setenv("CDSW_APIV2_KEY", "second")
+    second = client()
+    assert closed == [first]
+    monkeypatch.setenv("QDRANT_PREFER_GRPC", "true")
+    grpc = client()
+
+    assert len({id(first), id(second), id(grpc)}) == 3
+    assert created_clients == ["first", "second", "second"]
+    # Only the latest client is kept open
+    assert closed == [first, second]
+
+
+def spy(
+    monkeypatch: pytest.MonkeyPatch, client: qdrant_client.QdrantClient, method: str
+) -> List[Dict[str, Any]]:
+    calls: List[Dict[str, Any]] = []
+    original = getattr(client, method)
+
+    def record(*args: Any, **kwargs: Any) -> Any:
+        calls.append(kwargs)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(client, method, record)
+    return calls
+
+
+def test_new_collections_are_quantized(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("QDRANT_QUANTIZATION", "binary")
+    monkeypatch.setenv("QDRANT_ON_DISK_VECTORS", "true")
+    client = qdrant_client.QdrantClient(":memory:")
+    created = spy(monkeypatch, client, "create_collection")
+
+    vector_store = QdrantVectorStore("index_1", 1, client)
+    vector_store.llama_vector_store().add(
+        [TextNode(text="text", embedding=[0.1, 0.2, 0.3])]
+    )
+
+    assert isinstance(created[0]["quantization_config"], rest.BinaryQuantization)
+    assert created[0]["vectors_config"].on_disk
+
+
+def test_unknown_quantization_is_rejected(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("QDRANT_QUANTIZATION", "int4")
+    with pytest.raises(ValueError, match="QDRANT_QUANTIZATION"):
+        settings.validate()
+
+
+def test_quantized_collections_are_rescored(monkeypatch: pytest.MonkeyPatch) -> None:
+    client = qdrant_client.QdrantClient(":memory:")
+    vector_store = QdrantVectorStore("index_2", 2, client)
+    vector_store.llama_vector_store().add(
+        [TextNode(text="text", embedding=[0.1, 0.2, 0.3])]
+    )
+    searches = spy(monkeypatch, client, "search")
+
+    vector_store.set_quantization("product", on_disk=True)
+    result = vector_store.llama_vector_store().query(
+        VectorStoreQuery(query_embedding=[0.1, 0.2, 0.3], similarity_top_k=1)
+    )
+
+    assert result.nodes and result.nodes[0].get_content() == "text"
+    search_params = searches[0]["search_params"]
+    assert search_params.quantization.rescore
+    assert search_params.quantization.oversampling == 2.0
+
+    vector_store.delete()
+
+
+def test_oversampling(monkeypatch: pytest.MonkeyPatch) -> None:
+    assert qdrant._search_params(qdrant._CollectionSettings("none", None)) is None
+    binary = qdrant._search_params(qdrant._CollectionSettings("binary", None))
+    assert binary and binary.quantization and binary.quantization.oversampling == 3.0
+
+    monkeypatch.setenv("QDRANT_OVERSAMPLING", "1.5")
+    scalar = qdrant._search_params(qdrant._CollectionSettings("scalar", None))
+    assert scalar and scalar.quantization and scalar.quantization.oversampling == 1.5
+
+
+def test_index_profile(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("VECTOR_INDEX_PROFILE", "fast")
+    client = qdrant_client.QdrantClient(":memory:")
+    created = spy(monkeypatch, client, "create_collection")
+    vector_store = QdrantVectorStore("index_3", 3, client)
+    vector_store.llama_vector_store().add(
+        [TextNode(text="text", embedding=[0.1, 0.2, 0.3])]
+    )
+    assert created[0]["vectors_config"].hnsw_config.m == INDEX_PROFILES["fast"].m
+
+    searches = spy(monkeypatch, client, "search")
+    # Read how the collection was built back from Qdrant
+    qdrant._collection_settings.clear()
+    vector_store.llama_vector_store().query(
+        VectorStoreQuery(query_embedding=[0.1, 0.2, 0.3], similarity_top_k=1)
+    )
+    assert searches[0]["search_params"].hnsw_ef == INDEX_PROFILES["fast"].ef
+
+    vector_store.set_index_profile(INDEX_PROFILES["high-recall"])
+    vector_store.llama_vector_store().query(
+        VectorStoreQuery(query_embedding=[0.1, 0.2, 0.3], similarity_top_k=1)
+    )
+    assert searches[1]["search_params"].hnsw_ef == INDEX_PROFILES["high-recall"].ef
+
+    vector_store.delete()
+
+
+def test_collections_are_created_with_the_data_source_settings(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    client = qdrant_client.QdrantClient(":memory:")
+    created = spy(monkeypatch, client, "create_collection")
+    # e.g. set through the quantization and index profile endpoints, before the collection went away
+    monkeypatch.setitem(
+        qdrant._collection_settings,
+        "index_4",
+        qdrant._CollectionSettings("scalar", INDEX_PROFILES["high-recall"], True),
+    )
+
+    vector_store = QdrantVectorStore("index_4", 4, client)
+    vector_store.llama_vector_store().add(
+        [TextNode(text="text", embedding=[0.1, 0.2, 0.3])]
+    )
+
+    assert isinstance(created[0]["quantization_config"], rest.ScalarQuantization)
+    vectors_config = created[0]["vectors_config"]
+    assert vectors_config.on_disk
+    assert vectors_config.hnsw_config.m == INDEX_PROFILES["high-recall"].m
+
+    vector_store.delete()
+
+
+def test_delete_documents(monkeypatch: pytest.MonkeyPatch) -> None:
+    client = qdrant_client.QdrantClient(":memory:")
+    payload_indexes = spy(monkeypatch, client, "create_payload_index")
+    vector_store = QdrantVectorStore("index_4", 4, client)
+    vector_store.llama_vector_store().add(
+        [
+            TextNode(
+                text=f"text {document_id}",
+                embedding=[0.1, 0.2, 0.3],
+                relationships={
+                    NodeRelationship.SOURCE: RelatedNodeInfo(node_id=document_id)
+                },
+            )
+            for document_id in ["a", "a", "b", "c"]
+        ]
+    )
+    assert {index["field_name"] for index in payload_indexes} == {
+        "doc_id",
+        "document_id",
+        "data_source_id",
+        "file_name",
+    }
+
+    vector_store.delete_documents(["a", "b"])
+    assert vector_store.size() == 1
+    vector_store.delete_document("c")
+    assert vector_store.size() == 0
+
+    vector_store.delete()
+
+
+def test_data_sources_with_their_own_collection_are_remembered(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setenv("QDRANT_SHARED_COLLECTIONS", "true")
+    monkeypatch.setattr(qdrant, "_shared_collections", {})
+    client = qdrant_client.QdrantClient(":memory:")
+    legacy = QdrantVectorStore("index_13", 13, client)
+    legacy.llama_vector_store().add([TextNode(text="text", embedding=[0.1] * 1024)])
+    exists = spy(monkeypatch, client, "collection_exists")
+
+    for _ in range(3):
+        assert QdrantVectorStore.for_chunks(13, client).tenants is None
+    assert len(exists) == 1
+
+    legacy.delete()
+
+
+def test_shared_collections(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("QDRANT_SHARED_COLLECTIONS", "true")
+    monkeypatch.setattr(qdrant, "_shared_collections", {})
+    first = QdrantVectorStore.for_chunks(11)
+    second = QdrantVectorStore.for_chunks(12)
+    assert first.table_name == second.table_name == "chunks_test_1024"
+
+    for vector_store, document_id in [(first, "a"), (first, "b"), (second, "c")]:
+        vector_store.llama_vector_store().add(
+            [
+                TextNode(
+                    id_=str(uuid.uuid4()),
+                    text=f"text {document_id}",
+                    embedding=[0.1] * 1024,
+                    metadata={"data_source_id": vector_store.data_source_id},
+                    relationships={
+                        NodeRelationship.SOURCE: RelatedNodeInfo(node_id=document_id)
+                    },
+                )
+            ]
+        )
+    assert first.size() == 2
+    assert second.size() == 1
+
+    def data_sources_found(vector_store: QdrantVectorStore) -> List[int]:
+        result = vector_store.llama_vector_store().query(
+            VectorStoreQuery(query_embedding=[0.1] * 1024, similarity_top_k=10)
+        )
+        return sorted(node.metadata["data_source_id"] for node in result.nodes or [])
+
+    assert data_sources_found(first) == [11, 11]
+    [(data_source_ids, both)] = VectorStoreFactory.for_chunks_of([11, 12])
+    assert data_source_ids == [11, 12]
+    assert isinstance(both, QdrantVectorStore)
+    assert data_sources_found(both) == [11, 11, 12]
+
+    chunk_ids = list(second.get_chunk_hashes("c"))
+    assert second.llama_vector_store().get_nodes(chunk_ids)
+    assert not first.llama_vector_store().get_nodes(chunk_ids)
+    [point] = second.client.retrieve(second.table_name, chunk_ids)
+    assert (point.payload or {})["tenant"] == "12"
+
+    # once the collection exists, the model isn't asked for its dimension again
+    def embedding_dimension(embedding_model: str) -> int:
+        raise AssertionError("the dimension should come from the collection")
+
+    monkeypatch.setattr(qdrant, "_embedding_dimension", embedding_dimension)
+    monkeypatch.setattr(qdrant, "_shared_collections", {})
+    assert QdrantVectorStore.for_chunks(13).table_name == "chunks_test_1024"
+
+    first.delete()
+    assert first.size() == 0
+    assert second.size() == 1
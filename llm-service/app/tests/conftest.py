@@ -50,6 +50,7 @@ import qdrant_client as q_client
 from fastapi.testclient import TestClient
 from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
 
+from app.ai.vector_stores import qdrant
 from app.ai.vector_stores.qdrant import QdrantVectorStore
 from app.main import app
 from app.services.metadata_apis import data_sources_metadata_api
@@ -137,8 +138,10 @@ def vector_store(
     monkeypatch.setattr(
         QdrantVectorStore,
         "for_chunks",
-        lambda ds_id: original(ds_id, qdrant_client),
+        lambda ds_id, client=None: original(ds_id, client or qdrant_client),
     )
+    # Every test gets new collections, so what was read about the last ones doesn't apply
+    monkeypatch.setattr(qdrant, "_collection_settings", {})
 
 
 @pytest.fixture(autouse=True)
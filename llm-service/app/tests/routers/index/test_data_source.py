@@ -37,9 +37,11 @@
 # ##############################################################################
 
 """Integration tests for app/routers/index/data_source/."""
+import time
 from pathlib import Path
 from typing import Any
 
+import lipsum
 from fastapi.testclient import TestClient
 from llama_index.core import VectorStoreIndex
 from llama_index.core.vector_stores import VectorStoreQuery
@@ -174,6 +176,32 @@ class TestDocumentIndexing:
         )
         assert len(vectors.nodes or []) == 0
 
+    @staticmethod
+    def test_delete_documents(
+        client: TestClient,
+        data_source_id: int,
+        document_id: str,
+        index_document_request_body: dict[str, Any],
+        test_file: Path,
+    ) -> None:
+        """Test POST /data_sources/{data_source_id}/documents/delete."""
+        client.post(
+            f"/data_sources/{data_source_id}/documents/{document_id}/index",
+            json=index_document_request_body,
+        )
+
+        response = client.post(
+            f"/data_sources/{data_source_id}/documents/delete",
+            json={"document_ids": [document_id, "not-indexed"]},
+        )
+        assert response.status_code == 200
+
+        index = get_vector_store_index(data_source_id)
+        vectors = index.vector_store.query(
+            VectorStoreQuery(query_embedding=[0.2] * 1024)
+        )
+        assert len(vectors.nodes or []) == 0
+
     @staticmethod
     def test_get_size(
         client: TestClient,
@@ -191,3 +219,143 @@ class TestDocumentIndexing:
         response = client.get(f"/data_sources/{data_source_id}/size")
         assert response.status_code == 200
         assert response.json() > 0
+
+    @staticmethod
+    def test_set_quantization(
+        client: TestClient,
+        data_source_id: int,
+        document_id: str,
+        index_document_request_body: dict[str, Any],
+        test_file: Path,
+    ) -> None:
+        """Test PUT /data_sources/{data_source_id}/quantization."""
+        quantization = {"quantization": "scalar", "on_disk": True}
+        response = client.put(
+            f"/data_sources/{data_source_id}/quantization", json=quantization
+        )
+        assert response.status_code == 404
+
+        client.post(
+            f"/data_sources/{data_source_id}/documents/{document_id}/index",
+            json=index_document_request_body,
+        )
+        response = client.put(
+            f"/data_sources/{data_source_id}/quantization", json=quantization
+        )
+        assert response.status_code == 200
+
+    @staticmethod
+    def test_index_profiles(
+        client: TestClient,
+        data_source_id: int,
+        document_id: str,
+        index_document_request_body: dict[str, Any],
+        test_file: Path,
+    ) -> None:
+        """Test /data_sources/{data_source_id}/index-profile."""
+        client.post(
+            f"/data_sources/{data_source_id}/documents/{document_id}/index",
+            json=index_document_request_body,
+        )
+
+        response = client.put(
+            f"/data_sources/{data_source_id}/index-profile",
+            json={"profile": "high-recall"},
+        )
+        assert response.status_code == 200
+
+        response = client.post(
+            f"/data_sources/{data_source_id}/index-profile/benchmark",
+            json={"queries": ["lorem ipsum", "dolor sit amet"], "top_k": 3},
+        )
+        assert response.status_code == 200
+        benchmarks = response.json()
+        assert [benchmark["profile"] for benchmark in benchmarks] == [
+            "fast",
+            "balanced",
+            "high-recall",
+        ]
+        assert all(benchmark["recall"] == 1.0 for benchmark in benchmarks)
+
+
+class TestBatchDocumentIndexing:
+    @staticmethod
+    def test_index_batch(
+        client: TestClient,
+        data_source_id: int,
+        databases_dir: str,
+    ) -> None:
+        documents = []
+        for i in range(3):
+            key = f"test/batch-{i}"
+            path = Path(databases_dir) / "file_storage" / key
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(lipsum.generate_words(1000))
+            documents.append(
+                {
+                    "document_id": f"batch-{i}",
+                    "s3_bucket_name": "test_bucket",
+                    "s3_document_key": key,
+                    "original_filename": "batch.txt" if i else "batch.unknown",
+                }
+            )
+
+        response = client.post(
+            f"/data_sources/{data_source_id}/documents/index",
+            json={"documents": documents},
+        )
+
+        assert response.status_code == 200
+        statuses = {status["document_id"]: status for status in response.json()}
+        assert statuses["batch-0"]["status"] == "unsupported"
+        assert statuses["batch-1"]["status"] == "indexed"
+        assert statuses["batch-2"]["status"] == "indexed"
+
+        vector_store = QdrantVectorStore.for_chunks(data_source_id)
+        assert vector_store.get_chunk_hashes("batch-0") == {}
+        assert vector_store.get_chunk_hashes("batch-1")
+        assert vector_store.get_chunk_hashes("batch-2")
+
+
+class TestIndexingJobs:
+    @staticmethod
+    def test_jobs_run_in_the_background(
+        client: TestClient,
+        data_source_id: int,
+        databases_dir: str,
+    ) -> None:
+        for i, filename in enumerate(["job.txt", "job.unknown"]):
+            key = f"test/job-{i}"
+            path = Path(databases_dir) / "file_storage" / key
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(lipsum.generate_words(1000))
+            response = client.post(
+                f"/data_sources/{data_source_id}/jobs",
+                json={
+                    "document_id": f"job-{i}",
+                    "s3_bucket_name": "test_bucket",
+                    "s3_document_key": key,
+                    "original_filename": filename,
+                },
+            )
+            assert response.status_code == 200
+            assert response.json()["status"] == "queued"
+
+        deadline = time.monotonic() + 60
+        report = client.get(f"/data_sources/{data_source_id}/jobs").json()
+        while report["queued"] or report["running"]:
+            assert time.monotonic() < deadline
+            time.sleep(0.1)
+            report = client.get(f"/data_sources/{data_source_id}/jobs").json()
+
+        assert report["succeeded"] == 1
+        assert report["failed"] == 1
+        jobs = {job["document_id"]: job for job in report["jobs"]}
+        assert jobs["job-0"]["chunks_written"] > 0
+        assert jobs["job-0"]["chunks_written"] == jobs["job-0"]["chunks_read"]
+        # unsupported files aren't retried
+        assert jobs["job-1"]["attempts"] == 1
+        assert "Unsupported file extension" in jobs["job-1"]["error"]
+
+        vector_store = QdrantVectorStore.for_chunks(data_source_id)
+        assert vector_store.get_chunk_hashes("job-0")
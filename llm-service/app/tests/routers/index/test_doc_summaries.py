@@ -85,6 +85,42 @@ class TestDocumentSummaries:
         # todo: Figure out how to parameterize the monkey patch
         assert get_data_source_response.text == '"this is a completion response"'
 
+        summaries_response = client.get("/data_sources/summaries")
+        assert summaries_response.status_code == 200
+        assert summaries_response.json() == {
+            str(data_source_id): "this is a completion response"
+        }
+        etag = summaries_response.headers["ETag"]
+
+        unchanged_response = client.get(
+            "/data_sources/summaries", headers={"If-None-Match": etag}
+        )
+        assert unchanged_response.status_code == 304
+
+    @staticmethod
+    def test_index_and_summarize(
+        client: TestClient,
+        index_document_request_body: dict[str, Any],
+        data_source_id: int,
+        document_id: str,
+        test_file: Path,
+    ) -> None:
+        response = client.post(
+            f"/data_sources/{data_source_id}/documents/{document_id}/index-and-summarize",
+            json=index_document_request_body,
+        )
+
+        assert response.status_code == 200
+        assert response.text == '"this is a completion response"'
+
+        size_response = client.get(f"/data_sources/{data_source_id}/size")
+        assert size_response.json() > 0
+
+        get_summary_response = client.get(
+            f"/data_sources/{data_source_id}/documents/{document_id}/summary"
+        )
+        assert get_summary_response.text == '"this is a completion response"'
+
     @staticmethod
     def test_delete_document(
         client: TestClient,
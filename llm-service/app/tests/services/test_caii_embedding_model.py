@@ -0,0 +1,132 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2025
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+import asyncio
+import json
+from typing import Any, List
+
+import httpx
+import pytest
+
+from app.services.caii.CaiiEmbeddingModel import CaiiEmbeddingModel
+from app.services.caii.http_clients import shared_async_client, shared_client
+from app.services.caii.types import Endpoint
+
+
+def embedding_endpoint() -> Endpoint:
+    return Endpoint(
+        namespace="serving-default",
+        name="embedder",
+        url="https://caii.test/v1/embeddings",
+        observed_generation=1,
+        replica_count=1,
+        created_by="test",
+        description="",
+        created_at="",
+        resources={},
+        autoscaling={},
+        model_name="embedder",
+        traffic={},
+        api_standard="openai",
+        has_chat_template=False,
+        task="EMBED",
+        instance_type="",
+        metric_format="",
+    )
+
+
+@pytest.fixture(autouse=True)
+def token(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("CDP_TOKEN_OVERRIDE", "token")
+
+
+def test_async_embeddings() -> None:
+    requests: List[Any] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append(body)
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        return httpx.Response(
+            200,
+            json={"data": [{"embedding": [float(len(text))]} for text in inputs]},
+        )
+
+    async def embed() -> Any:
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            model = CaiiEmbeddingModel(
+                endpoint=embedding_endpoint(), async_http_client=client
+            )
+            return await asyncio.gather(
+                model.aget_query_embedding("query"),
+                model.aget_text_embedding_batch(["a", "bb", "ccc"]),
+            )
+
+    query, texts = asyncio.run(embed())
+
+    assert query == [5.0]
+    assert texts == [[1.0], [2.0], [3.0]]
+    assert {request["input_type"] for request in requests} == {"query", "passage"}
+    assert ["a", "bb", "ccc"] in [request["input"] for request in requests]
+
+
+def test_async_errors_are_raised() -> None:
+    async def embed() -> Any:
+        async with httpx.AsyncClient(
+            transport=httpx.MockTransport(lambda _: httpx.Response(429))
+        ) as client:
+            model = CaiiEmbeddingModel(
+                endpoint=embedding_endpoint(), async_http_client=client
+            )
+            return await model.aget_query_embedding("query")
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(embed())
+
+
+def test_query_embeddings_have_their_own_connection_pool() -> None:
+    model = CaiiEmbeddingModel(endpoint=embedding_endpoint())
+
+    async def clients() -> Any:
+        return shared_async_client("query"), shared_async_client()
+
+    query_client, passage_client = asyncio.run(clients())
+
+    assert model.query_http_client is shared_client("query")
+    assert model.http_client is shared_client()
+    assert model.query_http_client is not model.http_client
+    assert query_client is not passage_client